@@ -0,0 +1,264 @@
+"""
+FLOOR 13 - Scripted batch mode
+Runs a command script through the game at full speed (main.py --script FILE,
+or --batch for commands on stdin) and prints one JSON result per command:
+- no renderer, typewriter delays or timed events; the game is stepped
+  directly, like a replay (replay.run_sync)
+- every command is one line: the single-line forms below answer the game's
+  nested prompts themselves (move's "Where to?", the inventory and weapon
+  menus, "Press Enter"), so a script never depends on how many lines a
+  command used to eat; leftover answers are dropped, never carried over
+- commands are checked against what the game is waiting for: a fight
+  action outside a fight (or the reverse) is an error result, not input
+- saves go to --save FILE (resumed if it exists); without it the game starts
+  fresh and writes no save, so any number of scripts can run side by side.
+  The only files they share are the threat and hint tables in main.CACHE_DIR
+  (FLOOR13_CACHE), never the working directory: a run that needs a missing
+  table builds it into a file of its own and renames it into place, so
+  parallel runs never see a half-written one
+- --seed N fixes the rolls: the same script and seed give the same results
+
+Grammar (case-insensitive; blank lines and `#` comments are skipped):
+  exploring:  move <room> | travel <room> | auto-explore | inventory | map
+              switch <n|weapon> | drop <n|weapon> | flashlight | batteries | quit
+  fighting:   attack | heal | run | shut | flashlight | switch <n|weapon> | hint
+
+Results (JSON lines on stdout):
+  {"n": line, "command", "ok", "error"?, "output": [lines], "waiting": "command"|"fight"|"end", "state": {...}}
+  the first one (n 0) is the game's start; the last one is
+  {"done": true, "ending": "escape"|"consumed"|"trapped"|"quit"|null, "commands", "errors", "seconds"}
+
+Usage: python main.py --script FILE [--save FILE] [--seed N]   (or --batch < FILE)
+       python batch.py SCRIPT|DIR ... [-j N] [--save-dir DIR] [--seed N]   (many scripts over a process pool;
+                                                                         results go to SCRIPT.jsonl)
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import main
+import replay
+import saves
+
+SUFFIX = ".f13s"  # scripts picked up from a directory
+
+COMMAND = "command"  # what the game is waiting for after a command
+FIGHT = "fight"
+END = "end"
+PROMPT = "prompt"  # a nested prompt, answered by the command's own expansion
+
+FIGHT_MOVES = {"attack": "a", "a": "a", "heal": "h", "h": "h", "run": "r", "r": "r", "shut": "s", "s": "s",
+               "flashlight": "f", "f": "f", "hint": "?", "?": "?"}
+SIMPLE = {"auto-explore": ["auto-explore"], "map": ["map"], "flashlight": ["flashlight"],
+          "batteries": ["use batteries"], "inventory": ["inventory", ""], "quit": ["quit", "y"]}
+
+
+class ScriptError(ValueError):
+    pass
+
+
+# -------------------- GRAMMAR --------------------
+def weapon_choice(s, arg: str) -> str:
+    """The menu number for `switch` / `drop`: given as a number or a held weapon's name."""
+    if not arg:
+        raise ScriptError("needs a weapon number or name")
+    if arg.isdigit():
+        return arg
+    held = [w.lower() for w in s.player.inventory.weapons()]
+    if arg.lower() not in held:
+        raise ScriptError(f"no {arg} in the inventory")
+    return str(held.index(arg.lower()) + 1)
+
+def expand(s, line: str, waiting: str) -> List[str]:
+    """The lines the game's prompts expect for one script command."""
+    verb, _, arg = line.partition(" ")
+    verb, arg = verb.lower(), arg.strip()
+    if waiting == FIGHT:
+        if verb in FIGHT_MOVES and not arg:
+            return [FIGHT_MOVES[verb]]
+        if verb == "switch":
+            return ["w", weapon_choice(s, arg)]
+        raise ScriptError(f"'{line}' is not a fight action (in a fight)")
+    if verb in SIMPLE and not arg:
+        return SIMPLE[verb]
+    if verb == "move":
+        if not arg:
+            raise ScriptError("move needs a room")
+        return ["move", s.graph.resolve(arg) or arg]
+    if verb == "travel":
+        return ["travel " + arg]
+    if verb == "switch":
+        return ["inventory", "s", weapon_choice(s, arg)]
+    if verb == "drop":
+        return ["inventory", "d", weapon_choice(s, arg)]
+    if verb in FIGHT_MOVES:
+        raise ScriptError(f"'{line}' is a fight action (not in a fight)")
+    raise ScriptError(f"unknown command '{line}'")
+
+def state(player) -> Dict:
+    return {"location": player.location, "health": player.health, "weapon": player.weapon,
+            "flashlight": player.flashlight_on, "battery": player.flashlight_battery,
+            "fragments": player.map_fragments_found, "inventory": dict(player.inventory.stacks())}
+
+
+# -------------------- SCRIPTED I/O --------------------
+class BatchIO:
+    """Console stand-in: commands come from the script, output is collected per command."""
+
+    def __init__(self, lines: Iterable[str], write: Callable[[Dict], None]):
+        self.lines = enumerate(lines, 1)
+        self.write = write
+        self.s = None  # the main.Session, set once it exists
+        self.output: List[str] = []
+        self.pending: List[str] = []  # answers left for the current command's nested prompts
+        self.current: Optional[Dict] = {"n": 0, "command": None, "ok": True}  # the game's start
+        self.commands = 0
+        self.errors = 0
+
+    def say(self, text: str, delay: float = 0.0):
+        self.output.extend(line for line in text.split("\n") if line)
+
+    def prompt(self, text: str):
+        pass
+
+    def waiting(self, prompt: str) -> str:
+        if self.s.idle:
+            return COMMAND
+        if prompt.startswith("[A]ttack"):
+            return FIGHT
+        return PROMPT
+
+    async def ask(self, prompt: str = "") -> str:
+        waiting = self.waiting(prompt)
+        if waiting == PROMPT:
+            return self.pending.pop(0) if self.pending else ""
+        self.pending = []
+        self.finish(waiting)
+        for n, text in self.lines:
+            line = text.strip()
+            if not line or line.startswith("#"):
+                continue
+            self.commands += 1
+            try:
+                answers = expand(self.s, line, waiting)
+            except ScriptError as e:
+                self.errors += 1
+                self.write({"n": n, "command": line, "ok": False, "error": str(e), "output": [],
+                            "waiting": waiting, "state": state(self.s.player)})
+                continue
+            self.current = {"n": n, "command": line, "ok": True}
+            self.pending = answers[1:]
+            return answers[0]
+        raise EOFError
+
+    def finish(self, waiting: str):
+        """Write the current command's result, now that the game is waiting again (or over)."""
+        if self.current is not None:
+            self.current.update(output=self.output, waiting=waiting, state=state(self.s.player))
+            self.write(self.current)
+        self.current = None
+        self.output = []
+
+
+def write_json(result: Dict):
+    sys.stdout.write(json.dumps(result, separators=(",", ":")) + "\n")
+
+def run(lines: Iterable[str], template=None, codec=None, save_path: str = None, seed: int = None,
+        history_db=None, name: str = None, write: Callable[[Dict], None] = write_json) -> Dict:
+    """Play one script; every result goes to `write`, the summary is written last and returned."""
+    world = main.new_world(template or main.TEMPLATE)
+    if save_path:
+        manager = saves.SaveManager(save_path, codec or main.CODEC, world)
+    else:
+        manager = replay.ReplaySaves(world, {"saved": False, "start": None})
+    io = BatchIO(lines, write)
+    s = io.s = main.Session(io, world, manager, player_id=name, seed=seed, history_db=history_db)
+    started = time.perf_counter()
+    ending = None
+    try:
+        replay.run_sync(main.play(s))
+    except main.GameOver as over:
+        ending = over.ending
+        io.finish(END)
+    except EOFError:
+        pass
+    manager.flush()
+    summary = {"done": True, "ending": ending, "commands": io.commands, "errors": io.errors,
+               "seconds": round(time.perf_counter() - started, 4)}
+    write(summary)
+    return summary
+
+
+# -------------------- MANY SCRIPTS (PROCESS POOL) --------------------
+def content_template(content: Dict) -> Tuple[object, object]:
+    if "pack" in content:
+        return main.pack_template(content["pack"])
+    if "floor" in content:
+        return main.floor_template(*content["floor"])
+    return main.TEMPLATE, main.CODEC
+
+def run_file(args) -> Dict:
+    """Pool job: one script, results to SCRIPT.jsonl; returns its summary."""
+    path, save_dir, seed, content = args
+    template, codec = content_template(content)
+    name = os.path.splitext(os.path.basename(path))[0]
+    save_path = os.path.join(save_dir, name + ".dat") if save_dir else None
+    with open(path, encoding="utf-8") as f, open(path + ".jsonl", "w", encoding="utf-8") as out:
+        summary = run(f.read().splitlines(), template, codec, save_path, seed, name=name,
+                      write=lambda result: out.write(json.dumps(result, separators=(",", ":")) + "\n"))
+    return dict(summary, script=path)
+
+def find_scripts(paths: Iterable[str]) -> List[str]:
+    scripts = []
+    for path in paths:
+        if os.path.isdir(path):
+            scripts += sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(SUFFIX))
+        else:
+            scripts.append(path)
+    return scripts
+
+def cli():
+    parser = argparse.ArgumentParser(description="Floor 13 scripted batch runs")
+    parser.add_argument("scripts", nargs="+", help=f"command scripts, or directories of *{SUFFIX} scripts")
+    parser.add_argument("--workers", "-j", type=int, default=None)
+    parser.add_argument("--save-dir", help="give every script its own save file here (default: no saves)")
+    parser.add_argument("--seed", type=int, default=13, help="seed for every script's rolls")
+    parser.add_argument("--pack", help="run on another content pack instead of the hotel")
+    parser.add_argument("--floor-seed", type=int, help="run on a generated floor")
+    parser.add_argument("--floor-size", type=int, default=None)
+    args = parser.parse_args()
+    scripts = find_scripts(args.scripts)
+    if not scripts:
+        parser.error("no scripts found")
+    content = {}
+    if args.pack:
+        content = {"pack": os.path.abspath(args.pack)}
+    elif args.floor_seed is not None:
+        import floorgen
+        content = {"floor": [args.floor_seed, args.floor_size or floorgen.DEFAULT_SIZE]}
+    if args.save_dir:
+        os.makedirs(args.save_dir, exist_ok=True)
+    jobs = [(path, args.save_dir, args.seed, content) for path in scripts]
+    workers = args.workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    if workers == 1 or len(jobs) == 1:
+        summaries = list(map(run_file, jobs))
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            summaries = pool.map(run_file, jobs)
+    elapsed = time.perf_counter() - started
+    for summary in summaries:
+        write_json(summary)
+    commands = sum(summary["commands"] for summary in summaries)
+    errors = sum(summary["errors"] for summary in summaries)
+    print(f"{len(scripts)} scripts, {commands} commands ({errors} errors) in {elapsed:.2f}s -> "
+          f"{commands / elapsed:.0f} commands/s", file=sys.stderr)
+    sys.exit(1 if errors else 0)
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,306 @@
+"""
+FLOOR 13 - Benchmark suite
+One command for the numbers performance work on the game is judged by:
+- turns: scripted sessions through main.play() with in-process I/O (a bot
+  picks commands from what the game printed, like loadgen.py) and real
+  save files; turns (commands answered) per second and save bytes
+  written per turn
+- saves: auto_save + end-of-turn commit latency, flush to disk, and
+  auto_load of the save
+- fights: encounter_enemy() and boss_battle() per second, UI included
+- startup: `import main` and `import functions` in a fresh interpreter
+- memory: bytes per Player, fresh and after some play (tracemalloc)
+
+Results are written as JSON (--out). --baseline compares against an
+earlier results file and flags every metric that got worse by more than
+--tolerance; metrics named *_per_s are better higher, all others lower.
+A fixed pure-Python loop ("machine") is timed too, and baseline timings
+are scaled by how much faster or slower it ran, so a busier or different
+machine does not read as a regression (--no-normalize for raw numbers).
+
+Usage: python bench.py [--only turns,saves,...] [--quick] [--out results.json]
+       python bench.py --baseline results.json [--tolerance 0.1]   (exit 1 on a regression)
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import loadgen
+import main
+import replay
+import saves
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+# -------------------- STUBBED I/O --------------------
+class BotIO:
+    """Console stand-in that plays: each answer is chosen from the text printed since the last prompt."""
+
+    def __init__(self, rng: random.Random, max_turns: int):
+        self.rng = rng
+        self.max_turns = max_turns
+        self.turns = 0
+        self.screen: List[str] = []
+
+    def say(self, text: str, delay: float = 0.0):
+        self.screen.append(text + "\n")
+
+    def prompt(self, text: str):
+        self.screen.append(text)
+
+    async def ask(self, prompt: str = "") -> str:
+        if self.turns >= self.max_turns:
+            raise EOFError
+        self.turns += 1
+        self.screen.append(prompt)
+        screen = "".join(self.screen)
+        self.screen.clear()
+        return loadgen.choose_command(screen, self.rng)
+
+
+def _play(coro):
+    try:
+        replay.run_sync(coro)
+    except (main.GameOver, EOFError):
+        pass
+
+
+# -------------------- BENCHMARKS --------------------
+def bench_turns(sessions: int = 200, max_turns: int = 300) -> Dict[str, float]:
+    turns = written = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        for i in range(sessions):
+            world = main.new_world()
+            manager = saves.SaveManager(os.path.join(tmp, f"p{i}.dat"), main.CODEC, world)
+            io = BotIO(random.Random(i), max_turns)
+            s = main.Session(io, world, manager, seed=i)
+            _play(main.play(s))
+            manager.flush(wait=False)
+            turns += io.turns
+            written += manager.bytes_queued
+        elapsed = time.perf_counter() - started
+        saves.flush_all()
+    return {"turns_per_s": turns / elapsed, "bytes_per_turn": written / turns}
+
+def bench_saves(rounds: int = 2000, loads: int = 50) -> Dict[str, float]:
+    names = list(main.ROOMS)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.dat")
+        world = main.new_world()
+        s = main.Session(BotIO(random.Random(0), 0), world, saves.SaveManager(path, main.CODEC, world), seed=0)
+        player = s.player = main.Player()
+        player.inventory = ["Rusty Pipe", "Batteries", "Health Pack"]
+        commits = []
+        for i in range(rounds):
+            player.location = names[i % len(names)]  # a typical turn: moved, took a hit, looted
+            player.visited_rooms.add(player.location)
+            player.health = 40 + i % 60
+            world.take_items(player.location)
+            t = time.perf_counter()
+            main.auto_save(s)
+            s.saves.commit()
+            commits.append(time.perf_counter() - t)
+        t = time.perf_counter()
+        s.saves.flush()
+        flushed = time.perf_counter() - t
+        loaded = []
+        for _ in range(loads):
+            fresh = main.new_world()
+            t = time.perf_counter()
+            main.auto_load(main.Session(BotIO(random.Random(0), 0), fresh,
+                                        saves.SaveManager(path, main.CODEC, fresh), seed=0))
+            loaded.append(time.perf_counter() - t)
+    commits.sort()
+    return {"commit_p50_us": commits[len(commits) // 2] * 1e6,
+            "commit_p99_us": commits[int(len(commits) * 0.99)] * 1e6,
+            "flush_ms": flushed * 1e3,
+            "load_p50_ms": statistics.median(loaded) * 1e3}
+
+def bench_fights(fights: int = 2000, bosses: int = 500) -> Dict[str, float]:
+    world = main.new_world()
+    s = main.Session(BotIO(random.Random(0), 1 << 62), world,
+                     replay.ReplaySaves(world, {"saved": False, "start": None}), seed=0)
+
+    def fighter() -> main.Player:
+        world.reset()
+        player = s.player = main.Player()
+        player.inventory = ["Rusty Pipe", "Kitchen Knife", "Health Pack", "Health Pack"]
+        player.weapon = "Rusty Pipe"
+        player.flashlight_on = True
+        return player
+
+    started = time.perf_counter()
+    for _ in range(fights):
+        fighter()
+        _play(main.encounter_enemy(s))
+    enemy = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(bosses):
+        fighter().health = 120
+        _play(main.boss_battle(s))
+    boss = time.perf_counter() - started
+    return {"encounters_per_s": fights / enemy, "boss_battles_per_s": bosses / boss}
+
+STARTUP_SCRIPT = """
+import time
+t = time.perf_counter()
+import main
+t1 = time.perf_counter()
+import functions
+print(t1 - t, time.perf_counter() - t1)
+"""
+
+def bench_startup(runs: int = 5) -> Dict[str, float]:
+    """Imports in fresh interpreters (the content snapshot is already built by this process)."""
+    mains, functions, totals = [], [], []
+    for _ in range(runs):
+        t = time.perf_counter()
+        out = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=HERE, check=True,
+                             capture_output=True, text=True).stdout.split()
+        totals.append(time.perf_counter() - t)
+        mains.append(float(out[0]))
+        functions.append(float(out[1]))
+    return {"import_main_ms": statistics.median(mains) * 1e3,
+            "import_functions_ms": statistics.median(functions) * 1e3,
+            "process_ms": statistics.median(totals) * 1e3}
+
+def _per_object(make: Callable, count: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [make() for _ in range(count)]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return used / count
+
+def bench_memory(players: int = 10000) -> Dict[str, float]:
+    names = list(main.ROOMS)[:8]
+
+    def played() -> main.Player:
+        player = main.Player()
+        player.inventory = ["Rusty Pipe", "Kitchen Knife", "Batteries", "Health Pack"]
+        player.weapon = "Rusty Pipe"
+        player.visited_rooms.update(names)
+        return player
+
+    return {"player_fresh_bytes": _per_object(main.Player, players),
+            "player_played_bytes": _per_object(played, players)}
+
+def bench_machine(loops: int = 300000) -> Dict[str, float]:
+    """A fixed pure-Python workload, to tell a slower (or busier) machine from a slower game."""
+    started = time.perf_counter()
+    table: Dict[int, int] = {}
+    for i in range(loops):
+        table[i & 1023] = table.get(i & 1023, 0) + len(str(i))
+    return {"loops_per_s": loops / (time.perf_counter() - started)}
+
+BENCHMARKS: Dict[str, Callable[[bool], Dict[str, float]]] = {
+    "machine": lambda quick: bench_machine(100000 if quick else 300000),
+    "turns": lambda quick: bench_turns(40 if quick else 200),
+    "saves": lambda quick: bench_saves(400 if quick else 2000, 10 if quick else 50),
+    "fights": lambda quick: bench_fights(400 if quick else 2000, 100 if quick else 500),
+    "startup": lambda quick: bench_startup(2 if quick else 5),
+    "memory": lambda quick: bench_memory(2000 if quick else 10000),
+}
+
+
+# -------------------- RESULTS --------------------
+def higher_is_better(metric: str) -> bool:
+    return metric.endswith("_per_s")
+
+def is_timing(metric: str) -> bool:
+    return metric.endswith(("_per_s", "_ms", "_us"))
+
+def machine_speed(current: Dict, baseline: Dict) -> float:
+    """How much faster this machine ran the fixed workload than the baseline's (1.0 if unknown)."""
+    now = current["results"].get("machine", {}).get("loops_per_s")
+    then = baseline.get("results", {}).get("machine", {}).get("loops_per_s")
+    return now / then if now and then else 1.0
+
+def run(only: List[str] = None, quick: bool = False, repeat: int = 3) -> Dict:
+    """Every benchmark `repeat` times, keeping the best value of each metric."""
+    results = {}
+    for name in only or BENCHMARKS:
+        best: Dict[str, float] = {}
+        for _ in range(repeat):
+            for metric, value in BENCHMARKS[name](quick).items():
+                better = max if higher_is_better(metric) else min
+                best[metric] = value if metric not in best else better(best[metric], value)
+        results[name] = {metric: round(value, 3) for metric, value in best.items()}
+    return {"meta": {"python": platform.python_version(), "platform": platform.platform(),
+                     "quick": quick, "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+            "results": results}
+
+def compare(current: Dict, baseline: Dict, tolerance: float = 0.10, normalize: bool = True) -> List[Dict]:
+    """One row per metric present in both; "regression" is True where it got worse beyond tolerance.
+    With normalize, timings are first scaled by machine_speed(), so a busy machine is not a regression."""
+    speed = machine_speed(current, baseline) if normalize else 1.0
+    rows = []
+    for name, metrics in current["results"].items():
+        if name == "machine":
+            continue
+        for metric, value in metrics.items():
+            old = baseline.get("results", {}).get(name, {}).get(metric)
+            if old is None:
+                continue
+            if is_timing(metric):
+                old = old * speed if higher_is_better(metric) else old / speed
+            change = (value - old) / old if old else 0.0
+            worse = -change if higher_is_better(metric) else change
+            rows.append({"benchmark": name, "metric": metric, "baseline": old, "current": value,
+                         "change": change, "regression": worse > tolerance})
+    return rows
+
+def cli():
+    parser = argparse.ArgumentParser(description="Floor 13 benchmark suite")
+    parser.add_argument("--only", help="comma-separated: " + ",".join(BENCHMARKS))
+    parser.add_argument("--quick", action="store_true", help="smaller runs (a quick check, noisier)")
+    parser.add_argument("--repeat", type=int, default=3, help="best of N runs per benchmark")
+    parser.add_argument("--out", help="write the results here as JSON")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown before flagging (0.10 = 10%%)")
+    parser.add_argument("--no-normalize", action="store_true", help="compare raw timings, not scaled by machine speed")
+    args = parser.parse_args()
+    only = args.only.split(",") if args.only else None
+    for name in only or ():
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name!r}")
+    results = run(only, args.quick, args.repeat)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    if not args.baseline:
+        for name, metrics in results["results"].items():
+            for metric, value in metrics.items():
+                print(f"{name:<9}{metric:<22}{value:>14,.2f}")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    rows = compare(results, baseline, args.tolerance, not args.no_normalize)
+    if not args.no_normalize:
+        print(f"Machine speed vs baseline: x{machine_speed(results, baseline):.2f} (baseline timings scaled by it)")
+    print(f"{'':<9}{'metric':<22}{'baseline':>14}{'current':>14}{'change':>9}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['benchmark']:<9}{row['metric']:<22}{row['baseline']:>14,.2f}{row['current']:>14,.2f}"
+              f"{row['change']:>+9.1%}{flag}")
+    regressions = sum(row["regression"] for row in rows)
+    print(f"{regressions} regression(s) beyond {args.tolerance:.0%}")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,222 @@
+"""
+FLOOR 13 - Headless combat engine
+Pure combat rules for minion encounters and the Matriarch fight:
+- No printing, no input(), no saving
+- The caller supplies an action policy (callable or iterator of actions)
+- Every fight returns its outcome and the list of events that happened
+
+Actions: "attack", "heal", "run", "flashlight", "shut", ("switch", weapon).
+Anything else is an invalid action and costs nothing.
+
+Events are plain tuples whose first element is the event kind, e.g.
+("hit", target, weapon, damage, durability_left) or ("enemy_hit", name, damage).
+"""
+
+import random
+from typing import Callable, Dict, Generator, Iterable, List, NamedTuple, Tuple, Union
+
+import rolls
+
+WON = "won"
+FLED = "fled"
+DIED = "died"
+
+ATTACK = "attack"
+HEAL = "heal"
+RUN = "run"
+SWITCH = "switch"
+FLASHLIGHT = "flashlight"
+SHUT = "shut"
+
+LOOT_TABLE = ["Health Pack", "Batteries"]
+LOOT = rolls.AliasTable(LOOT_TABLE)  # what a defeated minion drops (O(1) pick from rolls.Rolls)
+
+# The rules (solver.py and fightstats.py key their cached tables on these)
+WEAPON_BONUS = (0, 5)       # added to a weapon's damage, minion fights
+FIST_DMG = (3, 8)
+BOSS_WEAPON_BONUS = (5, 10)
+BOSS_FIST_DMG = (5, 9)
+HEAL_HP = 30
+BOSS_HEAL_HP = 40
+ESCAPE = 0.5                # chance that running away works
+SUMMON = 0.3                # chance the Matriarch summons a minion after her hit
+LOOT_DROP = 0.4             # chance a defeated minion drops something
+
+Event = Tuple
+Emit = Callable[[Event], None]
+
+
+class Turn(NamedTuple):
+    """What a policy sees when it has to pick the next action."""
+    player: object
+    enemy: Dict
+    enemy_hp: int
+    boss: bool
+    boss_hp: int = 0  # the Matriarch's HP while her summoned minion is fought
+
+
+Policy = Union[Callable[[Turn], object], Iterable]
+
+# -------------------- SHARED RULES --------------------
+def _split(action) -> Tuple[str, object]:
+    if isinstance(action, tuple):
+        return action[0], (action[1] if len(action) > 1 else None)
+    return action, None
+
+def drain(player, amount: int, emit: Emit):
+    if player.flashlight_on:
+        player.flashlight_battery -= amount
+        if player.flashlight_battery <= 0:
+            player.flashlight_battery = 0
+            player.flashlight_on = False
+            emit(("flashlight_died",))
+
+def _switch(player, target, weapons: Dict, emit: Emit):
+    held = player.inventory.weapons()
+    if not held:
+        emit(("no_weapons",))
+    elif target in held:
+        player.weapon = target
+        emit(("equip", target))
+    else:
+        emit(("invalid_choice",))
+
+def _strike(player, target: str, weapons: Dict, bonus: Tuple[int, int], fists: Tuple[int, int], rng, emit: Emit, prefix: str) -> int:
+    if player.weapon:
+        w = weapons[player.weapon]
+        damage = w["damage"] + rng.randint(*bonus)
+        w["durability"] -= 1
+        emit((prefix + "hit", target, player.weapon, damage, w["durability"]))
+        if w["durability"] <= 0:
+            emit(("weapon_broke", player.weapon))
+            player.inventory.remove(player.weapon)
+            player.weapon = None
+        return damage
+    damage = rng.randint(*fists)
+    emit((prefix + "punch", damage))
+    return damage
+
+def _heal(player, amount: int, emit: Emit, kind: str):
+    if "Health Pack" in player.inventory:
+        player.inventory.remove("Health Pack")
+        healed = min(player.max_health - player.health, amount)
+        player.health += healed
+        emit((kind, healed))
+    else:
+        emit(("no_health_packs",))
+
+# -------------------- FIGHTS (STEP GENERATORS) --------------------
+def encounter(player, enemy: Dict, weapons: Dict, emit: Emit, rng=random, boss_hp: int = 0) -> Generator[Turn, object, str]:
+    """Minion fight. Yields a Turn whenever an action is needed; returns WON, FLED or DIED."""
+    name = enemy["name"]
+    enemy_hp = rng.randint(enemy["min_hp"], enemy["max_hp"])
+    emit(("appears", name, enemy_hp))
+    while enemy_hp > 0 and player.health > 0:
+        kind, arg = _split((yield Turn(player, enemy, enemy_hp, False, boss_hp)))
+        if kind == ATTACK:
+            enemy_hp -= _strike(player, name, weapons, WEAPON_BONUS, FIST_DMG, rng, emit, "")
+        elif kind == HEAL:
+            _heal(player, HEAL_HP, emit, "heal")
+        elif kind == RUN:
+            if rng.random() > 1 - ESCAPE:
+                emit(("escaped",))
+                return FLED
+            emit(("escape_failed",))
+        elif kind == SWITCH:
+            _switch(player, arg, weapons, emit)
+            continue
+        else:
+            emit(("invalid_action",))
+            continue
+
+        if enemy_hp > 0:
+            hit = rng.randint(enemy["min_dmg"], enemy["max_dmg"])
+            player.health -= hit
+            emit(("enemy_hit", name, hit))
+            drain(player, 4, emit)
+
+    if player.health <= 0:
+        player.is_alive = False
+        emit(("slain",))
+        return DIED
+
+    emit(("defeated", name))
+    if rng.random() > 1 - LOOT_DROP:
+        loot = rng.choice(LOOT)
+        player.inventory.append(loot)
+        emit(("loot", name, loot))
+    return WON
+
+def boss_encounter(player, boss: Dict, minions: List[Dict], weapons: Dict, emit: Emit, rng=random) -> Generator[Turn, object, str]:
+    """Boss fight, including the 30% minion summon after each boss hit. Returns WON or DIED."""
+    emit(("boss_appears", boss["name"]))
+    boss_hp = boss["hp"]
+    while boss_hp > 0 and player.health > 0:
+        kind, arg = _split((yield Turn(player, boss, boss_hp, True)))
+        if kind == ATTACK:
+            boss_hp -= _strike(player, boss["name"], weapons, BOSS_WEAPON_BONUS, BOSS_FIST_DMG, rng, emit, "boss_")
+        elif kind == HEAL:
+            _heal(player, BOSS_HEAL_HP, emit, "boss_heal")
+        elif kind == SHUT:
+            player.flashlight_on = False
+            emit(("flashlight_off",))
+        elif kind == FLASHLIGHT:
+            if player.flashlight_on:
+                player.flashlight_on = False
+                emit(("flashlight_toggled", False))
+            elif player.flashlight_battery <= 0:
+                emit(("flashlight_no_battery",))
+            else:
+                player.flashlight_on = True
+                emit(("flashlight_toggled", True))
+        elif kind == SWITCH:
+            _switch(player, arg, weapons, emit)
+        else:
+            emit(("invalid_action",))
+            continue
+
+        hit = rng.randint(boss["min_dmg"], boss["max_dmg"])
+        player.health -= hit
+        emit(("boss_hits", hit))
+        if rng.random() > 1 - SUMMON:
+            emit(("summon",))
+            outcome = yield from encounter(player, rng.choice(minions), weapons, emit, rng, max(boss_hp, 0))
+            if outcome == DIED:
+                return DIED
+
+        drain(player, 6, emit)
+        emit(("round_end",))
+
+    if player.health <= 0:
+        return DIED
+    emit(("boss_defeated",))
+    return WON
+
+# -------------------- DRIVERS --------------------
+def drive(steps: Generator[Turn, object, str], policy: Policy) -> str:
+    """Run a fight generator to completion, asking `policy` for every action."""
+    if not callable(policy):
+        actions = iter(policy)
+
+        def policy(turn: Turn):
+            action = next(actions, None)
+            if action is None:
+                raise ValueError("action iterator exhausted before the fight ended")
+            return action
+
+    try:
+        turn = next(steps)
+        while True:
+            turn = steps.send(policy(turn))
+    except StopIteration as stop:
+        return stop.value
+
+def fight(player, enemy: Dict, policy: Policy, weapons: Dict, rng=random) -> Tuple[str, List[Event]]:
+    """Headless minion fight. Mutates `player` and weapon durability in `weapons`."""
+    events: List[Event] = []
+    return drive(encounter(player, enemy, weapons, events.append, rng), policy), events
+
+def boss_fight(player, boss: Dict, minions: List[Dict], policy: Policy, weapons: Dict, rng=random) -> Tuple[str, List[Event]]:
+    """Headless boss fight. Mutates `player` and weapon durability in `weapons`."""
+    events: List[Event] = []
+    return drive(boss_encounter(player, boss, minions, weapons, events.append, rng), policy), events
@@ -0,0 +1,128 @@
+"""
+FLOOR 13 - Async console
+Per-player text I/O for the asyncio game loop:
+- say() only queues text; a renderer coroutine types it out in frame-sized
+  chunks with asyncio.sleep, so input and other sessions keep running
+- input lines are fed in by a reader (stdin thread, socket, script) and
+  queued, so commands typed while text is still rendering run in order
+- text is typed out instantly once the player has typed anything after it
+  was queued (type-ahead), and an empty Enter while text is rendering skips
+  the remaining typewriter delay
+"""
+
+import asyncio
+import sys
+import threading
+from collections import deque
+from typing import Callable, Optional
+
+import render
+
+
+class Console:
+    def __init__(self, write: Callable[[str], None], interactive: bool = True, fps: int = render.FPS):
+        self.write = write
+        self.interactive = interactive
+        self.fps = fps
+        self.lines: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+        self._out = deque()
+        self._wake = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._skip = False
+        self._fed = 0  # input lines received so far
+
+    # -------------------- OUTPUT --------------------
+    def say(self, text: str, delay: float = render.DEFAULT_DELAY):
+        self._out.append((text + "\n", delay, self._fed))
+        self._kick()
+
+    def prompt(self, text: str):
+        self._out.append((text, 0, self._fed))
+        self._kick()
+
+    def _kick(self):
+        self._idle.clear()
+        self._wake.set()
+
+    async def drain(self):
+        """Wait until everything said so far has been rendered."""
+        await self._idle.wait()
+
+    async def render(self):
+        """Renderer task: runs for the lifetime of the console."""
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            while self._out:
+                text, delay, fed = self._out.popleft()
+                await self._type(text, delay, fed)
+            self._skip = False
+            if not self._out:
+                self._idle.set()
+
+    async def _type(self, text: str, delay: float, fed: int):
+        speed = render.get_speed()
+        if delay <= 0 or speed <= 0 or not self.interactive:
+            self.write(text)
+            return
+        cps = speed / delay
+        chunk = max(1, round(cps / self.fps))
+        frame = chunk / cps
+        for start in range(0, len(text), chunk):
+            if self._skip or self._fed > fed:
+                self.write(text[start:])
+                return
+            self.write(text[start:start + chunk])
+            await asyncio.sleep(frame)
+
+    # -------------------- INPUT --------------------
+    def feed(self, line: str):
+        """Queue one input line (called by whatever reads the player's input)."""
+        if line == "" and self.interactive and not self._idle.is_set():
+            self._skip = True  # Enter while text is rendering: skip to the end
+            return
+        self._fed += 1
+        self.lines.put_nowait(line)
+
+    def close_input(self):
+        self.lines.put_nowait(None)
+
+    async def ask(self, prompt: str = "") -> str:
+        if prompt:
+            self.prompt(prompt)
+        line = await self.lines.get()
+        if line is None:
+            self.lines.put_nowait(None)  # stay closed for later asks
+            raise EOFError
+        return line
+
+
+# -------------------- LOCAL TERMINAL --------------------
+def stdout_write(text: str):
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+def stdin_console() -> Console:
+    try:
+        interactive = sys.stdout.isatty()
+    except (AttributeError, ValueError):
+        interactive = False
+    return Console(stdout_write, interactive)
+
+def start_stdin_reader(console: Console, loop: asyncio.AbstractEventLoop) -> threading.Thread:
+    """Read stdin lines on a daemon thread and hand them to the event loop.
+
+    A blocking readline on a thread keeps stdin in its normal (blocking)
+    mode; making a TTY non-blocking would also affect stdout."""
+    def reader():
+        try:
+            for line in sys.stdin:
+                loop.call_soon_threadsafe(console.feed, line.rstrip("\r\n"))
+            loop.call_soon_threadsafe(console.close_input)
+        except RuntimeError:
+            pass  # event loop already closed: the game is over
+
+    thread = threading.Thread(target=reader, name="stdin", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,574 @@
+"""
+FLOOR 13 - Content packs
+Rooms, weapons, enemies and the boss come from a pack file (JSON, see
+packs/hotel.json) instead of Python literals:
+- validate() checks a pack and reports every problem at once (missing or
+  mistyped fields, exits to rooms that don't exist, rooms that can't be
+  reached from the Lobby, ...)
+- compile_pack() turns a valid pack into one flat binary snapshot: a table
+  of interned strings, fixed-size room records, adjacency and loot as
+  arrays of integer IDs, a light byte per room and a hash index of room
+  names
+- load() maps the snapshot read-only (mmap) and rebuilds it only when the
+  pack file changed, so startup parses nothing; rooms are decoded from the
+  mapping the first time they are looked at, like floorgen.Floor, and a
+  RoomGraph takes the adjacency straight from the snapshot
+
+Snapshot format (little endian, version 1):
+  header    magic "F13C", version u8, pack size u64, pack mtime_ns i64,
+            room names crc32 u32, counts (strings, rooms, items, weapons,
+            enemies, index slots), pack name u32, one u32 offset per section
+  strings   u32 offsets (count + 1), then the UTF-8 text
+  rooms     name u32, desc u32, first exit u32, first item u32, exits u16,
+            items u16, chance_enemy f64, flags u8, fragment_id i16
+  exits     u32 room IDs          loot   u32 string IDs
+  dark      u8 per room           index  u32 room ID + 1 per slot (0 = empty)
+  items     u32 string IDs of every item name, sorted
+  weapons   name u32, damage i32, durability i32, special u32
+  enemies   name u32, min_hp, max_hp, min_dmg, max_dmg i32
+  boss      name u32, hp, min_dmg, max_dmg i32
+
+Usage: python content.py [PACK ...] [--check]   (validate and compile packs)
+       python content.py --bench [--sizes 16,1000,10000,100000]   (startup vs pack size)
+"""
+
+import argparse
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from array import array
+from collections import deque
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+PACK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "packs")
+DEFAULT_PACK = os.path.join(PACK_DIR, "hotel.json")
+SNAPSHOT_SUFFIX = ".f13c"
+START_ROOM = "Lobby"
+BOSS_ROOM = "Boss Chamber"
+
+MAGIC = b"F13C"
+VERSION = 1
+SECTIONS = ("strings", "text", "rooms", "exits", "loot", "dark", "index", "items", "weapons", "enemies", "boss")
+HEADER = struct.Struct(f"<4sB3xQqI7I{len(SECTIONS)}I")
+ROOM = struct.Struct("<IIIIHHdBxh")
+WEAPON = struct.Struct("<IiiI")
+ENEMY = struct.Struct("<Iiiii")
+BOSS = struct.Struct("<Iiii")
+U32 = struct.Struct("<I")
+NONE = 0xFFFFFFFF
+LIGHT, FRAGMENT = 1, 2  # room flags
+
+ROOM_FIELDS = {"desc": str, "adj": list, "required_light": bool, "items": list, "chance_enemy": (int, float),
+               "is_fragment_room": bool, "fragment_id": (int, type(None))}
+WEAPON_FIELDS = {"damage": int, "durability": int, "special": (str, type(None))}
+ENEMY_FIELDS = {"name": str, "min_hp": int, "max_hp": int, "min_dmg": int, "max_dmg": int}
+BOSS_FIELDS = {"name": str, "hp": int, "min_dmg": int, "max_dmg": int}
+
+
+class ContentError(ValueError):
+    pass
+
+
+# -------------------- VALIDATION --------------------
+def _check_fields(where: str, value, fields: Dict, problems: List[str]) -> bool:
+    if not isinstance(value, dict):
+        problems.append(f"{where}: expected an object")
+        return False
+    for key in value.keys() - fields.keys():
+        problems.append(f"{where}: unknown field {key!r}")
+    ok = True
+    for key, kind in fields.items():
+        if key not in value:
+            problems.append(f"{where}: missing {key!r}")
+            ok = False
+        elif not isinstance(value[key], kind) or (kind is int and isinstance(value[key], bool)):
+            problems.append(f"{where}: {key!r} has the wrong type ({type(value[key]).__name__})")
+            ok = False
+    return ok
+
+def validate(pack: Dict):
+    """Raise ContentError listing everything wrong with `pack` (a parsed pack file)."""
+    problems: List[str] = []
+    if not isinstance(pack, dict):
+        raise ContentError("pack: expected an object")
+    for key in pack.keys() - {"name", "rooms", "weapons", "enemies", "boss"}:
+        problems.append(f"pack: unknown section {key!r}")
+    rooms, weapons = pack.get("rooms"), pack.get("weapons")
+    if not isinstance(rooms, dict) or not rooms:
+        raise ContentError("pack: 'rooms' must be a non-empty object")
+    lower = {}
+    for name, room in rooms.items():
+        where = f"room {name!r}"
+        if name.lower() in lower:
+            problems.append(f"{where}: same name as {lower[name.lower()]!r} apart from case")
+        lower[name.lower()] = name
+        if not _check_fields(where, room, ROOM_FIELDS, problems):
+            continue
+        for exit_ in room["adj"]:
+            if exit_ not in rooms:
+                problems.append(f"{where}: exit to unknown room {exit_!r}")
+        if len(set(room["adj"])) != len(room["adj"]) or name in room["adj"]:
+            problems.append(f"{where}: repeated exit or exit to itself")
+        if not all(isinstance(item, str) for item in room["items"]):
+            problems.append(f"{where}: items must be strings")
+        if len(room["adj"]) > 0xFFFF or len(room["items"]) > 0xFFFF:
+            problems.append(f"{where}: too many exits or items")
+        if not 0 <= room["chance_enemy"] <= 1:
+            problems.append(f"{where}: chance_enemy must be between 0 and 1")
+        if room["is_fragment_room"] != (room["fragment_id"] is not None):
+            problems.append(f"{where}: fragment rooms (and only those) need a fragment_id")
+        elif room["fragment_id"] is not None and not 0 < room["fragment_id"] < 0x8000:
+            problems.append(f"{where}: fragment_id out of range")
+    for name in (START_ROOM, BOSS_ROOM):
+        if name not in rooms:
+            problems.append(f"pack: no {name!r} room")
+    if not problems:
+        seen = {START_ROOM}
+        queue = deque([START_ROOM])
+        while queue:
+            for nxt in rooms[queue.popleft()]["adj"]:
+                if nxt not in seen:
+                    seen.add(nxt)
+                    queue.append(nxt)
+        lost = [name for name in rooms if name not in seen]
+        if lost:
+            more = f" and {len(lost) - 5} more" if len(lost) > 5 else ""
+            problems.append(f"pack: {', '.join(map(repr, lost[:5]))}{more} can't be reached from {START_ROOM!r}")
+    if not isinstance(weapons, dict):
+        problems.append("pack: 'weapons' must be an object")
+    else:
+        for name, weapon in weapons.items():
+            if _check_fields(f"weapon {name!r}", weapon, WEAPON_FIELDS, problems):
+                if weapon["damage"] < 1 or weapon["durability"] < 1:
+                    problems.append(f"weapon {name!r}: damage and durability must be positive")
+    enemies = pack.get("enemies")
+    if not isinstance(enemies, list) or not enemies:
+        problems.append("pack: 'enemies' must be a non-empty list")
+    else:
+        for i, enemy in enumerate(enemies):
+            if _check_fields(f"enemy {i}", enemy, ENEMY_FIELDS, problems):
+                if not 0 < enemy["min_hp"] <= enemy["max_hp"] or not 0 <= enemy["min_dmg"] <= enemy["max_dmg"]:
+                    problems.append(f"enemy {enemy['name']!r}: min above max, or not positive")
+    boss = pack.get("boss")
+    if _check_fields("boss", boss, BOSS_FIELDS, problems):
+        if boss["hp"] < 1 or not 0 <= boss["min_dmg"] <= boss["max_dmg"]:
+            problems.append("boss: hp must be positive and min_dmg <= max_dmg")
+    if problems:
+        raise ContentError("invalid content pack:\n  " + "\n  ".join(problems))
+
+
+# -------------------- COMPILER --------------------
+class _Strings:
+    """String table under construction: every distinct string once."""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.text = bytearray()
+        self.offsets = array("I", [0])
+
+    def add(self, text: Optional[str]) -> int:
+        if text is None:
+            return NONE
+        sid = self.ids.get(text)
+        if sid is None:
+            sid = self.ids[text] = len(self.offsets) - 1
+            self.text += text.encode()
+            self.offsets.append(len(self.text))
+        return sid
+
+def _le(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+def _name_key(name: str) -> int:
+    return zlib.crc32(name.lower().encode())
+
+def compile_pack(pack: Dict, source: Tuple[int, int] = (0, 0)) -> bytes:
+    """Validate `pack` and build its snapshot; `source` is the pack file's (size, mtime_ns)."""
+    validate(pack)
+    strings = _Strings()
+    rooms = pack["rooms"]
+    names = list(rooms)
+    ids = {name: i for i, name in enumerate(names)}
+    records, exits, loot, dark = bytearray(), array("I"), array("I"), bytearray()
+    for name in names:
+        room = rooms[name]
+        flags = (LIGHT if room["required_light"] else 0) | (FRAGMENT if room["is_fragment_room"] else 0)
+        fragment = -1 if room["fragment_id"] is None else room["fragment_id"]
+        records += ROOM.pack(strings.add(name), strings.add(room["desc"]), len(exits), len(loot),
+                             len(room["adj"]), len(room["items"]), room["chance_enemy"], flags, fragment)
+        exits.extend(ids[n] for n in room["adj"])
+        loot.extend(strings.add(item) for item in room["items"])
+        dark.append(room["required_light"])
+    slots = 8
+    while slots < 2 * len(names):
+        slots *= 2
+    index = array("I", [0]) * slots
+    for i, name in enumerate(names):
+        slot = _name_key(name) & (slots - 1)
+        while index[slot]:
+            slot = (slot + 1) & (slots - 1)
+        index[slot] = i + 1
+    items = array("I", (strings.add(item) for item in sorted({item for r in rooms.values() for item in r["items"]})))
+    weapons = b"".join(WEAPON.pack(strings.add(name), w["damage"], w["durability"], strings.add(w["special"]))
+                       for name, w in pack["weapons"].items())
+    enemies = b"".join(ENEMY.pack(strings.add(e["name"]), e["min_hp"], e["max_hp"], e["min_dmg"], e["max_dmg"])
+                       for e in pack["enemies"])
+    boss = pack["boss"]
+    boss = BOSS.pack(strings.add(boss["name"]), boss["hp"], boss["min_dmg"], boss["max_dmg"])
+    pack_name = strings.add(pack.get("name"))
+    sections = [_le(strings.offsets), bytes(strings.text), bytes(records), _le(exits), _le(loot), bytes(dark),
+                _le(index), _le(items), weapons, enemies, boss]
+    offsets, at = [], HEADER.size
+    for data in sections:
+        at += -at % 8  # keep every section 8-byte aligned
+        offsets.append(at)
+        at += len(data)
+    names_crc = zlib.crc32("\0".join(names).encode())
+    out = bytearray(HEADER.pack(MAGIC, VERSION, source[0], source[1], names_crc, len(strings.offsets) - 1,
+                                len(names), len(items), len(pack["weapons"]), len(pack["enemies"]), slots, pack_name,
+                                *offsets))
+    for offset, data in zip(offsets, sections):
+        out += bytes(offset - len(out))
+        out += data
+    return bytes(out)
+
+
+# -------------------- SNAPSHOT --------------------
+class Snapshot:
+    """A compiled pack, read straight from its bytes (normally a read-only mmap)."""
+
+    def __init__(self, buf):
+        if len(buf) < HEADER.size:
+            raise ContentError("not a content snapshot")
+        fields = HEADER.unpack_from(buf, 0)
+        magic, version, size, mtime, self.names_crc = fields[:5]
+        if magic != MAGIC or version != VERSION:
+            raise ContentError(f"unsupported content snapshot {magic!r} v{version}")
+        self.buf = buf
+        self.source = (size, mtime)
+        _, self.room_count, n_items, n_weapons, n_enemies, self.index_slots, pack_name = fields[5:12]
+        self.offsets = dict(zip(SECTIONS, fields[12:]))
+        self._strings: Dict[int, str] = {}
+        at = self.offsets["weapons"]
+        weapons = {}
+        for _ in range(n_weapons):
+            name, damage, durability, special = WEAPON.unpack_from(buf, at)
+            weapons[self.string(name)] = MappingProxyType(
+                {"damage": damage, "durability": durability, "special": self.string(special)})
+            at += WEAPON.size
+        self.weapons = MappingProxyType(weapons)
+        at = self.offsets["enemies"]
+        enemies = []
+        for _ in range(n_enemies):
+            name, min_hp, max_hp, min_dmg, max_dmg = ENEMY.unpack_from(buf, at)
+            enemies.append(MappingProxyType({"name": self.string(name), "min_hp": min_hp, "max_hp": max_hp,
+                                             "min_dmg": min_dmg, "max_dmg": max_dmg}))
+            at += ENEMY.size
+        self.enemies = tuple(enemies)
+        boss, hp, min_dmg, max_dmg = BOSS.unpack_from(buf, self.offsets["boss"])
+        self.boss = MappingProxyType({"name": self.string(boss), "hp": hp, "min_dmg": min_dmg, "max_dmg": max_dmg})
+        self.name = self.string(pack_name)
+        at = self.offsets["items"]
+        self.item_names = tuple(self.string(sid) for sid in struct.unpack_from(f"<{n_items}I", buf, at))
+        self.rooms = PackRooms(self)
+
+    def string(self, sid: int) -> Optional[str]:
+        """String `sid` from the table, decoded and interned once."""
+        if sid == NONE:
+            return None
+        text = self._strings.get(sid)
+        if text is None:
+            start, end = struct.unpack_from("<II", self.buf, self.offsets["strings"] + 4 * sid)
+            text = self._strings[sid] = sys.intern(str(self.buf[self.offsets["text"] + start:
+                                                                 self.offsets["text"] + end], "utf-8"))
+        return text
+
+def open_snapshot(path: str) -> Snapshot:
+    with open(path, "rb") as f:
+        return Snapshot(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+class PackRooms(Mapping):
+    """Room name -> room dict, decoded from the snapshot on first access and cached."""
+
+    def __init__(self, snapshot: Snapshot):
+        self._snap = snapshot
+        self.size = snapshot.room_count
+        self.names = _RoomNames(self)
+        self.item_names = snapshot.item_names
+        self.names_crc = snapshot.names_crc
+        offsets = snapshot.offsets
+        self.dark = memoryview(snapshot.buf)[offsets["dark"]:offsets["dark"] + self.size]
+        self.adjacency = _Exits(self)
+        self._rooms: Dict[str, Mapping] = {}
+        self._ids: Dict[str, int] = {}    # names looked up so far (the hash index is only read once per name)
+        self._names: Dict[int, str] = {}
+        self._all: Optional[Tuple[str, ...]] = None  # every name, once something iterates them all
+
+    def _record(self, i: int) -> tuple:
+        return ROOM.unpack_from(self._snap.buf, self._snap.offsets["rooms"] + ROOM.size * i)
+
+    def room_name(self, i: int) -> str:
+        name = self._names.get(i)
+        if name is None:
+            name = self._names[i] = self._snap.string(self._record(i)[0])
+        return name
+
+    def room_id(self, name: str) -> Optional[int]:
+        i = self._ids.get(name)
+        if i is None:
+            i = self._find(name)
+            if i is None or self.room_name(i) != name:
+                return None
+            self._ids[name] = i
+        return i
+
+    def resolve(self, lower: str) -> Optional[str]:
+        """Room name for a lower-cased name, or None (room names are unique ignoring case)."""
+        i = self._find(lower)
+        return None if i is None else self.room_name(i)
+
+    def _find(self, name: str) -> Optional[int]:
+        buf, base, mask = self._snap.buf, self._snap.offsets["index"], self._snap.index_slots - 1
+        lower = name.lower()
+        slot = _name_key(name) & mask
+        while True:
+            (entry,) = U32.unpack_from(buf, base + 4 * slot)
+            if not entry:
+                return None
+            if self.room_name(entry - 1).lower() == lower:
+                return entry - 1
+            slot = (slot + 1) & mask
+
+    def _materialize(self, i: int) -> Mapping:
+        snap = self._snap
+        _, desc, first_exit, first_item, n_exits, n_items, chance, flags, fragment = self._record(i)
+        items = struct.unpack_from(f"<{n_items}I", snap.buf, snap.offsets["loot"] + 4 * first_item)
+        return MappingProxyType({
+            "desc": snap.string(desc),
+            "adj": tuple(map(self.room_name, self.adjacency[i])),
+            "required_light": bool(flags & LIGHT),
+            "items": tuple(map(snap.string, items)),
+            "chance_enemy": chance,
+            "is_fragment_room": bool(flags & FRAGMENT),
+            "fragment_id": None if fragment < 0 else fragment,
+        })
+
+    def __getitem__(self, name: str) -> Mapping:
+        room = self._rooms.get(name)
+        if room is None:
+            i = self.room_id(name)
+            if i is None:
+                raise KeyError(name)
+            room = self._rooms[name] = self._materialize(i)
+        return room
+
+    def __contains__(self, name) -> bool:
+        return name in self._rooms or (isinstance(name, str) and self.room_id(name) is not None)
+
+    def __iter__(self) -> Iterator[str]:
+        if self._all is None:
+            self._all = tuple(map(self.room_name, range(self.size)))
+        return iter(self._all)
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def materialized(self) -> int:
+        return len(self._rooms)
+
+
+class _RoomNames(Sequence):
+    __slots__ = ("_rooms",)
+
+    def __init__(self, rooms: PackRooms):
+        self._rooms = rooms
+
+    def __len__(self) -> int:
+        return self._rooms.size
+
+    def __getitem__(self, i: int) -> str:
+        if not 0 <= i < self._rooms.size:
+            raise IndexError(i)
+        return self._rooms.room_name(i)
+
+
+class _Exits(Sequence):
+    """Room ID -> tuple of adjacent room IDs, read from the snapshot."""
+    __slots__ = ("_rooms",)
+
+    def __init__(self, rooms: PackRooms):
+        self._rooms = rooms
+
+    def __len__(self) -> int:
+        return self._rooms.size
+
+    def __getitem__(self, i: int) -> Tuple[int, ...]:
+        record = self._rooms._record(i)
+        snap = self._rooms._snap
+        return struct.unpack_from(f"<{record[4]}I", snap.buf, snap.offsets["exits"] + 4 * record[2])
+
+
+# -------------------- BUILD & LOAD --------------------
+def read_pack(path: str) -> Dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def snapshot_path(pack_path: str) -> str:
+    return os.path.splitext(pack_path)[0] + SNAPSHOT_SUFFIX
+
+def _stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+def build(pack_path: str, out_path: Optional[str] = None) -> str:
+    """Validate and compile a pack file; the snapshot replaces the old one atomically."""
+    out_path = out_path or snapshot_path(pack_path)
+    data = compile_pack(read_pack(pack_path), _stamp(pack_path))
+    directory = os.path.dirname(os.path.abspath(out_path))
+    fd, tmp = tempfile.mkstemp(prefix=".content-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, out_path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return out_path
+
+def load(pack_path: str = DEFAULT_PACK) -> Snapshot:
+    """Map the pack's snapshot, compiling it first if it is missing or older than the pack.
+    A snapshot without its pack file is used as it is."""
+    path = snapshot_path(pack_path)
+    source = _stamp(pack_path)
+    try:
+        snap = open_snapshot(path)
+        if source is None or snap.source == source:
+            return snap
+    except (OSError, ValueError):  # missing, empty or not a snapshot (ContentError)
+        if source is None:
+            raise
+    try:
+        return open_snapshot(build(pack_path, path))
+    except OSError:
+        # Can't write next to the pack (read-only install): compile in memory instead.
+        return Snapshot(compile_pack(read_pack(pack_path), source))
+
+
+# -------------------- STARTUP BENCHMARK --------------------
+def extend_pack(pack: Dict, rooms: int, seed: int = 13) -> Dict:
+    """A copy of `pack` grown to `rooms` rooms: new rooms branch off existing ones."""
+    rng = random.Random(seed)
+    grown = json.loads(json.dumps(pack))
+    table = grown["rooms"]
+    names = list(table)
+    descs = [room["desc"] for room in table.values()]
+    items = sorted({item for room in table.values() for item in room["items"]
+                    if not item.startswith("Map Fragment") and item != "Master Key"})
+    for n in range(len(table), rooms):
+        name = f"Room {1000 + n}"
+        parent = names[max(0, len(names) - 1 - int(rng.expovariate(0.2)))]
+        if parent == BOSS_ROOM:
+            parent = START_ROOM
+        table[parent]["adj"].append(name)
+        table[name] = {"desc": rng.choice(descs), "adj": [parent], "required_light": rng.random() < 0.45,
+                       "items": [rng.choice(items)] if rng.random() < 0.3 else [],
+                       "chance_enemy": round(rng.uniform(0.2, 0.6), 2), "is_fragment_room": False,
+                       "fragment_id": None}
+        names.append(name)
+    return grown
+
+def _best(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def benchmark(sizes: List[int], pack_path: str = DEFAULT_PACK) -> List[Dict[str, float]]:
+    """Per pack size: time from nothing to a template with the Lobby and its exits readable,
+    parsing the JSON pack vs mapping its snapshot, plus the first path search on the mapped pack."""
+    import world
+    base = read_pack(pack_path)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            path = os.path.join(tmp, f"pack-{size}.json")
+            with open(path, "w") as f:
+                json.dump(extend_pack(base, size), f)
+            compile_time = _best(lambda: build(path), 1)
+
+            def first_look(template):
+                rooms = template.rooms
+                for name in rooms[START_ROOM]["adj"]:
+                    rooms[name]["desc"]
+                return template
+
+            def parsed():
+                pack = read_pack(path)
+                validate(pack)
+                return first_look(world.WorldTemplate(pack["rooms"], pack["weapons"], pack["enemies"], pack["boss"]))
+
+            def mapped():
+                snap = load(path)
+                return first_look(world.WorldTemplate(snap.rooms, snap.weapons, snap.enemies, snap.boss))
+
+            graph = mapped().graph
+            results.append({"rooms": size, "pack_kb": os.path.getsize(path) / 1024,
+                            "snapshot_kb": os.path.getsize(snapshot_path(path)) / 1024,
+                            "compile_ms": compile_time * 1000, "parse_ms": _best(parsed) * 1000,
+                            "map_ms": _best(mapped) * 1000,
+                            "path_ms": _best(lambda: graph._bfs(graph.ids(START_ROOM), True)) * 1000})
+    return results
+
+def cli():
+    parser = argparse.ArgumentParser(description="Floor 13 content pack compiler")
+    parser.add_argument("packs", nargs="*", default=[DEFAULT_PACK])
+    parser.add_argument("--check", action="store_true", help="validate only, write nothing")
+    parser.add_argument("--bench", action="store_true", help="startup time against pack size")
+    parser.add_argument("--sizes", default="16,1000,10000,100000")
+    args = parser.parse_args()
+    if args.bench:
+        results = benchmark([int(n) for n in args.sizes.split(",")])
+        print("Startup to a playable template: parse JSON + validate  vs  map the snapshot (best of 3)")
+        print(f"{'rooms':>8}{'pack':>10}{'snapshot':>10}{'compile':>10}{'parse':>10}{'map':>10}{'speedup':>9}"
+              f"{'1st path':>10}")
+        for r in results:
+            print(f"{r['rooms']:>8}{r['pack_kb']:>8.0f}KB{r['snapshot_kb']:>8.0f}KB{r['compile_ms']:>8.1f}ms"
+                  f"{r['parse_ms']:>8.1f}ms{r['map_ms']:>8.2f}ms{r['parse_ms'] / r['map_ms']:>8.0f}x"
+                  f"{r['path_ms']:>8.1f}ms")
+        print("1st path: the BFS the first travel/path query from a room runs over the mapped pack")
+        return
+    failed = False
+    for path in args.packs:
+        try:
+            if args.check:
+                validate(read_pack(path))
+                print(f"{path}: ok")
+            else:
+                snap = open_snapshot(build(path))
+                print(f"{path} -> {snapshot_path(path)}: {snap.rooms.size} rooms, {len(snap.weapons)} weapons, "
+                      f"{len(snap.enemies)} enemies, {len(snap.buf)} bytes")
+        except (OSError, ValueError) as e:  # ContentError and JSON syntax errors are ValueErrors
+            print(f"{path}: {e}", file=sys.stderr)
+            failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    cli()
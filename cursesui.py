@@ -0,0 +1,369 @@
+"""
+FLOOR 13 - Curses front end
+Full-screen play (main.py --curses) instead of the scrolling console:
+- a fixed status bar (room, HP, weapon, flashlight, fragments, key) and the
+  actions line under it, instead of the status block printed every turn
+- a mini-map of the visited rooms under it (the map tree, flowed into
+  columns; clipped around the player when it does not fit), then a scrolling
+  narrative pane (PgUp / PgDn scroll back)
+- text appears at once; there is no typewriter
+- redraws are diffed: every status, map and input row remembers what it last
+  drew and is only rewritten when it changed, curses then sends only the
+  changed cells, and new narrative lines scroll the full-width pane with the
+  terminal's scroll region (idlok) instead of repainting it
+- timed events, saves, --record and --history work as in the console game
+
+Usage: python main.py --curses [--seed N] [--save FILE] ...
+       python cursesui.py --bench [--speed 1]   (terminal output per command, console vs curses, on a pty)
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import select
+import signal
+import sys
+import tempfile
+import textwrap
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import curses
+except ImportError:  # Windows without the windows-curses package
+    curses = None
+
+import main
+import render
+
+MAP_ROWS = 6
+MAP_COLUMN = 36  # width of one column of the map tree
+MAP_MIN_LINES = 20  # shorter terminals get no mini-map
+SCROLLBACK = 2000  # narrative lines kept for PgUp
+HERE = "  <- you are here"
+
+
+class CursesIO:
+    """The game's console (say / prompt / ask) drawn into curses windows."""
+    status_panel = True  # main.play() leaves the status block and actions line to us
+
+    def __init__(self, stdscr):
+        self.scr = stdscr
+        self.s: Optional[main.Session] = None
+        self.history: deque = deque(maxlen=SCROLLBACK)  # wrapped narrative lines
+        self.incoming: List[str] = []  # said, not drawn yet
+        self.prompt_text = ""
+        self.typed = ""
+        self.back = 0  # lines scrolled back
+        self.lines: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+        self.dirty = asyncio.Event()
+        self.drawn: Dict[Tuple[str, int], Tuple[str, int]] = {}
+        self.layout()
+
+    # -------------------- CONSOLE API --------------------
+    def say(self, text: str, delay: float = 0.0):
+        self.incoming.extend(text.split("\n"))
+        self.dirty.set()
+
+    def prompt(self, text: str):
+        self.prompt_text = text.strip("\n")
+        self.dirty.set()
+
+    async def ask(self, prompt: str = "") -> str:
+        self.prompt(prompt)
+        line = await self.lines.get()
+        if line is None:
+            self.lines.put_nowait(None)  # stay closed for later asks
+            raise EOFError
+        return line
+
+    def feed(self, line: str):
+        self.incoming.append(self.prompt_text + line)  # the transcript keeps what was typed
+        self.lines.put_nowait(line)
+        self.dirty.set()
+
+    def close_input(self):
+        self.lines.put_nowait(None)
+
+    async def drain(self):
+        self.draw()
+
+    # -------------------- LAYOUT --------------------
+    def layout(self):
+        """(Re)build the windows for the current terminal size; everything is repainted."""
+        height, width = self.size = self.scr.getmaxyx()
+        self.width = self.pane_width = width
+        map_rows = MAP_ROWS + 1 if height >= MAP_MIN_LINES else 0  # and a rule under it
+        self.pane_height = max(1, height - 3 - map_rows)
+        self.scr.erase()
+        self.scr.noutrefresh()
+        self.bar = curses.newwin(2, width, 0, 0)
+        self.map = curses.newwin(map_rows, width, 2, 0) if map_rows else None
+        self.pane = curses.newwin(self.pane_height, width, 2 + map_rows, 0)
+        self.pane.scrollok(True)
+        self.pane.idlok(True)
+        self.input = curses.newwin(1, width, height - 1, 0)
+        self.drawn.clear()
+        self.repaint = True
+
+    def _put(self, win, name: str, row: int, text: str, attr: int = 0):
+        """Write one row of a window unless it already shows exactly this."""
+        width = win.getmaxyx()[1]
+        text = text[:width - 1].ljust(width - 1)
+        if self.drawn.get((name, row)) == (text, attr):
+            return
+        self.drawn[(name, row)] = (text, attr)
+        win.addstr(row, 0, text, attr)
+        win.noutrefresh()
+
+    # -------------------- DRAWING --------------------
+    def draw(self):
+        self._narrative()
+        player = self.s.player if self.s else None
+        if player is not None:
+            self._status(player)
+            if self.map is not None:
+                self._map(player)
+        self._input()
+        curses.doupdate()
+
+    def _narrative(self):
+        wrapped = []
+        for line in self.incoming:
+            wrapped += textwrap.wrap(line, self.pane_width - 1) or [""]
+        self.incoming = []
+        self.history.extend(wrapped)
+        if self.back:
+            self.back += len(wrapped)  # keep looking at the same lines
+        if self.repaint or self.back:
+            end = len(self.history) - self.back
+            rows = list(self.history)[max(0, end - self.pane_height):end]
+            self.pane.erase()
+            for row, line in enumerate(rows, self.pane_height - len(rows)):
+                self.pane.addstr(row, 0, line[:self.pane_width - 1])
+            self.repaint = False
+        else:
+            for line in wrapped[-self.pane_height:]:
+                self.pane.scroll(1)
+                self.pane.addstr(self.pane_height - 1, 0, line[:self.pane_width - 1])
+        if wrapped or self.back or self.repaint:
+            self.pane.noutrefresh()
+
+    def _status(self, player):
+        # fixed-width numbers, so a changed value rewrites its digits and not the rest of the bar
+        light = f"{'ON ' if player.flashlight_on else 'off'} {player.flashlight_battery:>3}%"
+        bar = (f" {player.location} | HP {player.health:>3}/{player.max_health} | {player.weapon or 'no weapon'}"
+               f" | Light {light} | Fragments {player.map_fragments_found}/{main.FRAGMENTS_REQUIRED}"
+               f" | Key {'yes' if player.has_master_key else 'no'}")
+        self._put(self.bar, "bar", 0, bar, curses.A_REVERSE)
+        turn = self.s.fight
+        if turn is not None:
+            actions = f" {main.foe_name(turn)} HP {turn.enemy_hp:>3} | {main.fight_actions(turn)}"
+        else:
+            actions = main.ACTIONS
+        if self.back:
+            actions = f"-- {self.back} lines back (PgDn) -- " + actions
+        self._put(self.bar, "bar", 1, actions, curses.A_DIM)
+
+    def _map(self, player):
+        """The map tree down the columns of the strip; the player's room is bold and marked *."""
+        lines = self.s.graph.render(player.visited_rooms, player.location, reveal_all=player.map_unlocked)
+        here = next((i for i, line in enumerate(lines) if line.endswith(HERE)), 0)
+        columns = max(1, self.width // MAP_COLUMN)
+        fits = MAP_ROWS * columns
+        top = max(0, min(here - fits // 2, len(lines) - fits))
+        for row in range(MAP_ROWS):
+            cells, bold = [], None
+            for column in range(columns):
+                i = top + column * MAP_ROWS + row
+                line = lines[i] if i < len(lines) else ""
+                if i == here and line.endswith(HERE):
+                    line, bold = line[:-len(HERE)] + " *", column
+                cells.append((" " + line)[:MAP_COLUMN - 1].ljust(MAP_COLUMN))
+            self._put(self.map, "map", row, "".join(cells))
+            if bold is not None:  # cell attributes only; the text is already there
+                self.map.chgat(row, bold * MAP_COLUMN, MAP_COLUMN - 1, curses.A_BOLD)
+                self.map.noutrefresh()
+        self._put(self.map, "map", MAP_ROWS, "-" * self.width, curses.A_DIM)
+
+    def _input(self):
+        text = self.prompt_text + self.typed
+        self._put(self.input, "input", 0, text)
+        self.input.move(0, min(len(text), self.width - 2))
+        self.input.noutrefresh()
+
+    async def redraw(self):
+        """Redraw task: one draw per batch of changes."""
+        while True:
+            await self.dirty.wait()
+            self.dirty.clear()
+            self.draw()
+
+    def resize(self):
+        """The terminal changed size: tell curses, rebuild the windows, repaint."""
+        width, height = os.get_terminal_size(sys.stdout.fileno())
+        curses.resizeterm(height, width)
+        self.layout()
+        self.dirty.set()
+
+    # -------------------- KEYS --------------------
+    def on_keys(self):
+        """stdin is readable: take every key curses has."""
+        while True:
+            try:
+                key = self.scr.get_wch()
+            except curses.error:
+                break
+            if key in ("\n", "\r") or key == curses.KEY_ENTER:
+                line, self.typed = self.typed, ""
+                if self.back:  # scrolled back: jump to the bottom again
+                    self.back = 0
+                    self.repaint = True
+                self.feed(line)
+            elif key in ("\x7f", "\b") or key == curses.KEY_BACKSPACE:
+                self.typed = self.typed[:-1]
+            elif key == "\x04" and not self.typed:  # Ctrl-D
+                self.close_input()
+            elif key == curses.KEY_PPAGE:
+                self.back = min(self.back + self.pane_height - 1, max(0, len(self.history) - self.pane_height))
+            elif key == curses.KEY_NPAGE and self.back:
+                self.back = max(0, self.back - self.pane_height + 1)
+                self.repaint = True
+            elif key == curses.KEY_RESIZE and self.scr.getmaxyx() != self.size:  # resizeterm() queues one too
+                self.layout()
+            elif isinstance(key, str) and key.isprintable():
+                self.typed += key
+        self.dirty.set()
+
+
+# -------------------- GAME --------------------
+async def run_game(stdscr, world, manager, recorder=None, history_db=None, seed: int = None) -> Tuple[Optional[str], List[str]]:
+    """The console game's run_console_game(), on curses; returns the ending and the last lines said."""
+    loop = asyncio.get_running_loop()
+    io = CursesIO(stdscr)
+    s = io.s = main.Session(io, world, manager, seed=seed, recorder=recorder, history_db=history_db)
+    loop.add_reader(sys.stdin.fileno(), io.on_keys)
+    if hasattr(signal, "SIGWINCH"):  # curses only notices a resize on the next key otherwise
+        loop.add_signal_handler(signal.SIGWINCH, io.resize)
+    tasks = [asyncio.create_task(io.redraw()),
+             asyncio.create_task(main.flashlight_timer(s)),
+             asyncio.create_task(main.ambient_events(s))]
+    ending = None
+    try:
+        await main.play(s)
+    except main.GameOver as over:
+        ending = over.ending
+        try:
+            await io.ask("(Press Enter to leave)")
+        except EOFError:
+            pass
+    except EOFError:
+        manager.flush()
+    finally:
+        loop.remove_reader(sys.stdin.fileno())
+        if hasattr(signal, "SIGWINCH"):
+            loop.remove_signal_handler(signal.SIGWINCH)
+        if recorder:
+            recorder.finish(s, ending)
+        for task in tasks:
+            task.cancel()
+    io.draw()
+    return ending, list(io.history)[-8:]
+
+def run(world, manager, recorder=None, history_db=None, seed: int = None) -> Optional[str]:
+    if curses is None:
+        sys.exit("curses is not available here (on Windows: pip install windows-curses); play without --curses.")
+    stdscr = curses.initscr()
+    try:
+        curses.noecho()
+        curses.cbreak()
+        stdscr.keypad(True)
+        stdscr.nodelay(True)
+        ending, last = asyncio.run(run_game(stdscr, world, manager, recorder, history_db, seed))
+    finally:
+        curses.nocbreak()
+        stdscr.keypad(False)
+        curses.echo()
+        curses.endwin()
+    print("\n".join(last))  # the ending stays in the terminal's scrollback
+    return ending
+
+
+# -------------------- BENCHMARK --------------------
+BENCH_INPUT = ["", "map", "inventory", "", "auto-explore"] + ["a", "a", "h", "a", "a", "a"] * 3 + ["flashlight", "map"] * 2
+CONTROL = re.compile(rb"\x1b(\[[0-9;?]*[A-Za-z@]|[()][AB0]|[=>])|[\r\n\x08]")  # cursor moves, attributes, line ends
+
+def _read_quiet(fd: int, quiet: float) -> Tuple[int, int, int]:
+    """Read what the game writes until it has been silent for `quiet` seconds: (bytes, text bytes, reads)."""
+    total = text = reads = 0
+    while select.select([fd], [], [], quiet)[0]:
+        try:
+            chunk = os.read(fd, 65536)
+        except OSError:
+            break
+        if not chunk:
+            break
+        total += len(chunk)
+        text += len(CONTROL.sub(b"", chunk))
+        reads += 1
+    return total, text, reads
+
+def measure(args: List[str], lines: List[str], speed: float, size: Tuple[int, int] = (32, 110),
+            quiet: float = 0.3) -> Tuple[int, int, int, int]:
+    """Play `lines` in a child `main.py args` on a pty: (bytes, text bytes, writes, commands) after the first screen.
+    Writes are counted as the reads that drain them, which is one each while the game types slowly."""
+    import fcntl
+    import pty
+    import struct
+    import termios
+    pid, fd = pty.fork()
+    if pid == 0:
+        os.environ.update(TERM="xterm", FLOOR13_SPEED=str(speed))
+        os.execv(sys.executable, [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")] + args)
+    fcntl.ioctl(fd, termios.TIOCSWINSZ, struct.pack("HHHH", size[0], size[1], 0, 0))
+    _read_quiet(fd, 1.0)  # startup and the intro screen
+    total = text = writes = sent = 0
+    for line in lines:
+        try:
+            os.write(fd, (line + "\r").encode())
+        except OSError:
+            break  # the game ended
+        sent += 1
+        size_read, text_read, reads = _read_quiet(fd, quiet)
+        total += size_read
+        text += text_read
+        writes += reads
+    try:
+        os.kill(pid, 9)
+    except OSError:
+        pass
+    os.waitpid(pid, 0)
+    os.close(fd)
+    return total, text, writes, sent
+
+def cli():
+    parser = argparse.ArgumentParser(description="Floor 13 curses front end")
+    parser.add_argument("--bench", action="store_true", help="terminal output per command: console vs curses")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--speed", type=float, default=render.get_speed(), help="the console's text speed (0: instant)")
+    args = parser.parse_args()
+    if not args.bench:
+        parser.error("play with: python main.py --curses (this module only runs the benchmark)")
+    print(f"{len(BENCH_INPUT)} commands, seed {args.seed}, console text speed {args.speed:g}")
+    print(f"{'':<9}{'bytes/cmd':>10}{'text/cmd':>9}{'writes/cmd':>11}")
+    payload = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("console", "curses"):
+            extra = ["--curses"] if mode == "curses" else []
+            save = os.path.join(tmp, mode + ".dat")
+            total, text, writes, sent = measure(["--seed", str(args.seed), "--save", save] + extra, BENCH_INPUT, args.speed)
+            sent = max(sent, 1)
+            payload[mode] = total / sent
+            print(f"{mode:<9}{payload[mode]:>10.0f}{text / sent:>9.0f}{writes / sent:>11.1f}")
+    print(f"curses: {payload['console'] / max(payload['curses'], 1):.1f}x fewer terminal bytes per command "
+          f"(payload only; transport overhead per write is not counted)")
+    print("text/cmd is the printable part: the narrative both front ends must send, plus the console's status block")
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,187 @@
+"""
+FLOOR 13 - Fight outcome table
+For every enemy x every weapon (plus fists) of a template, and every
+durability the weapon can have left, estimates the distribution of:
+- turns to kill
+- player damage taken
+- weapon durability used
+for a player who attacks every turn. Trials are computed in NumPy batches:
+damage rolls are drawn as (trials, turns) arrays and reduced with cumulative
+sums, so no Python loop runs per fight; every durability level of a weapon
+reuses the same draws. Durability beyond the most weapon hits a fight can
+take changes nothing, so levels stop there.
+
+Tables are cached in memory (also per world template, so a fight never hashes
+the stats again) and in FIGHT_TABLE_FILE in main.CACHE_DIR, keyed by a hash
+of the template's stat dicts (the hotel's by default, like solver.py).
+Reading one (threat_estimate) never needs NumPy.
+
+Usage: python fightstats.py [--trials 200000] [--rebuild]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import main
+import world
+from combat import FIST_DMG, WEAPON_BONUS
+
+FIGHT_TABLE_FILE = "fight-table-{key}.json"
+FISTS = "Fists"
+TRIALS = 200000
+SEED = 13
+VERSION = 2
+
+_tables: Dict[str, Dict] = {}
+_by_template: Dict[int, Tuple[object, Optional[Dict]]] = {}  # id(template) -> (template, table)
+_unavailable = False
+
+# -------------------- CACHE KEY --------------------
+def fight_stats(enemies=None, weapons=None) -> Dict:
+    """Plain copies of what the table depends on (the main template by default)."""
+    return {"enemies": world.thaw(main.ENEMY_TYPES if enemies is None else enemies),
+            "weapons": {name: {"damage": w["damage"], "durability": w["durability"]}
+                        for name, w in (main.WEAPONS if weapons is None else weapons).items()}}
+
+def stats_key(stats: Dict) -> str:
+    rules = {"fists": FIST_DMG, "bonus": WEAPON_BONUS, "version": VERSION}
+    return hashlib.sha256(json.dumps([stats, rules], sort_keys=True).encode()).hexdigest()[:16]
+
+# -------------------- VECTORIZED ESTIMATOR --------------------
+def _histogram(np, values) -> List[float]:
+    counts = np.bincount(values)
+    return (counts / len(values)).round(6).tolist()
+
+def estimate_pair(np, rng, enemy: Dict, damage: int, durability: int, trials: int) -> List[Dict]:
+    """Outcome distributions for one enemy against one weapon (damage=0 for fists),
+    one per durability left: 0 (fists all the way), 1, ... up to the most any fight can use."""
+    fist_lo, fist_hi = FIST_DMG
+    if damage:
+        per_turn_min = min(damage + WEAPON_BONUS[0], fist_lo)
+    else:
+        per_turn_min = fist_lo
+        durability = 0
+    max_turns = -(-enemy["max_hp"] // per_turn_min)
+
+    hp = rng.integers(enemy["min_hp"], enemy["max_hp"], size=trials, endpoint=True)
+    turn_index = np.arange(max_turns)
+    weapon_hits = damage + rng.integers(WEAPON_BONUS[0], WEAPON_BONUS[1], size=(trials, max_turns), endpoint=True)
+    fist_hits = rng.integers(fist_lo, fist_hi, size=(trials, max_turns), endpoint=True)
+    # The enemy strikes back after every player attack that does not kill it.
+    strikes = rng.integers(enemy["min_dmg"], enemy["max_dmg"], size=(trials, max_turns), endpoint=True)
+
+    rows = []
+    # A weapon hit deals at least `damage`, so no fight uses more durability than this.
+    levels = min(durability, -(-enemy["max_hp"] // damage)) if damage else 0
+    for left in range(levels + 1):
+        dealt = np.where(turn_index < left, weapon_hits, fist_hits).cumsum(axis=1)
+        turns = (dealt >= hp[:, None]).argmax(axis=1) + 1
+        taken = np.where(turn_index < (turns - 1)[:, None], strikes, 0).sum(axis=1)
+        used = np.minimum(turns, left)
+        rows.append({
+            "turns": _histogram(np, turns),
+            "damage": _histogram(np, taken),
+            "durability": _histogram(np, used),
+            "turns_mean": round(float(turns.mean()), 3),
+            "damage_mean": round(float(taken.mean()), 3),
+            "durability_mean": round(float(used.mean()), 3),
+            # lethal[h] = P(damage taken >= h), the chance a player at h HP dies.
+            "lethal": np.concatenate(([1.0], 1.0 - np.cumsum(np.bincount(taken) / trials))).clip(0, 1).round(6).tolist(),
+        })
+    return rows
+
+def build_table(stats: Dict = None, trials: int = TRIALS, seed: int = SEED) -> Dict:
+    import numpy as np
+
+    stats = stats or fight_stats()
+    rng = np.random.default_rng(seed)
+    pairs = {}
+    arms = [(FISTS, 0, 0)] + [(name, w["damage"], w["durability"]) for name, w in stats["weapons"].items()]
+    for enemy in stats["enemies"]:
+        pairs[enemy["name"]] = {name: estimate_pair(np, rng, enemy, dmg, dur, trials) for name, dmg, dur in arms}
+    return {"key": stats_key(stats), "trials": trials, "pairs": pairs}
+
+# -------------------- CACHE --------------------
+def load_table(stats: Dict = None, rebuild: bool = False) -> Optional[Dict]:
+    """Memory cache -> disk cache -> build (needs NumPy). None if nothing is available."""
+    global _unavailable
+    stats = stats or fight_stats()
+    key = stats_key(stats)
+    if not rebuild and key in _tables:
+        return _tables[key]
+    path = main.cache_path(FIGHT_TABLE_FILE.format(key=key))
+    if not rebuild and os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            if data.get("key") == key:
+                _tables[key] = data
+                return data
+        except (OSError, ValueError):
+            pass
+    if _unavailable:
+        return None
+    try:
+        data = build_table(stats)
+    except ImportError:
+        _unavailable = True
+        return None
+    _save(data, path)
+    _tables[key] = data
+    return data
+
+def _save(data: Dict, path: str):
+    tmp = f"{path}.{os.getpid()}.tmp"  # concurrent runs each write their own, then replace
+    try:
+        with open(tmp, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+def table_for(template) -> Optional[Dict]:
+    """load_table() for a world template, memoized per template."""
+    known = _by_template.get(id(template))
+    if known is None or known[0] is not template:
+        known = _by_template[id(template)] = (template, load_table(fight_stats(template.enemies, template.weapons)))
+    return known[1]
+
+def threat_estimate(enemy_name: str, weapon: Optional[str], health: int, durability: int = None,
+                    template=None) -> Optional[Dict]:
+    """O(1) lookup: chance the fight kills a player at `health` HP whose weapon has
+    `durability` left (full if None), plus mean turns and damage; `template`'s table
+    (the hotel's if None)."""
+    table = load_table() if template is None else table_for(template)
+    if table is None:
+        return None
+    rows = table["pairs"].get(enemy_name, {}).get(weapon or FISTS)
+    if not rows:
+        return None
+    level = len(rows) - 1 if durability is None else max(0, min(durability, len(rows) - 1))
+    row = rows[level]
+    lethal = row["lethal"]
+    chance = lethal[health] if 0 <= health < len(lethal) else (1.0 if health <= 0 else 0.0)
+    return {"lethal": chance, "turns": row["turns_mean"], "damage": row["damage_mean"]}
+
+def cli():
+    parser = argparse.ArgumentParser(description="Build the Floor 13 fight outcome table")
+    parser.add_argument("--trials", type=int, default=TRIALS)
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+    if args.rebuild or args.trials != TRIALS:
+        stats = fight_stats()
+        table = _tables[stats_key(stats)] = build_table(stats, args.trials)
+        _save(table, main.cache_path(FIGHT_TABLE_FILE.format(key=table["key"])))
+    else:
+        table = load_table()
+    print(f"{'enemy':<18}{'weapon':<15}{'turns':>8}{'damage':>9}{'durab.':>8}   (full durability)")
+    for enemy, row in table["pairs"].items():
+        for weapon, levels in row.items():
+            stats = levels[-1]
+            print(f"{enemy:<18}{weapon:<15}{stats['turns_mean']:>8}{stats['damage_mean']:>9}{stats['durability_mean']:>8}")
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,348 @@
+"""
+FLOOR 13 - Procedural floors
+Seeded floors of any size ("the 13th floor shifts"):
+- only the topology is generated up front: a tree of rooms grown from the
+  Lobby (mostly branching off recent rooms into long corridors, sometimes
+  off any earlier room), kept in flat int arrays
+- the Boss Chamber is the deepest room, the Boss Antechamber leads into it
+  (and holds the Master Key), and FRAGMENTS_REQUIRED fragment rooms are
+  placed up front, so every floor can be finished
+- descriptions, light, loot and enemy odds for a room are drawn from the
+  room's own seeded RNG the first time the room is looked at, then cached;
+  memory beyond the topology grows with rooms visited, not floor size
+- the same (seed, size) always produces the same floor
+- Floor reads like the ROOMS dict (floor["Room 12"]["adj"]) and brings its
+  own graph index (FloorGraph) with the RoomGraph interface: tree paths
+  through the nearest common ancestor, O(path length)
+
+Play:  python main.py --floor-seed 13 [--floor-size 1000]   (or server.py --floor-seed 13)
+Usage: python floorgen.py [--rooms 100000] [--seed 13] [--walk 1000]   (generation benchmark)
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+import zlib
+from array import array
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Dict, Iterable, Iterator, List, Optional
+
+GENERATOR_VERSION = 1
+DEFAULT_SIZE = 1000
+CORRIDOR = 12        # a new room usually branches off one of the last CORRIDOR rooms
+JUMP_CHANCE = 0.1    # ...otherwise off any earlier room
+DARK_CHANCE = 0.45
+LOOT = (("Health Pack", 0.16), ("Batteries", 0.14), ("Rusty Pipe", 0.03),
+        ("Kitchen Knife", 0.02), ("Revolver", 0.01))
+FEATURES = (
+    "Wallpaper peels away in long, wet strips.",
+    "A child's drawing is pinned to the wall.",
+    "Furniture lies overturned as if thrown.",
+    "A mirror hangs here that doesn't quite reflect you.",
+    "Room service trays are stacked by the door, untouched.",
+    "The carpet is soaked and squelches underfoot.",
+    "A television plays static to an empty bed.",
+    "Scratches cover the walls in a frantic pattern.",
+    "Dust sheets cover shapes that might be chairs.",
+    "A bathtub is full of black water.",
+)
+MOODS = (
+    "Something breathes behind the wardrobe.",
+    "The lights buzz and dim when you move.",
+    "You hear your name whispered once.",
+    "It is much colder here than it should be.",
+    "A door closes somewhere nearby.",
+    "The air smells of old blood and lilies.",
+    "Footsteps stop when you stop.",
+    "",
+)
+LOBBY = {"desc": "The Lobby. The elevator doors behind you will not open again.", "required_light": False,
+         "chance_enemy": 0.0}
+ANTECHAMBER = {"desc": "A corridor of carpets stained black; a scent like old blood.", "required_light": True}
+BOSS_CHAMBER = {"desc": "A vast room where the air itself bends. The Matriarch waits.", "required_light": True,
+                "chance_enemy": 0.0}
+
+
+class Floor(Mapping):
+    """A generated floor: room name -> room dict, materialized on first access."""
+
+    def __init__(self, seed: int, size: int, fragments: int = 6):
+        if size < fragments + 3:
+            raise ValueError(f"a floor needs at least {fragments + 3} rooms")
+        self.seed = seed
+        self.size = size
+        self.content_key = f"floorgen/{GENERATOR_VERSION}/{seed}/{size}/{fragments}"
+        self.names_crc = zlib.crc32(self.content_key.encode())  # stands in for the room names in save crcs
+        rng = random.Random(f"floor13/floor/{seed}/{size}")
+        parent = array("i", [-1]) * size
+        depth = array("i", [0]) * size
+        rand = rng.random
+        deepest = 0
+        for i in range(1, size):
+            if rand() < JUMP_CHANCE:
+                p = int(rand() * i)
+            else:
+                p = i - 1 - int(rand() * (i if i < CORRIDOR else CORRIDOR))
+            parent[i] = p
+            d = depth[i] = depth[p] + 1
+            if d > depth[deepest]:
+                deepest = i
+        # children in CSR form: children[start[i]:start[i + 1]]
+        start = array("i", [0]) * (size + 1)
+        for i in range(1, size):
+            start[parent[i] + 1] += 1
+        for i in range(size):
+            start[i + 1] += start[i]
+        fill = array("i", start)
+        children = array("i", [0]) * (size - 1)
+        for i in range(1, size):
+            p = parent[i]
+            children[fill[p]] = i
+            fill[p] += 1
+        self.parent, self.depth, self.child_start, self.children = parent, depth, start, children
+        self.boss = deepest
+        self.antechamber = parent[deepest]
+        if self.antechamber == 0:
+            raise ValueError("floor too small for a boss wing")
+        reserved = {0, self.boss, self.antechamber}
+        picks = [i for i in rng.sample(range(1, size), fragments + 2) if i not in reserved][:fragments]
+        self.fragment_rooms = {room: n + 1 for n, room in enumerate(picks)}
+        self.item_names = sorted({name for name, _ in LOOT} | {"Master Key"} |
+                                 {fragment_item(n) for n in self.fragment_rooms.values()})
+        self._rooms: Dict[str, Mapping] = {}
+        self.names = _RoomNames(self)
+        self.graph = FloorGraph(self)
+
+    # -------------------- NAMES --------------------
+    def room_name(self, i: int) -> str:
+        if i == 0:
+            return "Lobby"
+        if i == self.boss:
+            return "Boss Chamber"
+        if i == self.antechamber:
+            return "Boss Antechamber"
+        return f"Room {i}"
+
+    def room_id(self, name: str) -> Optional[int]:
+        if name == "Lobby":
+            return 0
+        if name == "Boss Chamber":
+            return self.boss
+        if name == "Boss Antechamber":
+            return self.antechamber
+        if name.startswith("Room ") and name[5:].isdigit() and name[5] != "0":
+            i = int(name[5:])
+            if i < self.size and i not in (self.boss, self.antechamber):
+                return i
+        return None
+
+    def neighbours(self, i: int) -> List[int]:
+        kids = self.children[self.child_start[i]:self.child_start[i + 1]].tolist()
+        return kids if i == 0 else [self.parent[i]] + kids
+
+    # -------------------- LAZY ROOMS --------------------
+    def _rng(self, i: int) -> random.Random:
+        return random.Random(f"floor13/room/{self.seed}/{self.size}/{i}")
+
+    def is_dark(self, i: int) -> bool:
+        """required_light without materializing the room (same first draw)."""
+        if i == 0:
+            return False
+        if i in (self.boss, self.antechamber):
+            return True
+        return self._rng(i).random() < DARK_CHANCE
+
+    def _materialize(self, i: int) -> Mapping:
+        rng = self._rng(i)
+        dark = rng.random() < DARK_CHANCE  # first draw: see is_dark
+        feature, mood = rng.choice(FEATURES), rng.choice(MOODS)
+        items = [name for name, chance in LOOT if rng.random() < chance]
+        room = {
+            "desc": f"{feature} {mood}".strip(),
+            "adj": tuple(self.room_name(n) for n in self.neighbours(i)),
+            "required_light": dark,
+            "items": (),
+            "chance_enemy": round(min(0.7, 0.25 + 0.35 * self.depth[i] / max(1, self.depth[self.boss])
+                                      + rng.uniform(-0.05, 0.05)), 2),
+            "is_fragment_room": i in self.fragment_rooms,
+            "fragment_id": self.fragment_rooms.get(i),
+        }
+        if i == 0:
+            room.update(LOBBY)
+            items = []
+        elif i == self.boss:
+            room.update(BOSS_CHAMBER)
+            items = []
+        elif i == self.antechamber:
+            room.update(ANTECHAMBER)
+            items = ["Master Key"]
+        if i in self.fragment_rooms:
+            items.insert(0, fragment_item(self.fragment_rooms[i]))
+        room["items"] = tuple(items)
+        return MappingProxyType(room)
+
+    def __getitem__(self, name: str) -> Mapping:
+        room = self._rooms.get(name)
+        if room is None:
+            i = self.room_id(name)
+            if i is None:
+                raise KeyError(name)
+            room = self._rooms[name] = self._materialize(i)
+        return room
+
+    def __contains__(self, name) -> bool:
+        return isinstance(name, str) and self.room_id(name) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def materialized(self) -> int:
+        return len(self._rooms)
+
+
+def fragment_item(n: int) -> str:
+    return f"Map Fragment {chr(ord('A') + n - 1)}" if n <= 26 else f"Map Fragment {n}"
+
+
+class _RoomNames:
+    """Sequence view of the room names, without building them all."""
+    __slots__ = ("_floor",)
+
+    def __init__(self, floor: Floor):
+        self._floor = floor
+
+    def __len__(self) -> int:
+        return self._floor.size
+
+    def __getitem__(self, i: int) -> str:
+        if not 0 <= i < self._floor.size:
+            raise IndexError(i)
+        return self._floor.room_name(i)
+
+    def __iter__(self) -> Iterator[str]:
+        return map(self._floor.room_name, range(self._floor.size))
+
+
+# -------------------- GRAPH INDEX --------------------
+class FloorGraph:
+    """RoomGraph's interface for a tree-shaped floor: the path between two rooms
+    is unique and is walked up to their common ancestor, O(path length)."""
+
+    def __init__(self, floor: Floor):
+        self.floor = floor
+
+    def resolve(self, text: str) -> Optional[str]:
+        words = text.strip().lower().split()
+        if not words:
+            return None
+        name = " ".join(word.capitalize() for word in words)
+        return name if name in self.floor else None
+
+    def _path_ids(self, src: int, dst: int) -> List[int]:
+        parent, depth = self.floor.parent, self.floor.depth
+        up, down = [], []
+        while depth[src] > depth[dst]:
+            src = parent[src]
+            up.append(src)
+        while depth[dst] > depth[src]:
+            down.append(dst)
+            dst = parent[dst]
+        while src != dst:
+            src = parent[src]
+            up.append(src)
+            down.append(dst)
+            dst = parent[dst]
+        return up + down[::-1]
+
+    def path(self, src: str, dst: str, dark_ok: bool = True) -> Optional[List[str]]:
+        floor = self.floor
+        ids = self._path_ids(floor.room_id(src), floor.room_id(dst))
+        if not dark_ok and any(floor.is_dark(i) for i in ids):
+            return None
+        return [floor.room_name(i) for i in ids]
+
+    def distance(self, src: str, dst: str, dark_ok: bool = True) -> Optional[int]:
+        path = self.path(src, dst, dark_ok)
+        return None if path is None else len(path)
+
+    def next_step(self, src: str, dst: str, dark_ok: bool = True) -> Optional[str]:
+        path = self.path(src, dst, dark_ok)
+        return path[0] if path else None
+
+    def render(self, visited: Iterable[str], location: str, reveal_all: bool = False) -> List[str]:
+        """Visited rooms as a tree ('?' for unexplored exits). With reveal_all the way to
+        the Boss Chamber is drawn too; the rest of a big floor stays hidden."""
+        floor = self.floor
+        seen = {i for i in map(floor.room_id, visited) if i is not None}
+        shown = set(seen)
+        if reveal_all:
+            shown.update(self._path_ids(floor.boss, 0))
+            shown.add(floor.boss)
+        here = floor.room_id(location)
+        lines: List[str] = []
+        stack = [(0, "", True, True)]
+        while stack:
+            room, prefix, last, top = stack.pop()
+            if room is None:
+                lines.append(f"{prefix}{'└── ' if last else '├── '}?")
+                continue
+            tags = ["dark"] if room in seen and floor.is_dark(room) else []
+            if room not in seen:
+                tags.append("unexplored")
+            text = floor.room_name(room) + (f" ({', '.join(tags)})" if tags else "")
+            if room == here:
+                text += "  <- you are here"
+            lines.append(text if top else f"{prefix}{'└── ' if last else '├── '}{text}")
+            if room not in seen:
+                continue
+            kids = [kid if kid in shown else None for kid in floor.neighbours(room) if kid != floor.parent[room]]
+            inner = "" if top else prefix + ("    " if last else "│   ")
+            for n in range(len(kids) - 1, -1, -1):
+                stack.append((kids[n], inner, n == len(kids) - 1, False))
+        return lines
+
+
+# -------------------- BENCHMARK --------------------
+def cli():
+    parser = argparse.ArgumentParser(description="Generate a Floor 13 floor and measure it")
+    parser.add_argument("--rooms", "-n", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--walk", type=int, default=1000, help="rooms to enter on a random walk")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    Floor(args.seed, args.rooms)
+    built = time.perf_counter() - start
+    tracemalloc.start()  # a second, traced build for the memory numbers
+    floor = Floor(args.seed, args.rooms)
+    topology = tracemalloc.get_traced_memory()[0]
+    print(f"{args.rooms} rooms generated in {built * 1000:.0f} ms, topology {topology / 1e6:.2f} MB "
+          f"({topology / args.rooms:.0f} B/room)")
+    print(f"Boss Chamber is {floor.depth[floor.boss]} rooms from the Lobby; fragments in "
+          f"{', '.join(floor.room_name(i) for i in floor.fragment_rooms)}")
+
+    rng = random.Random(args.seed)
+    here = "Lobby"
+    for _ in range(args.walk):
+        here = rng.choice(floor[here]["adj"])
+    grown = tracemalloc.get_traced_memory()[0] - topology
+    tracemalloc.stop()
+    print(f"Random walk of {args.walk} steps materialized {floor.materialized} rooms: "
+          f"+{grown / 1e3:.0f} KB ({grown / max(1, floor.materialized):.0f} B/room)")
+
+    start = time.perf_counter()
+    path = floor.graph.path("Lobby", "Boss Chamber")
+    print(f"Lobby -> Boss Chamber path: {len(path)} hops in {(time.perf_counter() - start) * 1e6:.0f} µs")
+
+    again = Floor(args.seed, args.rooms)
+    same = all(again[name] == floor[name] for name in list(floor._rooms)[:200]) and again.boss == floor.boss
+    print(f"Same seed reproduces the floor: {'yes' if same else 'NO'}")
+
+if __name__ == "__main__":
+    cli()
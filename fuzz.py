@@ -0,0 +1,340 @@
+"""
+FLOOR 13 - State-space fuzzer
+Drives the headless game (batch.py's command grammar, stepped like a replay)
+with random command sequences across a process pool and checks the game
+state after every command:
+- HP within (0, max] while the game runs, and <= 0 exactly when consumed;
+  battery 0-100, never lit at 0
+- the equipped weapon is held, known and not broken; every item, room and
+  visited room exists in the content
+- fragments never exceed the fragments on the floor; the map only unlocks
+  with enough of them
+- every 16 commands and at the end, the state survives a binary save
+  round trip (saves.WorldCodec encode -> decode gives the same digest)
+- any exception out of the game loop is a crash
+Coverage-guided: the commands are chosen as the game goes (fight actions in
+fights, moves to adjacent rooms...), and every sequence that produced new
+output (per room and prompt, numbers masked) joins the worker's corpus;
+most new sequences replay a corpus prefix and continue at random from there.
+Every new failure is minimized (delta debugging on the command list, same
+game seed) and written out as a script for main.py --script FILE --seed N.
+Endings no sequence reached are reported at the end.
+
+Usage: python fuzz.py [--seconds 30] [-j N] [--seed 13] [--max-len 200] [--out fuzz-failures]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import re
+import sys
+import time
+import traceback
+from collections import Counter
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+import batch
+import main
+import replay
+import rolls
+import saves
+
+MAX_LEN = 200  # commands per sequence
+GUIDED = 0.75  # share of sequences that extend a corpus prefix
+SENSIBLE = 0.5  # share of fight actions that heal when low and attack otherwise
+ROUNDTRIP_EVERY = 16
+ENDINGS = ("escape", "consumed", "trapped")
+NUMBER = re.compile(r"\d+")
+
+FIGHT_WEIGHTS = (("attack", 8), ("heal", 2), ("run", 2), ("shut", 1), ("flashlight", 1), ("switch", 2))
+EXPLORE_WEIGHTS = (("move", 6), ("travel", 2), ("auto-explore", 3), ("inventory", 1), ("switch", 1), ("drop", 1),
+                   ("flashlight", 2), ("batteries", 1), ("map", 1), ("quit", 0.05), ("dance", 0.2))
+
+
+class Violation(Exception):
+    """An invariant broke; `name` is its signature."""
+    def __init__(self, name: str, detail: str):
+        super().__init__(f"{name}: {detail}")
+        self.name = name
+        self.detail = detail
+
+
+class Outcome(NamedTuple):
+    ending: Optional[str]
+    failure: Optional[Tuple[str, str]]  # (signature, detail)
+    commands: int  # commands run, up to and including the failing one
+    features: Set[Tuple]
+
+
+# -------------------- INVARIANTS --------------------
+class Floor:
+    """The content a campaign runs on, and what the invariants check against."""
+
+    def __init__(self, template, codec):
+        self.template = template
+        self.codec = codec
+        self.room_names = list(template.rooms)
+        self.weapon_names = list(template.weapons)
+        self.fragments = sum(item.startswith("Map Fragment")
+                             for room in self.room_names for item in template.rooms[room]["items"])
+
+    def check(self, s, over: bool, ending: str = None):
+        p = s.player
+        if p.health > p.max_health or (not over and p.health <= 0):
+            raise Violation("hp_bounds", f"HP {p.health}/{p.max_health}")
+        if over and (ending == "consumed") != (p.health <= 0):
+            raise Violation("ending_hp", f"ending {ending} with HP {p.health}")
+        if not 0 <= p.flashlight_battery <= 100:
+            raise Violation("battery_bounds", f"battery {p.flashlight_battery}")
+        if p.flashlight_on and p.flashlight_battery <= 0:
+            raise Violation("lit_without_battery", "flashlight on at 0%")
+        if p.weapon is not None:
+            if p.weapon not in self.codec.weapon_id:
+                raise Violation("weapon_unknown", repr(p.weapon))
+            if p.weapon not in p.inventory:
+                raise Violation("weapon_not_held", f"{p.weapon} equipped, inventory {list(p.inventory)}")
+            if s.world.durability_of(p.weapon) <= 0:
+                raise Violation("weapon_broken", f"{p.weapon} equipped at durability {s.world.durability_of(p.weapon)}")
+        for item in p.inventory:
+            if item not in self.codec.item_id:
+                raise Violation("item_unknown", repr(item))
+        if self.codec.room_index(p.location) is None or p.location not in p.visited_rooms:
+            raise Violation("location", f"{p.location!r} (visited: {sorted(p.visited_rooms)})")
+        for room in p.visited_rooms:
+            if self.codec.room_index(room) is None:
+                raise Violation("visited_unknown", repr(room))
+        if not 0 <= p.map_fragments_found <= self.fragments:
+            raise Violation("fragments", f"{p.map_fragments_found} of {self.fragments}")
+        if p.map_unlocked and p.map_fragments_found < main.FRAGMENTS_REQUIRED:
+            raise Violation("map_unlocked", f"with {p.map_fragments_found} fragments")
+
+    def roundtrip(self, s):
+        """The state must come back identical from a binary save."""
+        player, world = main.Player(), main.new_world(self.template)
+        try:
+            self.codec.decode_into(self.codec.encode(saves.capture(s.player, s.world), 0), player, world)
+        except Exception as e:
+            raise Violation("save_roundtrip", f"{type(e).__name__}: {e}")
+        if replay.state_digest(player, world) != replay.state_digest(s.player, s.world):
+            raise Violation("save_roundtrip", "decoded state differs")
+
+
+# -------------------- ONE SEQUENCE --------------------
+class Commands:
+    """A sequence's commands: a fixed prefix, then (up to `length`) chosen at random as the game goes."""
+
+    def __init__(self, floor: Floor, rng: random.Random, prefix: List[str], length: int):
+        self.floor = floor
+        self.rng = rng
+        self.prefix = prefix
+        self.length = length
+        self.taken: List[str] = []
+        self.s = None
+
+    def __iter__(self) -> Iterator[str]:
+        for command in self.prefix:
+            self.taken.append(command)
+            yield command
+        while len(self.taken) < self.length:
+            command = self.choose()
+            self.taken.append(command)
+            yield command
+
+    def _weighted(self, weights) -> str:
+        return self.rng.choices([verb for verb, _ in weights], [weight for _, weight in weights])[0]
+
+    def _weapon(self) -> str:
+        held = self.s.player.inventory.weapons()
+        if held and self.rng.random() < 0.7:
+            return self.rng.choice(held)
+        return str(self.rng.randint(0, 3))
+
+    def choose(self) -> str:
+        s, rng = self.s, self.rng
+        if not s.idle:  # at a fight prompt
+            if rng.random() < SENSIBLE:  # play it straight now and then, so fights can be won
+                return "heal" if s.player.health < 45 and "Health Pack" in s.player.inventory else "attack"
+            verb = self._weighted(FIGHT_WEIGHTS)
+            return f"switch {self._weapon()}" if verb == "switch" else verb
+        verb = self._weighted(EXPLORE_WEIGHTS)
+        if verb == "move":
+            adj = s.rooms[s.player.location]["adj"]
+            room = rng.choice(adj) if adj and rng.random() < 0.9 else rng.choice(self.floor.room_names)
+            return f"move {room}"
+        if verb == "travel":
+            return f"travel {rng.choice(self.floor.room_names)}"
+        if verb in ("switch", "drop"):
+            return f"{verb} {self._weapon()}"
+        return verb
+
+
+def run(floor: Floor, seed: int, commands, on_session=None) -> Outcome:
+    """Play one sequence on a fresh world; stops at the first failure."""
+    world = main.new_world(floor.template)
+    features: Set[Tuple] = set()
+    done = [0]
+
+    def check(result: Dict):
+        if "done" in result:
+            return
+        over = result["waiting"] == batch.END
+        floor.check(s, over, ending)
+        done[0] += 1
+        if over or done[0] % ROUNDTRIP_EVERY == 0:
+            floor.roundtrip(s)
+        where = (result["waiting"], s.player.location)
+        for line in result["output"]:
+            features.add(where + (NUMBER.sub("#", line),))
+
+    io = batch.BatchIO(commands, check)
+    s = io.s = main.Session(io, world, replay.ReplaySaves(world, {"saved": False, "start": None}), seed=seed,
+                            rng=rolls.Rolls(seed, rolls.BULK_BLOCK))  # one session at a time: bulk blocks
+    if on_session:
+        on_session(s)
+    ending = failure = None
+    try:
+        try:
+            replay.run_sync(main.play(s))
+        except main.GameOver as over:
+            ending = over.ending
+            io.finish(batch.END)
+        except EOFError:
+            pass
+    except Violation as v:
+        failure = (v.name, v.detail)
+    except Exception as e:
+        frame = next((f for f in reversed(traceback.extract_tb(e.__traceback__))
+                      if os.path.dirname(os.path.abspath(f.filename)) == os.path.dirname(os.path.abspath(__file__))),
+                     traceback.extract_tb(e.__traceback__)[-1])
+        failure = (f"crash {type(e).__name__} at {os.path.basename(frame.filename)}:{frame.lineno}",
+                   f"{type(e).__name__}: {e}")
+    return Outcome(ending, failure, io.commands, features)
+
+
+def minimize(floor: Floor, seed: int, commands: List[str], signature: str) -> List[str]:
+    """Delta debugging: drop chunks of commands while the same failure still happens."""
+    def fails(candidate: List[str]) -> bool:
+        outcome = run(floor, seed, candidate)
+        return outcome.failure is not None and outcome.failure[0] == signature
+
+    chunks = 2
+    while len(commands) >= 2:
+        size = -(-len(commands) // chunks)
+        for start in range(0, len(commands), size):
+            candidate = commands[:start] + commands[start + size:]
+            if fails(candidate):
+                commands = candidate
+                chunks = max(chunks - 1, 2)
+                break
+        else:
+            if chunks >= len(commands):
+                break
+            chunks = min(len(commands), chunks * 2)
+    return commands
+
+
+# -------------------- CAMPAIGN (PROCESS POOL) --------------------
+def fuzz_worker(args) -> Dict:
+    campaign_seed, worker, seconds, max_len, content = args
+    rng = random.Random(f"floor13-fuzz/{campaign_seed}/{worker}")
+    floor = Floor(*batch.content_template(content))
+    features: Set[Tuple] = set()
+    corpus: List[Tuple[int, List[str]]] = []
+    failures: Dict[str, Dict] = {}
+    endings: Counter = Counter()
+    sequences = commands = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        if corpus and rng.random() < GUIDED:
+            seed, parent = rng.choice(corpus)
+            prefix = parent[:rng.randint(0, len(parent))]
+        else:
+            seed, prefix = rng.getrandbits(32), []
+        chosen = Commands(floor, rng, prefix, max_len)
+
+        def attach(s, chosen=chosen):
+            chosen.s = s
+
+        outcome = run(floor, seed, chosen, attach)
+        sequences += 1
+        commands += outcome.commands
+        endings[outcome.ending] += 1
+        taken = chosen.taken[:outcome.commands]
+        if not features >= outcome.features:
+            features |= outcome.features
+            corpus.append((seed, taken))
+        if outcome.failure and outcome.failure[0] not in failures:
+            signature, detail = outcome.failure
+            failures[signature] = {"seed": seed, "detail": detail, "length": len(taken),
+                                   "commands": minimize(floor, seed, taken, signature)}
+    return {"sequences": sequences, "commands": commands, "features": features, "corpus": len(corpus),
+            "endings": endings, "failures": failures}
+
+def fuzz(seconds: float, workers: int = None, seed: int = 13, max_len: int = MAX_LEN, content: Dict = None) -> Dict:
+    workers = workers or os.cpu_count() or 1
+    jobs = [(seed, worker, seconds, max_len, content or {}) for worker in range(workers)]
+    if workers == 1:
+        results = [fuzz_worker(jobs[0])]
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.map(fuzz_worker, jobs)
+    total = {"sequences": 0, "commands": 0, "features": set(), "corpus": 0, "endings": Counter(), "failures": {}}
+    for result in results:
+        for key in ("sequences", "commands", "corpus"):
+            total[key] += result[key]
+        total["features"] |= result["features"]
+        total["endings"].update(result["endings"])
+        for signature, failure in result["failures"].items():
+            known = total["failures"].get(signature)
+            if known is None or len(failure["commands"]) < len(known["commands"]):
+                total["failures"][signature] = failure
+    return total
+
+def write_failure(out_dir: str, index: int, signature: str, failure: Dict) -> str:
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"failure-{index}{batch.SUFFIX}")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"# {signature}\n# {failure['detail']}\n")
+        f.write(f"# replay: python main.py --script {path} --seed {failure['seed']}\n")
+        f.write("\n".join(failure["commands"]) + "\n")
+    return path
+
+def cli():
+    parser = argparse.ArgumentParser(description="Floor 13 state-space fuzzer")
+    parser.add_argument("--seconds", type=float, default=30, help="fuzzing time per worker")
+    parser.add_argument("--workers", "-j", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--max-len", type=int, default=MAX_LEN, help="commands per sequence")
+    parser.add_argument("--out", default="fuzz-failures", help="minimized failing scripts go here")
+    parser.add_argument("--pack", help="fuzz another content pack instead of the hotel")
+    parser.add_argument("--floor-seed", type=int, help="fuzz a generated floor")
+    parser.add_argument("--floor-size", type=int, default=None)
+    args = parser.parse_args()
+    content = {}
+    if args.pack:
+        content = {"pack": os.path.abspath(args.pack)}
+    elif args.floor_seed is not None:
+        import floorgen
+        content = {"floor": [args.floor_seed, args.floor_size or floorgen.DEFAULT_SIZE]}
+    workers = args.workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    total = fuzz(args.seconds, workers, args.seed, args.max_len, content)
+    elapsed = time.perf_counter() - started
+    print(f"{total['sequences']} sequences, {total['commands']} commands on {workers} worker(s) in {elapsed:.1f}s -> "
+          f"{total['sequences'] / elapsed:.0f} sequences/s, {total['commands'] / elapsed:.0f} commands/s")
+    print(f"coverage: {len(total['features'])} distinct outputs, corpus {total['corpus']} sequences")
+    print("endings: " + ", ".join(f"{ending or 'none (ran out of commands)'} {n}"
+                                  for ending, n in total["endings"].most_common()))
+    missing = [ending for ending in ENDINGS if not total["endings"][ending]]
+    if missing:
+        print(f"never reached: {', '.join(missing)}")
+    for index, (signature, failure) in enumerate(sorted(total["failures"].items()), 1):
+        path = write_failure(args.out, index, signature, failure)
+        print(f"FAIL {signature}: {failure['detail']}")
+        print(f"     {failure['length']} -> {len(failure['commands'])} commands, seed {failure['seed']}: {path}")
+    print(f"{len(total['failures'])} distinct failures")
+    sys.exit(1 if total["failures"] else 0)
+
+if __name__ == "__main__":
+    cli()
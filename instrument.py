@@ -0,0 +1,212 @@
+"""
+FLOOR 13 - Instrumentation
+Opt-in call counters and timers for the hot paths, to see where a
+session's time goes (main.py / server.py --stats FILE, or FLOOR13_STATS=FILE):
+- install() swaps the instrumented functions in main (and functions.py,
+  if loaded) and SaveManager.commit/compact/load for timed wrappers;
+  without --stats nothing is swapped and the game runs the originals
+- every call counts toward its session (s.stats) and the process total,
+  so a server's totals are already aggregated over all its sessions
+- async steps (move_to_room, the fights) leave out the time spent waiting
+  for the player, which is counted on its own under "ask"
+- units: characters for say/slow, bytes queued for disk by the saves
+- the hidden `stats` command shows the session's and the process's table;
+  at exit the process totals are written to FILE as JSON
+
+Usage: python instrument.py FILE...   (merge dumps, e.g. from several servers, and print them)
+"""
+
+import argparse
+import atexit
+import functools
+import inspect
+import json
+import os
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+# name -> how many units a call adds (None: just calls and time)
+TIMED: Dict[str, Optional[Callable]] = {
+    "auto_save": None,
+    "move_to_room": None,
+    "find_items_in_room": None,
+    "encounter_enemy": None,
+    "boss_battle": None,
+    "drain_flashlight": None,
+    "slow": lambda args: len(args[0]),
+}
+
+
+class Stats:
+    """Per counter name: calls, seconds and units (characters, bytes)."""
+    __slots__ = ("counters", "waiting", "sessions")
+
+    def __init__(self):
+        self.counters: Dict[str, List] = {}
+        self.waiting = 0.0  # seconds spent in ask(), left out of the async timings
+        self.sessions = 0
+
+    def add(self, name: str, seconds: float, units: int = 0):
+        counter = self.counters.get(name)
+        if counter is None:
+            counter = self.counters[name] = [0, 0.0, 0]
+        counter[0] += 1
+        counter[1] += seconds
+        counter[2] += units
+
+    def merge(self, data: Dict):
+        self.sessions += data.get("sessions", 0)
+        for name, row in data["counters"].items():
+            counter = self.counters.setdefault(name, [0, 0.0, 0])
+            counter[0] += row["calls"]
+            counter[1] += row["seconds"]
+            counter[2] += row["units"]
+
+    def to_dict(self) -> Dict:
+        return {"sessions": self.sessions,
+                "counters": {name: {"calls": calls, "seconds": round(seconds, 6), "units": units}
+                             for name, (calls, seconds, units) in sorted(self.counters.items())}}
+
+    def report(self) -> List[str]:
+        lines = [f"{'':<20}{'calls':>9}{'total ms':>11}{'us/call':>9}{'units':>11}"]
+        for name, (calls, seconds, units) in sorted(self.counters.items(), key=lambda kv: -kv[1][1]):
+            lines.append(f"{name:<20}{calls:>9}{seconds * 1e3:>11.1f}{seconds * 1e6 / calls:>9.1f}"
+                         f"{units if units else '':>11}")
+        return lines
+
+
+PROCESS = Stats()
+_session_type = None  # main.Session, once installed
+_started = time.time()
+
+
+def session_stats(s) -> Stats:
+    """The session's Stats, created on its first instrumented call."""
+    stats = s.stats
+    if stats is None:
+        stats = s.stats = Stats()
+        s.saves.stats = stats  # so the save counters land on this session too
+        PROCESS.sessions += 1
+    return stats
+
+def _session(args) -> Optional[Stats]:
+    return session_stats(args[0]) if args and isinstance(args[0], _session_type) else None
+
+
+# -------------------- WRAPPERS --------------------
+def _timed(name: str, fn: Callable, units: Optional[Callable]) -> Callable:
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def timed_async(*args, **kwargs):
+            stats = _session(args)
+            waited = stats.waiting if stats else 0.0
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                if stats:
+                    elapsed -= stats.waiting - waited
+                    stats.add(name, elapsed)
+                PROCESS.add(name, elapsed)
+        return timed_async
+
+    @functools.wraps(fn)
+    def timed(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            n = units(args) if units else 0
+            stats = _session(args)
+            if stats:
+                stats.add(name, elapsed, n)
+            PROCESS.add(name, elapsed, n)
+    return timed
+
+def _timed_say(fn: Callable) -> Callable:
+    @functools.wraps(fn)
+    def say(self, text: str):
+        started = time.perf_counter()
+        fn(self, text)
+        elapsed = time.perf_counter() - started
+        session_stats(self).add("say", elapsed, len(text))
+        PROCESS.add("say", elapsed, len(text))
+    return say
+
+def _timed_ask(fn: Callable) -> Callable:
+    @functools.wraps(fn)
+    async def ask(self, prompt: str = "") -> str:
+        stats = session_stats(self)
+        started = time.perf_counter()
+        try:
+            return await fn(self, prompt)
+        finally:
+            elapsed = time.perf_counter() - started
+            stats.waiting += elapsed
+            stats.add("ask", elapsed)
+            PROCESS.add("ask", elapsed)
+    return ask
+
+def _timed_save(name: str, fn: Callable) -> Callable:
+    @functools.wraps(fn)
+    def save_op(self, *args):
+        queued = self.bytes_queued
+        started = time.perf_counter()
+        try:
+            return fn(self, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+            written = self.bytes_queued - queued
+            stats = getattr(self, "stats", None)
+            if stats:
+                stats.add(name, elapsed, written)
+            PROCESS.add(name, elapsed, written)
+    return save_op
+
+
+# -------------------- INSTALL / DUMP --------------------
+def install(dump_path: str = None):
+    """Start counting (idempotent); the process totals go to `dump_path` at exit."""
+    global _session_type
+    if _session_type is not None:
+        return
+    import main
+    import saves
+    _session_type = main.Session
+    modules = [main] + [sys.modules[name] for name in ("functions",) if name in sys.modules]
+    for module in modules:
+        for name, units in TIMED.items():
+            fn = getattr(module, name, None)
+            if fn is not None:
+                setattr(module, name, _timed(name, fn, units))
+    main.Session.say = _timed_say(main.Session.say)
+    main.Session.ask = _timed_ask(main.Session.ask)
+    for name in ("commit", "compact", "load"):
+        setattr(saves.SaveManager, name, _timed_save("save." + name, getattr(saves.SaveManager, name)))
+    if dump_path:
+        atexit.register(dump, dump_path)
+
+def dump(path: str):
+    data = PROCESS.to_dict()
+    data.update(pid=os.getpid(), started=round(_started, 3), seconds=round(time.time() - _started, 3))
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="Floor 13 instrumentation dumps")
+    parser.add_argument("dumps", nargs="+", help="JSON files written by --stats")
+    args = parser.parse_args()
+    total = Stats()
+    for path in args.dumps:
+        with open(path) as f:
+            total.merge(json.load(f))
+    print(f"{len(args.dumps)} dump(s), {total.sessions} sessions")
+    for line in total.report():
+        print(line)
+
+if __name__ == "__main__":
+    cli()
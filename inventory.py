@@ -0,0 +1,209 @@
+"""
+FLOOR 13 - Counted inventory
+Compact per-player item storage:
+- ItemRegistry interns item names to small integer IDs (and knows which
+  items are weapons); REGISTRY is shared by every player in the process
+- Inventory is a multiset: a dict of counts per item name, so `in`, count,
+  add and remove are O(1) and a stack has no size limit, plus a bitmask of
+  the weapons held (bit = item ID), updated on add/remove, so listing the
+  weapons never scans the bag; the weapons tuple is memoized per bitmask
+- it still looks like the old list where the game relies on it: `in`,
+  append, remove, iteration (each copy once, in item-ID order), len, bool
+
+Usage: python inventory.py [--players 10000]   (before/after benchmark)
+"""
+
+import argparse
+import gc
+import timeit
+import tracemalloc
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+
+class ItemRegistry:
+    def __init__(self):
+        self.names: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self.weapon_bits: Dict[str, int] = {}  # weapon name -> 1 << its ID
+        self._weapon_lists: Dict[int, Tuple[str, ...]] = {}
+
+    def intern(self, name: str, weapon: bool = False) -> int:
+        item = self.ids.get(name)
+        if item is None:
+            item = self.ids[name] = len(self.names)
+            self.names.append(name)
+        if weapon:
+            self.weapon_bits[name] = 1 << item
+            self._weapon_lists.clear()
+        return item
+
+    def register(self, names: Iterable[str], weapon: bool = False):
+        for name in names:
+            self.intern(name, weapon)
+
+    def weapon_names(self, bits: int) -> Tuple[str, ...]:
+        """Names for a held-weapons bitmask, memoized (there are only 2**weapons of them)."""
+        names = self._weapon_lists.get(bits)
+        if names is None:
+            names = self._weapon_lists[bits] = tuple(self.names[i] for i in range(bits.bit_length()) if bits >> i & 1)
+        return names
+
+REGISTRY = ItemRegistry()
+_IDS = REGISTRY.ids  # hot-path aliases; the registry only ever adds to these
+_WEAPON_BITS = REGISTRY.weapon_bits
+
+
+class Inventory:
+    __slots__ = ("_counts", "_weapons", "_size")
+
+    def __init__(self, items: Iterable[str] = ()):
+        self._counts: Dict[str, int] = {}  # only items held (count > 0)
+        self._weapons = 0  # bit i set: holding at least one of weapon i
+        self._size = 0
+        for name in items:
+            self.append(name)
+
+    # -------------------- QUERIES --------------------
+    def __contains__(self, name: str) -> bool:
+        return name in self._counts
+
+    def count(self, name: str) -> int:
+        return self._counts.get(name, 0)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    def __iter__(self) -> Iterator[str]:
+        counts = self._counts
+        for name in sorted(counts, key=_IDS.__getitem__):
+            for _ in range(counts[name]):
+                yield name
+
+    def stacks(self) -> List[Tuple[str, int]]:
+        """(name, count) for every item held, in item-ID order."""
+        counts = self._counts
+        return [(name, counts[name]) for name in sorted(counts, key=_IDS.__getitem__)]
+
+    def weapons(self) -> Tuple[str, ...]:
+        """Weapons held (once each), in item-ID order."""
+        return REGISTRY.weapon_names(self._weapons)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Inventory):
+            return self._counts == other._counts
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"Inventory({list(self)!r})"
+
+    # -------------------- CHANGES --------------------
+    def append(self, name: str):
+        counts = self._counts
+        held = counts.get(name)
+        if held:
+            counts[name] = held + 1
+        else:
+            if name not in _IDS:
+                REGISTRY.intern(name)
+            counts[name] = 1
+            bit = _WEAPON_BITS.get(name)
+            if bit:
+                self._weapons |= bit
+        self._size += 1
+
+    def remove(self, name: str):
+        """Remove one `name`; ValueError if none is held (like list.remove)."""
+        counts = self._counts
+        held = counts.get(name)
+        if not held:
+            raise ValueError(f"{name!r} not in inventory")
+        if held > 1:
+            counts[name] = held - 1
+        else:
+            del counts[name]
+            bit = _WEAPON_BITS.get(name)
+            if bit:
+                self._weapons &= ~bit
+        self._size -= 1
+
+
+# -------------------- BENCHMARK --------------------
+class _DictPlayer:
+    """The pre-slots Player layout, kept only as the benchmark baseline."""
+    def __init__(self):
+        self.max_health = 120
+        self.health = 100
+        self.inventory: List[str] = []
+        self.weapon: str = None
+        self.location: str = "Lobby"
+        self.flashlight_on: bool = False
+        self.flashlight_battery: int = 60
+        self.map_fragments_found: int = 0
+        self.map_unlocked: bool = False
+        self.has_master_key: bool = False
+        self.is_alive: bool = True
+        self.visited_rooms: set = set(["Lobby"])
+
+LOADOUT = ["Rusty Pipe", "Health Pack", "Batteries", "Health Pack", "Kitchen Knife", "Batteries", "Health Pack"]
+HOARD = LOADOUT + ["Health Pack", "Batteries"] * 40  # a late-game bag full of stacked consumables
+
+def _bytes_per(make, count: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [make() for _ in range(count)]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return used / count
+
+def benchmark(players: int = 10000) -> Dict[str, Dict[str, float]]:
+    import main
+
+    def old_player(items):
+        p = _DictPlayer()
+        p.inventory.extend(items)
+        return p
+
+    def new_player(items):
+        p = main.Player()
+        for name in items:
+            p.inventory.append(name)
+        return p
+
+    results = {}
+    for bag in (LOADOUT, HOARD):
+        for label, make, weapons in (("before", old_player, lambda p: [i for i in p.inventory if i in main.WEAPONS]),
+                                     ("after", new_player, lambda p: p.inventory.weapons())):
+            p = make(bag)
+            inv = p.inventory
+
+            def add_remove():
+                inv.append("Health Pack")
+                inv.remove("Health Pack")
+
+            n = 100000
+            results[f"{label} ({len(bag)} items)"] = {
+                "bytes_per_player": _bytes_per(lambda: make(bag), players),
+                "contains_ns": timeit.timeit(lambda: "Master Key" in inv, number=n) / n * 1e9,
+                "add_remove_ns": timeit.timeit(add_remove, number=n) / n * 1e9,
+                "weapons_ns": timeit.timeit(lambda: weapons(p), number=n) / n * 1e9,
+            }
+    return results
+
+def cli():
+    parser = argparse.ArgumentParser(description="Floor 13 Player / inventory benchmark")
+    parser.add_argument("--players", "-n", type=int, default=10000)
+    args = parser.parse_args()
+    results = benchmark(args.players)
+    print(f"Player memory at {args.players} players (tracemalloc), inventory ops (timeit):")
+    print(f"{'':<20}{'B/player':>10}{'in':>10}{'add+rm':>10}{'weapons':>10}")
+    for label, row in results.items():
+        print(f"{label:<20}{row['bytes_per_player']:>10.0f}{row['contains_ns']:>8.0f}ns"
+              f"{row['add_remove_ns']:>8.0f}ns{row['weapons_ns']:>8.0f}ns")
+
+if __name__ == "__main__":
+    cli()
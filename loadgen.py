@@ -0,0 +1,154 @@
+"""
+FLOOR 13 - Load generator
+Opens many connections to server.py:
+- idle clients log in and then just sit at the command prompt
+- active clients play (move to a random neighbour, fight by attacking,
+  check the map / inventory / flashlight) with a think time between
+  commands, and log back in as a new player when their game ends
+Reports commands per second and p50 / p99 response latency (time from
+sending a command to the next prompt arriving).
+
+Usage: python loadgen.py [--idle 1000] [--active 100] [--duration 30]
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from typing import List
+
+PROMPTS = (b"> ", b"Where to? ", b"Name: ", b"continue...)")
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.connected = 0
+        self.games = 0
+        self.errors = 0
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+async def read_prompt(reader: asyncio.StreamReader) -> str:
+    """Read until the server is waiting for input; returns everything since the last prompt."""
+    data = b""
+    while not data.endswith(PROMPTS):
+        chunk = await reader.read(4096)
+        if not chunk:
+            raise EOFError
+        data += chunk
+    return data.decode("utf-8", "ignore")
+
+
+def choose_command(screen: str, rng: random.Random) -> str:
+    if screen.endswith("Where to? "):
+        for line in reversed(screen.splitlines()):
+            if line.startswith("From here you can go: "):
+                return rng.choice(line[len("From here you can go: "):].split(", "))
+        return ""
+    if "[A]ttack" in screen:
+        return "a"
+    if screen.endswith("continue...)") or "Actions:" not in screen:
+        return ""  # Press Enter, inventory sub-menu, weapon choice
+    return rng.choices(["move", "map", "inventory", "flashlight", "use batteries"], [6, 1, 1, 1, 1])[0]
+
+
+async def login(reader, writer, name: str):
+    await read_prompt(reader)
+    writer.write(name.encode() + b"\r\n")
+    return await read_prompt(reader)
+
+
+async def idle_client(host: str, port: int, n: int, stats: Stats, stop: asyncio.Event):
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+        if (await login(reader, writer, f"idle-{n}")).endswith("continue...)"):
+            writer.write(b"\r\n")  # past the intro, to the command prompt
+            await read_prompt(reader)
+        stats.connected += 1
+        await stop.wait()
+        writer.close()
+    except (OSError, EOFError):
+        stats.errors += 1
+
+
+async def active_client(host: str, port: int, n: int, think: float, stats: Stats, stop: asyncio.Event):
+    rng = random.Random(n)
+    game = 0
+    while not stop.is_set():
+        online = False
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            screen = await login(reader, writer, f"load-{n}-{game}")
+            stats.connected += 1
+            online = True
+            while not stop.is_set():
+                await asyncio.sleep(rng.uniform(0, 2 * think))
+                writer.write(choose_command(screen, rng).encode() + b"\r\n")
+                sent = time.perf_counter()
+                screen = await read_prompt(reader)
+                stats.latencies.append(time.perf_counter() - sent)
+            writer.close()
+        except EOFError:
+            stats.games += 1  # ending reached: the server closed the connection
+        except OSError:
+            stats.errors += 1
+            await asyncio.sleep(1)
+        finally:
+            stats.connected -= online
+        game += 1
+
+
+async def run(host: str, port: int, idle: int, active: int, duration: float, think: float) -> Stats:
+    stats = Stats()
+    stop = asyncio.Event()
+    tasks = []
+    for n in range(idle):
+        tasks.append(asyncio.create_task(idle_client(host, port, n, stats, stop)))
+        if n % 100 == 99:
+            await asyncio.sleep(0.05)  # don't flood the listen backlog
+    ramp = time.perf_counter()
+    while stats.connected + stats.errors < idle and time.perf_counter() - ramp < 60:
+        await asyncio.sleep(0.1)  # measure steady state, not the login burst
+    print(f"  {stats.connected} idle clients logged in ({time.perf_counter() - ramp:.1f}s)", file=sys.stderr)
+    tasks += [asyncio.create_task(active_client(host, port, n, think, stats, stop)) for n in range(active)]
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        await asyncio.sleep(min(5, duration))
+        print(f"  {time.perf_counter() - start:5.1f}s  connected {stats.connected}  commands {len(stats.latencies)}",
+              file=sys.stderr)
+    stop.set()
+    await asyncio.wait(tasks, timeout=5)
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="Floor 13 server load generator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1313)
+    parser.add_argument("--idle", type=int, default=1000)
+    parser.add_argument("--active", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--think", type=float, default=0.5, help="mean seconds between an active client's commands")
+    args = parser.parse_args()
+    try:
+        import resource
+        _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+    stats = asyncio.run(run(args.host, args.port, args.idle, args.active, args.duration, args.think))
+    print(f"Commands: {len(stats.latencies)} in {stats.elapsed:.1f}s ({len(stats.latencies) / stats.elapsed:.0f}/s)")
+    print(f"Latency:  p50 {stats.percentile(0.5) * 1000:.1f} ms | p99 {stats.percentile(0.99) * 1000:.1f} ms")
+    print(f"Finished games: {stats.games} | connection errors: {stats.errors}")
+
+if __name__ == "__main__":
+    cli()
@@ -1,50 +1,79 @@
 """
 FLOOR 13 - Text Horror Adventure
 Features:
-- 13 connected rooms (the hotel)
+- 13 connected rooms (the hotel), loaded from a content pack (packs/hotel.json);
+  `--pack FILE` plays another pack, `--floor-seed N` a generated floor
 - Inventory, weapons, health packs, batteries
 - Flashlight (on/off) that drains while on; some rooms require light
 - Map fragments to collect and repair the map; map unlocks when all fragments found
-- Auto-save (savegame.json) after major events
+- Map of visited rooms and `travel <room>` along the shortest known path
+- `auto-explore` walks a planned route over the fragments left to the Boss Antechamber (planner.py)
+- Auto-save (savegame.dat: player, room loot, weapon durability) after major events
+- `--save FILE` / `--seed N` give a game its own save file and rolls
+- `--curses` plays full screen: status bar, narrative pane and mini-map (cursesui.py)
+- `--script FILE` / `--batch` run a command script at full speed with JSON results (batch.py)
+- `--record FILE` logs the session's seed and input for exact replay (replay.py)
+- `--stats FILE` times the hot paths; hidden `stats` command (instrument.py)
+- fight and solver tables are cached in ~/.cache/floor13 (FLOOR13_CACHE=DIR)
+- `--history DB` logs every finished run to a SQLite leaderboard (history.py)
+- `?` / `hint` at the fight prompt asks the combat solver for the best move (solver.py)
 - Random demon minion encounters; boss (The Matriarch)
 - Weapon system: damage, durability, switching, dropping
 - Multiple endings: Escape (coma), Consumed, Trapped Forever
 """
 
-import json
+import argparse
+import asyncio
 import random
-import time
 import os
-from typing import Dict, List
-
-SAVE_FILE = "savegame.json"
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import combat
+import console
+import content
+import floorgen
+import history
+import inventory
+import planner
+import render
+import rolls
+import saves
+import world
+
+SAVE_FILE = "savegame.dat"
+LEGACY_SAVE_FILE = "savegame.json"
+# Derived tables (fightstats.py, solver.py) are shared by every run, so they live outside the working directory.
+CACHE_DIR = os.environ.get("FLOOR13_CACHE") or os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "floor13")
 
 # -------------------- UTILITIES --------------------
+def cache_path(name: str) -> str:
+    """`name` in CACHE_DIR (created on first use); writers replace files atomically."""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+    except OSError:
+        pass  # the write that follows fails and the table stays in memory only
+    return os.path.join(CACHE_DIR, name)
+
 def slow(text: str, delay: float = 0.01):
-    for ch in text:
-        print(ch, end="", flush=True)
-        time.sleep(delay)
-    print()
+    render.RENDERER.write(text, delay)
 
 def newline():
     print()
 
-def press_enter():
-    input("\n(Press Enter to continue...)")
-
-# -------------------- WEAPONS --------------------
-WEAPONS = {
-    "Rusty Pipe": {"damage": 9, "durability": 20, "special": None},
-    "Kitchen Knife": {"damage": 14, "durability": 15, "special": "Bleed"},
-    "Revolver": {"damage": 26, "durability": 12, "special": "Critical"}
-}
+async def press_enter(s: "Session"):
+    await s.ask("\n(Press Enter to continue...)")
 
 # -------------------- PLAYER --------------------
 class Player:
+    __slots__ = ("max_health", "health", "_inventory", "weapon", "location", "flashlight_on", "flashlight_battery",
+                 "map_fragments_found", "map_unlocked", "has_master_key", "is_alive", "visited_rooms")
+
     def __init__(self):
         self.max_health = 120
         self.health = 100
-        self.inventory: List[str] = []
+        self.inventory = inventory.Inventory()
         self.weapon: str = None
         self.location: str = "Lobby"
         self.flashlight_on: bool = False
@@ -55,11 +84,20 @@ class Player:
         self.is_alive: bool = True
         self.visited_rooms: set = set(["Lobby"])
 
+    @property
+    def inventory(self) -> inventory.Inventory:
+        return self._inventory
+
+    @inventory.setter
+    def inventory(self, items):
+        """Accepts an Inventory or any iterable of item names (saves hand over lists)."""
+        self._inventory = items if isinstance(items, inventory.Inventory) else inventory.Inventory(items)
+
     def to_dict(self) -> Dict:
         return {
             "max_health": self.max_health,
             "health": self.health,
-            "inventory": self.inventory,
+            "inventory": list(self.inventory),
             "weapon": self.weapon,
             "location": self.location,
             "flashlight_on": self.flashlight_on,
@@ -85,437 +123,779 @@ class Player:
         self.is_alive = data.get("is_alive", True)
         self.visited_rooms = set(data.get("visited_rooms", ["Lobby"]))
 
-# -------------------- ROOMS --------------------
-ROOMS = {
-    "Lobby": {"desc": "An echoing hotel lobby, faded wallpaper, a broken chandelier.",
-              "adj": ["Left Hall", "Right Hall", "Stairwell"], "required_light": False,
-              "items": ["Map Fragment A"], "chance_enemy": 0.2, "is_fragment_room": True, "fragment_id": 1},
-    "Left Hall": {"desc": "A long corridor with locked doors and peeling carpet.",
-                  "adj": ["Room 101", "Room 102", "Lobby"], "required_light": False,
-                  "items": ["Rusty Pipe"], "chance_enemy": 0.3, "is_fragment_room": False, "fragment_id": None},
-    "Right Hall": {"desc": "The right wing smells of rot. Footprints that go nowhere.",
-                   "adj": ["Room 103", "Room 104", "Lobby"], "required_light": False,
-                   "items": ["Health Pack"], "chance_enemy": 0.35, "is_fragment_room": False, "fragment_id": None},
-    "Stairwell": {"desc": "A spiraling stairwell; the lights buzz and sometimes go out.",
-                  "adj": ["Basement", "Attic", "Lobby"], "required_light": True,
-                  "items": [], "chance_enemy": 0.4, "is_fragment_room": False, "fragment_id": None},
-    "Room 101": {"desc": "A child's drawing pinned to the wall. The bed is soaked.",
-                 "adj": ["Left Hall"], "required_light": True,
-                 "items": ["Map Fragment B"], "chance_enemy": 0.5, "is_fragment_room": True, "fragment_id": 2},
-    "Room 102": {"desc": "Furniture strewn about. A lamp that never fully lights.",
-                 "adj": ["Left Hall"], "required_light": False,
-                 "items": ["Batteries"], "chance_enemy": 0.4, "is_fragment_room": False, "fragment_id": None},
-    "Room 103": {"desc": "A mirror that doesn't reflect your face properly.",
-                 "adj": ["Right Hall"], "required_light": True,
-                 "items": ["Kitchen Knife"], "chance_enemy": 0.45, "is_fragment_room": False, "fragment_id": None},
-    "Room 104": {"desc": "Scratches on the walls in a frantic pattern.",
-                 "adj": ["Right Hall"], "required_light": False,
-                 "items": ["Map Fragment C"], "chance_enemy": 0.5, "is_fragment_room": True, "fragment_id": 3},
-    "Basement": {"desc": "Rusty boilers and a damp smell; something moves in the pipes.",
-                 "adj": ["Boiler Room", "Stairwell"], "required_light": True,
-                 "items": ["Health Pack", "Batteries"], "chance_enemy": 0.55, "is_fragment_room": False, "fragment_id": None},
-    "Boiler Room": {"desc": "Machines clank. Shadows crawl between the furnaces.",
-                    "adj": ["Basement"], "required_light": True,
-                    "items": ["Map Fragment D"], "chance_enemy": 0.6, "is_fragment_room": True, "fragment_id": 4},
-    "Attic": {"desc": "Cobwebs and trunks. Something whispers from a trunk.",
-              "adj": ["Stairwell", "Room 105"], "required_light": True,
-              "items": ["Revolver"], "chance_enemy": 0.5, "is_fragment_room": False, "fragment_id": None},
-    "Room 105": {"desc": "A bathroom mirror cracked with a message: 'DON'T WAKE HER.'",
-                 "adj": ["Attic", "Room 106"], "required_light": False,
-                 "items": ["Map Fragment E"], "chance_enemy": 0.45, "is_fragment_room": True, "fragment_id": 5},
-    "Room 106": {"desc": "A hallway inside a room; doors lead to nowhere.",
-                 "adj": ["Room 105", "Room 107"], "required_light": True,
-                 "items": ["Health Pack"], "chance_enemy": 0.5, "is_fragment_room": False, "fragment_id": None},
-    "Room 107": {"desc": "A door with thirteen brass numbers, cold to the touch.",
-                 "adj": ["Room 106", "Boss Antechamber"], "required_light": True,
-                 "items": ["Map Fragment F"], "chance_enemy": 0.6, "is_fragment_room": True, "fragment_id": 6},
-    "Boss Antechamber": {"desc": "A corridor of carpets stained black; a scent like old blood.",
-                         "adj": ["Room 107", "Boss Chamber"], "required_light": True,
-                         "items": ["Master Key"], "chance_enemy": 0.65, "is_fragment_room": False, "fragment_id": None},
-    "Boss Chamber": {"desc": "A vast room where the air itself bends. The Matriarch waits.",
-                     "adj": ["Boss Antechamber"], "required_light": True,
-                     "items": [], "chance_enemy": 0.0, "is_fragment_room": False, "fragment_id": None}
-}
+# -------------------- CONTENT --------------------
+# Rooms, weapons, enemies and the boss come from a content pack (packs/hotel.json), compiled
+# once into a snapshot that is memory-mapped here instead of parsed; see content.py.
+CONTENT = content.load(content.DEFAULT_PACK)
 
 FRAGMENTS_REQUIRED = 6
 
-# -------------------- ENEMIES --------------------
-ENEMY_TYPES = [
-    {"name": "Shadow Minion", "min_hp": 18, "max_hp": 36, "min_dmg": 5, "max_dmg": 14},
-    {"name": "Crawling Demon", "min_hp": 24, "max_hp": 40, "min_dmg": 8, "max_dmg": 16},
-    {"name": "Twisted Bellhop", "min_hp": 20, "max_hp": 38, "min_dmg": 6, "max_dmg": 15}
-]
-
-BOSS = {"name": "The Matriarch", "hp": 180, "min_dmg": 12, "max_dmg": 26}
+# One read-only copy shared by every session; what a session changes lives in its World.
+TEMPLATE = world.WorldTemplate(CONTENT.rooms, CONTENT.weapons, CONTENT.enemies, CONTENT.boss)
+ROOMS, WEAPONS, ENEMY_TYPES, BOSS = TEMPLATE.rooms, TEMPLATE.weapons, TEMPLATE.enemies, TEMPLATE.boss
+GRAPH = TEMPLATE.graph
+
+# -------------------- SESSION --------------------
+class GameOver(Exception):
+    """Raised by the endings and by quit; ends the game loop, not the process."""
+    def __init__(self, ending: str):
+        super().__init__(ending)
+        self.ending = ending
+
+class Session:
+    """One player's game: their state, their world, their save and async console I/O.
+    Nothing in the game loop touches module globals, so many sessions can share a process.
+    Every roll comes from the session's own RNG (rolls.py), so its seed plus the lines typed replay the game."""
+    def __init__(self, io: console.Console, world: "world.World", saves: "saves.SaveManager",
+                 player: Player = None, player_id: str = None, seed: int = None, recorder=None,
+                 history_db: "history.History" = None, rng=None):
+        self.io = io
+        self.world = world
+        self.saves = saves
+        self.player = player
+        self.player_id = player_id
+        self.seed = random.getrandbits(32) if seed is None else seed
+        self.rng = rng or rolls.Rolls(self.seed)  # or the random.Random an older session log was recorded with
+        self.recorder = recorder  # replay.Recorder, or None
+        self.stats = None  # instrument.Stats, when instrumented
+        self.history = history_db  # finished runs are logged here, if set
+        self.tally = history.Tally()  # moves, damage and hits of this run
+        self.route = None  # (state key, planner.Route) for auto-explore
+        self.idle = False  # True while waiting at the main command prompt
+        self.fight = None  # the combat.Turn waiting for an action, during a fight
+        self.store = None  # sessions.SessionStore that may evict this session while idle, if any
+        self.reloads = 0  # times the store brought it back from disk
+
+    @property
+    def rooms(self):
+        return self.world.rooms
+
+    @property
+    def weapons(self):
+        return self.world.weapons
+
+    @property
+    def graph(self):
+        return self.world.template.graph
+
+    def say(self, text: str):
+        self.io.say(text)
+
+    async def ask(self, prompt: str = "") -> str:
+        line = await self.io.ask(prompt)
+        if self.store:
+            self.store.touch(self)  # an evicted session is reloaded before the line is played
+        if self.recorder:
+            self.recorder.line(line)
+        return line
+
+def reload_rolls(s: Session):
+    """Rolls for a session reloaded from disk: a fresh stream per reload, logged so a replay follows it."""
+    s.reloads += 1
+    s.rng = rolls.Rolls(f"{s.seed}/reload{s.reloads}")
+    if s.recorder:
+        s.recorder.reload()
+
+def new_world(template: world.WorldTemplate = None) -> world.World:
+    """An untouched world for one session; shares everything with the template until it changes."""
+    return world.World(template or TEMPLATE)
 
 # -------------------- SAVE / LOAD --------------------
-def auto_save(player: Player):
-    data = player.to_dict()
-    try:
-        with open(SAVE_FILE, "w") as f:
-            json.dump(data, f, indent=2)
-    except:
-        pass
-
-def auto_load() -> Player:
+CODEC = saves.WorldCodec(ROOMS, WEAPONS, combat.LOOT_TABLE)
+# Weapons get the lowest item IDs, so inventories list them first and in WEAPONS order.
+inventory.REGISTRY.register(WEAPONS, weapon=True)
+inventory.REGISTRY.register(CODEC.item_names)
+WORLD = new_world()  # the local console game's world
+SAVES = saves.SaveManager(SAVE_FILE, CODEC, WORLD, legacy_path=LEGACY_SAVE_FILE)
+
+def custom_template(rooms, weapons=WEAPONS, enemies=ENEMY_TYPES, boss=BOSS
+                    ) -> Tuple[world.WorldTemplate, saves.WorldCodec]:
+    """Template and save codec for other content than the hotel; build once, share per session."""
+    codec = saves.WorldCodec(rooms, weapons, combat.LOOT_TABLE)
+    inventory.REGISTRY.register(weapons, weapon=True)
+    inventory.REGISTRY.register(codec.item_names)
+    return world.WorldTemplate(rooms, weapons, enemies, boss), codec
+
+def floor_template(seed: int, size: int) -> Tuple[world.WorldTemplate, saves.WorldCodec]:
+    """A generated floor (floorgen) with the hotel's weapons and enemies."""
+    return custom_template(floorgen.Floor(seed, size, FRAGMENTS_REQUIRED))
+
+def pack_template(path: str) -> Tuple[world.WorldTemplate, saves.WorldCodec]:
+    """Another content pack (its compiled snapshot is built or refreshed as needed)."""
+    pack = content.load(path)
+    return custom_template(pack.rooms, pack.weapons, pack.enemies, pack.boss)
+
+def floor_save_file(seed: int, size: int) -> str:
+    return f"savegame-{seed}-{size}.dat"
+
+def pack_save_file(path: str) -> str:
+    return f"savegame-{os.path.splitext(os.path.basename(path))[0]}.dat"
+
+def auto_save(s: Session):
+    s.saves.mark(s.player)
+
+def auto_load(s: Session) -> Player:
     p = Player()
-    if os.path.exists(SAVE_FILE):
-        try:
-            with open(SAVE_FILE, "r") as f:
-                data = json.load(f)
-            p.from_dict(data)
-            slow("Loaded previous auto-save.")
-        except:
-            pass
+    if s.saves.load(p):
+        s.say("Loaded previous auto-save.")
     return p
 
 # -------------------- INVENTORY & WEAPONS --------------------
-def check_weapon(player: Player):
+def check_weapon(s: Session):
+    player = s.player
     if player.weapon:
-        w = WEAPONS.get(player.weapon)
-        slow(f"Equipped: {player.weapon} | Damage: {w['damage']} | Durability: {w['durability']} | Special: {w['special']}")
+        w = s.weapons.get(player.weapon)
+        s.say(f"Equipped: {player.weapon} | Damage: {w['damage']} | Durability: {w['durability']} | Special: {w['special']}")
     else:
-        slow("No weapon equipped.")
+        s.say("No weapon equipped.")
 
-def switch_weapon(player: Player):
-    weapons_in_inventory = [item for item in player.inventory if item in WEAPONS]
+async def choose_weapon(s: Session) -> Optional[str]:
+    weapons_in_inventory = s.player.inventory.weapons()
     if not weapons_in_inventory:
-        slow("You have no weapons to equip.")
-        return
-    slow("Choose a weapon to equip:")
+        return None
+    s.say("Choose a weapon to equip:")
     for i, w in enumerate(weapons_in_inventory, 1):
-        slow(f"[{i}] {w} (Damage: {WEAPONS[w]['damage']}, Durability: {WEAPONS[w]['durability']})")
-    choice = input("> ")
+        s.say(f"[{i}] {w} (Damage: {s.weapons[w]['damage']}, Durability: {s.weapons[w]['durability']})")
+    choice = await s.ask("> ")
     if choice.isdigit() and 1 <= int(choice) <= len(weapons_in_inventory):
-        player.weapon = weapons_in_inventory[int(choice)-1]
-        slow(f"You equip {player.weapon}.")
+        return weapons_in_inventory[int(choice)-1]
+    return None
+
+async def switch_weapon(s: Session):
+    player = s.player
+    weapons_in_inventory = player.inventory.weapons()
+    if not weapons_in_inventory:
+        s.say("You have no weapons to equip.")
+        return
+    choice = await choose_weapon(s)
+    if choice:
+        player.weapon = choice
+        s.say(f"You equip {player.weapon}.")
     else:
-        slow("Invalid choice.")
+        s.say("Invalid choice.")
 
-def drop_weapon(player: Player):
-    weapons_in_inventory = [item for item in player.inventory if item in WEAPONS]
+async def drop_weapon(s: Session):
+    player = s.player
+    weapons_in_inventory = player.inventory.weapons()
     if not weapons_in_inventory:
-        slow("No weapons to drop.")
+        s.say("No weapons to drop.")
         return
-    slow("Which weapon do you want to drop?")
+    s.say("Which weapon do you want to drop?")
     for i, w in enumerate(weapons_in_inventory, 1):
-        slow(f"[{i}] {w}")
-    choice = input("> ")
+        s.say(f"[{i}] {w}")
+    choice = await s.ask("> ")
     if choice.isdigit() and 1 <= int(choice) <= len(weapons_in_inventory):
         w = weapons_in_inventory[int(choice)-1]
         player.inventory.remove(w)
         if player.weapon == w:
             player.weapon = None
-        slow(f"You dropped {w}.")
+        s.say(f"You dropped {w}.")
     else:
-        slow("Invalid choice.")
+        s.say("Invalid choice.")
 
 # -------------------- FLASHLIGHT & MAP --------------------
-def toggle_flashlight(player: Player):
+def toggle_flashlight(s: Session):
+    player = s.player
     if player.flashlight_on:
         player.flashlight_on = False
-        slow("You switch the flashlight off.")
+        s.say("You switch the flashlight off.")
     else:
         if player.flashlight_battery <= 0:
-            slow("The flashlight won't turn on — no battery power left.")
+            s.say("The flashlight won't turn on — no battery power left.")
             return
         player.flashlight_on = True
-        slow("You switch the flashlight on.")
-    auto_save(player)
+        s.say("You switch the flashlight on.")
+    auto_save(s)
 
-def drain_flashlight(player: Player, amount=8):
+def drain_flashlight(s: Session, amount=8):
+    player = s.player
     if player.flashlight_on:
         player.flashlight_battery -= amount
         if player.flashlight_battery <= 0:
             player.flashlight_battery = 0
             player.flashlight_on = False
-            slow("Your flashlight dies. Darkness surrounds you.")
-            auto_save(player)
+            s.say("Your flashlight dies. Darkness surrounds you.")
+            auto_save(s)
 
-def use_batteries(player: Player):
+def use_batteries(s: Session):
+    player = s.player
     if "Batteries" in player.inventory:
         player.inventory.remove("Batteries")
         player.flashlight_battery = min(100, player.flashlight_battery + 50)
-        slow("You recharge your flashlight.")
-        auto_save(player)
+        s.say("You recharge your flashlight.")
+        auto_save(s)
     else:
-        slow("No batteries available.")
+        s.say("No batteries available.")
 
-def show_map(player: Player):
-    if not player.map_unlocked:
-        slow("You haven't repaired the map yet.")
+def show_map(s: Session):
+    player = s.player
+    if player.map_unlocked:
+        s.say("\n-- MAP REPAIRED --")
     else:
-        slow("\n-- MAP REPAIRED --")
-        slow("Lobby -> Left Hall -> Rooms -> Stairwell -> Attic -> Boss Chamber etc.")
+        s.say(f"\n-- MAP (from memory; fragments {player.map_fragments_found}/{FRAGMENTS_REQUIRED}) --")
+    for line in s.graph.render(player.visited_rooms, player.location, reveal_all=player.map_unlocked):
+        s.say(line)
 
 # -------------------- ITEM PICKUP --------------------
-def find_items_in_room(player: Player, room_name: str):
-    room = ROOMS[room_name]
+def find_items_in_room(s: Session, room_name: str):
+    player = s.player
     found_any = False
-    while room["items"]:
-        item = room["items"].pop(0)
+    for item in s.world.take_items(room_name):
         if item.startswith("Map Fragment"):
             player.map_fragments_found += 1
-            slow(f"You found {item}!")
+            s.say(f"You found {item}!")
             found_any = True
             if player.map_fragments_found >= FRAGMENTS_REQUIRED:
                 player.map_unlocked = True
-                slow("All map fragments collected. The map repairs itself.")
+                s.say("All map fragments collected. The map repairs itself.")
         else:
             player.inventory.append(item)
-            slow(f"You pick up: {item}")
-            if item in WEAPONS and not player.weapon:
+            s.say(f"You pick up: {item}")
+            if item in s.weapons and not player.weapon:
                 player.weapon = item
-                slow(f"You equip {item}.")
+                s.say(f"You equip {item}.")
             found_any = True
-        auto_save(player)
+        auto_save(s)
     return found_any
 
-# -------------------- ENEMY ENCOUNTER --------------------
-def encounter_enemy(player: Player) -> bool:
-    enemy = random.choice(ENEMY_TYPES)
-    enemy_hp = random.randint(enemy["min_hp"], enemy["max_hp"])
-    slow(f"A {enemy['name']} attacks! HP: {enemy_hp}")
-    while enemy_hp > 0 and player.health > 0:
-        slow(f"Your HP: {player.health} | {enemy['name']} HP: {enemy_hp}")
-        action = input("[A]ttack  [H]eal  [R]un  [W]eapon Switch  > ").strip().lower()
-        if action in ("a", "attack"):
-            if player.weapon:
-                w = WEAPONS[player.weapon]
-                damage = w["damage"] + random.randint(0,5)
-                enemy_hp -= damage
-                w["durability"] -= 1
-                slow(f"You hit {enemy['name']} with {player.weapon} for {damage} damage. Durability left: {w['durability']}")
-                if w["durability"] <= 0:
-                    slow(f"Your {player.weapon} breaks!")
-                    player.inventory.remove(player.weapon)
-                    player.weapon = None
-            else:
-                damage = random.randint(3,8)
-                enemy_hp -= damage
-                slow(f"You punch for {damage} damage.")
-        elif action in ("h", "heal"):
-            if "Health Pack" in player.inventory:
-                player.inventory.remove("Health Pack")
-                healed = min(player.max_health - player.health, 30)
-                player.health += healed
-                slow(f"You use a Health Pack. HP +{healed}")
-                auto_save(player)
-            else:
-                slow("No Health Packs.")
-        elif action in ("r", "run"):
-            if random.random() > 0.5:
-                slow("You escape successfully!")
-                return False
-            else:
-                slow("Failed to escape!")
-        elif action in ("w", "weapon switch"):
-            switch_weapon(player)
-            continue
-        else:
-            slow("Invalid action.")
-            continue
-
-        if enemy_hp > 0:
-            hit = random.randint(enemy["min_dmg"], enemy["max_dmg"])
-            player.health -= hit
-            slow(f"{enemy['name']} hits you for {hit} damage.")
-            drain_flashlight(player, 4)
+# -------------------- COMBAT (interactive driver over combat.py) --------------------
+FIGHT_SAVE_EVENTS = {"heal", "flashlight_died", "slain", "loot", "flashlight_toggled", "round_end"}
+
+def describe_fight_event(event: tuple) -> Optional[str]:
+    kind = event[0]
+    if kind == "appears":
+        return f"A {event[1]} attacks! HP: {event[2]}"
+    if kind == "hit":
+        return f"You hit {event[1]} with {event[2]} for {event[3]} damage. Durability left: {event[4]}"
+    if kind == "boss_hit":
+        return f"You hit Matriarch with {event[2]} for {event[3]}. Durability: {event[4]}"
+    if kind == "weapon_broke":
+        return f"Your {event[1]} breaks!"
+    if kind == "punch":
+        return f"You punch for {event[1]} damage."
+    if kind == "boss_punch":
+        return f"You attack with fists for {event[1]}"
+    if kind == "heal":
+        return f"You use a Health Pack. HP +{event[1]}"
+    if kind == "boss_heal":
+        return f"Heal +{event[1]}"
+    if kind == "no_health_packs":
+        return "No Health Packs."
+    if kind == "escaped":
+        return "You escape successfully!"
+    if kind == "escape_failed":
+        return "Failed to escape!"
+    if kind == "no_weapons":
+        return "You have no weapons to equip."
+    if kind == "equip":
+        return f"You equip {event[1]}."
+    if kind == "invalid_choice":
+        return "Invalid choice."
+    if kind == "invalid_action":
+        return "Invalid action."
+    if kind == "enemy_hit":
+        return f"{event[1]} hits you for {event[2]} damage."
+    if kind == "flashlight_died":
+        return "Your flashlight dies. Darkness surrounds you."
+    if kind == "slain":
+        return "You have been slain..."
+    if kind == "defeated":
+        return f"You defeat the {event[1]}."
+    if kind == "loot":
+        return f"The {event[1]} dropped: {event[2]}"
+    if kind == "boss_appears":
+        return "\nThe Matriarch looms before you!"
+    if kind == "flashlight_off":
+        return "You turn off flashlight."
+    if kind == "flashlight_toggled":
+        return "You switch the flashlight on." if event[1] else "You switch the flashlight off."
+    if kind == "flashlight_no_battery":
+        return "The flashlight won't turn on — no battery power left."
+    if kind == "boss_hits":
+        return f"Matriarch hits you for {event[1]} damage!"
+    if kind == "summon":
+        return "Matriarch summons a minion!"
+    if kind == "boss_defeated":
+        return "Matriarch defeated! You find a note: 'Wake me.'"
+    return None
+
+def show_fight_event(s: Session, event: tuple):
+    s.tally.fight_event(s.player.location, event)
+    text = describe_fight_event(event)
+    if text is not None:
+        s.say(text)
+    if event[0] == "appears":
+        show_threat(s, event[1])
+    if event[0] in FIGHT_SAVE_EVENTS:
+        auto_save(s)
+
+def show_threat(s: Session, enemy_name: str):
+    import fightstats  # imports main; loaded on first fight to avoid a circular import
+    weapon = s.player.weapon
+    durability = s.world.durability_of(weapon) if weapon else None
+    threat = fightstats.threat_estimate(enemy_name, weapon, s.player.health, durability, s.world.template)
+    if threat:
+        s.say(f"Threat estimate: {threat['lethal']:.0%} lethal | ~{threat['turns']:.1f} turns | ~{threat['damage']:.0f} damage")
+
+def foe_name(turn: combat.Turn) -> str:
+    return "Matriarch" if turn.boss else turn.enemy["name"]
+
+def fight_status(turn: combat.Turn) -> str:
+    return f"Your HP: {turn.player.health} | {foe_name(turn)} HP: {turn.enemy_hp}"
+
+def fight_actions(turn: combat.Turn) -> str:
+    if turn.boss:
+        return "[A]ttack  [H]eal  [S]hutdown flashlight  [F]lashlight  [W]eapon Switch  [?]"
+    return "[A]ttack  [H]eal  [R]un  [W]eapon Switch  [?]"
+
+def fight_prompt(turn: combat.Turn) -> str:
+    return fight_actions(turn) + "  > "
+
+HINT = "hint"
+
+def parse_fight_action(text: str, boss: bool):
+    """Map typed text to a combat action; a weapon switch still needs its target."""
+    action = text.strip().lower()
+    if action in ("a", "attack"):
+        return combat.ATTACK
+    if action in ("h", "heal"):
+        return combat.HEAL
+    if action in ("r", "run") and not boss:
+        return combat.RUN
+    if action in ("s", "shut") and boss:
+        return combat.SHUT
+    if action in ("f", "flashlight") and boss:
+        return combat.FLASHLIGHT
+    if action in ("w", "weapon switch"):
+        return combat.SWITCH
+    if action in ("?", "hint"):
+        return HINT
+    return action
+
+async def ask_fight_action(s: Session, turn: combat.Turn):
+    s.fight = turn
+    if has_status_panel(s):
+        prompt = "> "  # the panel shows both HPs and the actions, redrawing only what changed
+    else:
+        s.say(fight_status(turn))
+        prompt = fight_prompt(turn)
+    action = parse_fight_action(await s.ask(prompt), turn.boss)
+    while action == HINT:
+        await show_hint(s, turn)
+        action = parse_fight_action(await s.ask(prompt), turn.boss)
+    if action == combat.SWITCH:
+        return (combat.SWITCH, await choose_weapon(s))
+    return action
+
+NO_HINT = "No hint available (the combat solver needs NumPy once to build its table)."
+
+async def show_hint(s: Session, turn: combat.Turn):
+    import solver  # imports main, like fightstats
+    template = s.world.template
+    stats = solver.fight_stats(template.enemies, template.weapons, template.boss)
+    if not solver.has_table(stats):
+        # The first solve takes seconds: keep the other sessions playing meanwhile.
+        s.say("(Working out every fight once; this takes a few seconds...)")
+        if await off_loop(solver.load_table, stats) is None:
+            s.say(NO_HINT)
+            return
+    say_hint(s.say, template, s.weapons, turn)
+
+def say_hint(say, template, weapons, turn: combat.Turn):
+    """The combat solver's best move for `turn`, through `say` (shared with functions.py)."""
+    import solver  # imports main, like fightstats
+    stats = solver.fight_stats(template.enemies, template.weapons, template.boss)
+    if not solver.has_table(stats):
+        say("(Working out every fight once; this takes a few seconds...)")
+    table = solver.load_table(stats)
+    advice = solver.advise(turn, weapons, table) if table else None
+    if advice is None:
+        say(NO_HINT)
+        return
+    goal = "to beat the Matriarch" if turn.boss or turn.boss_hp > 0 else "to get out alive"
+    if isinstance(advice.action, tuple):
+        move = f"switch to the {advice.action[1]}"
+    else:
+        move = advice.action
+    say(f"Hint: {move} ({advice.chance:.0%} chance {goal} with best play)")
 
-    if player.health <= 0:
-        slow("You have been slain...")
-        player.is_alive = False
-        auto_save(player)
-        return True
-
-    slow(f"You defeat the {enemy['name']}.")
-    if random.random() > 0.6:
-        loot = random.choice(["Health Pack","Batteries"])
-        player.inventory.append(loot)
-        slow(f"The {enemy['name']} dropped: {loot}")
-        auto_save(player)
-    return False
+async def run_fight(s: Session, steps) -> str:
+    """combat.drive() for an async policy: feed typed actions into the fight generator."""
+    try:
+        turn = next(steps)
+        while True:
+            turn = steps.send(await ask_fight_action(s, turn))
+    except StopIteration as stop:
+        return stop.value
+    finally:
+        s.fight = None
+
+async def encounter_enemy(s: Session) -> bool:
+    enemy = s.rng.choice(s.world.template.enemy_table)
+    steps = combat.encounter(s.player, enemy, s.weapons, lambda e: show_fight_event(s, e), s.rng)
+    return await run_fight(s, steps) == combat.DIED
 
 # -------------------- BOSS FIGHT --------------------
-def boss_battle(player: Player):
-    slow("\nThe Matriarch looms before you!")
-    boss_hp = BOSS["hp"]
-    while boss_hp > 0 and player.health > 0:
-        slow(f"Your HP: {player.health} | Matriarch HP: {boss_hp}")
-        action = input("[A]ttack  [H]eal  [S]hutdown flashlight  [F]lashlight  [W]eapon Switch  > ").strip().lower()
-        if action in ("a","attack"):
-            if player.weapon:
-                w = WEAPONS[player.weapon]
-                dmg = w["damage"] + random.randint(5,10)
-                boss_hp -= dmg
-                w["durability"] -= 1
-                slow(f"You hit Matriarch with {player.weapon} for {dmg}. Durability: {w['durability']}")
-                if w["durability"] <= 0:
-                    slow(f"Your {player.weapon} breaks!")
-                    player.inventory.remove(player.weapon)
-                    player.weapon = None
-            else:
-                dmg = random.randint(5,9)
-                boss_hp -= dmg
-                slow(f"You attack with fists for {dmg}")
-        elif action in ("h","heal"):
-            if "Health Pack" in player.inventory:
-                player.inventory.remove("Health Pack")
-                healed = min(player.max_health - player.health, 40)
-                player.health += healed
-                slow(f"Heal +{healed}")
-            else:
-                slow("No Health Packs.")
-        elif action in ("s","shut"):
-            player.flashlight_on = False
-            slow("You turn off flashlight.")
-        elif action in ("f","flashlight"):
-            toggle_flashlight(player)
-        elif action in ("w","weapon switch"):
-            switch_weapon(player)
-        else:
-            slow("Invalid action.")
-            continue
-
-        hit = random.randint(BOSS["min_dmg"], BOSS["max_dmg"])
-        player.health -= hit
-        slow(f"Matriarch hits you for {hit} damage!")
-        if random.random() > 0.7:
-            slow("Matriarch summons a minion!")
-            if encounter_enemy(player):
-                return
-
-        drain_flashlight(player, 6)
-        auto_save(player)
-
-    if player.health <= 0:
-        ending_consumed()
+async def boss_battle(s: Session):
+    template = s.world.template
+    steps = combat.boss_encounter(s.player, template.boss, template.enemy_table, s.weapons,
+                                  lambda e: show_fight_event(s, e), s.rng)
+    if await run_fight(s, steps) == combat.DIED:
+        ending_consumed(s)
     else:
-        slow("Matriarch defeated! You find a note: 'Wake me.'")
-        ending_escape()
+        ending_escape(s)
 
 # -------------------- ENDINGS --------------------
-def ending_escape():
-    slow("\nLight pierces your eyes. You wake in a hospital.")
-    slow("You've been in a coma for weeks. Floor 13 is behind you.")
-    try: os.remove(SAVE_FILE)
-    except: pass
-    exit(0)
-
-def ending_consumed():
-    slow("\nYou are consumed by the darkness. Forever lost in Floor 13.")
-    try: os.remove(SAVE_FILE)
-    except: pass
-    exit(0)
-
-def ending_trapped_forever():
-    slow("\nThe hotel stretches endlessly. You are trapped forever.")
-    try: os.remove(SAVE_FILE)
-    except: pass
-    exit(0)
+def ending_escape(s: Session):
+    s.say("\nLight pierces your eyes. You wake in a hospital.")
+    s.say("You've been in a coma for weeks. Floor 13 is behind you.")
+    end_run(s, "escape")
+
+def ending_consumed(s: Session):
+    s.say("\nYou are consumed by the darkness. Forever lost in Floor 13.")
+    end_run(s, "consumed")
+
+def ending_trapped_forever(s: Session):
+    s.say("\nThe hotel stretches endlessly. You are trapped forever.")
+    end_run(s, "trapped")
+
+def end_run(s: Session, ending: str):
+    """The run is over: its save goes, its record goes to the run history (if any)."""
+    s.saves.delete()
+    if s.history:
+        s.history.add(*history.game_run(s, ending))
+    raise GameOver(ending)
 
 # -------------------- NAVIGATION --------------------
-def move_to_room(player: Player, dest: str):
-    if dest not in ROOMS[player.location]["adj"]:
-        slow("Cannot go there directly.")
-        return
-    if ROOMS[dest]["required_light"] and not player.flashlight_on:
-        slow("Too dark to enter without flashlight.")
-        return
+async def move_to_room(s: Session, dest: str) -> bool:
+    """One step to an adjacent room; False if the move was refused."""
+    player = s.player
+    if dest not in s.rooms[player.location]["adj"]:
+        s.say("Cannot go there directly.")
+        return False
+    if s.rooms[dest]["required_light"] and not player.flashlight_on:
+        s.say("Too dark to enter without flashlight.")
+        return False
     player.location = dest
     player.visited_rooms.add(dest)
-    drain_flashlight(player, 6)
-    auto_save(player)
-    slow(f"You move into {dest}")
-    if not find_items_in_room(player, dest):
-        slow(ROOMS[dest]["desc"])
-    if ROOMS[dest]["chance_enemy"] > 0 and random.random() < ROOMS[dest]["chance_enemy"]:
-        if encounter_enemy(player):
-            ending_consumed()
+    s.tally.visits[dest] += 1
+    drain_flashlight(s, 6)
+    auto_save(s)
+    s.say(f"You move into {dest}")
+    if not find_items_in_room(s, dest):
+        s.say(s.rooms[dest]["desc"])
+    if s.rooms[dest]["chance_enemy"] > 0 and s.rng.random() < s.rooms[dest]["chance_enemy"]:
+        if await encounter_enemy(s):
+            ending_consumed(s)
     if dest == "Boss Antechamber" and "Master Key" in player.inventory:
-        slow("Door to Boss Chamber unlocked.")
+        s.say("Door to Boss Chamber unlocked.")
     if dest == "Boss Chamber":
-        if player.has_master_key or random.random() > 0.5:
-            slow("You confront the Matriarch.")
-            boss_battle(player)
+        if player.has_master_key or s.rng.random() > 0.5:
+            s.say("You confront the Matriarch.")
+            await boss_battle(s)
+        else:
+            s.say("You feel a wrong step... darkness surrounds you.")
+            await boss_battle(s)
+    return True
+
+async def travel(s: Session, text: str):
+    """Walk to a known room along the precomputed shortest path, one move_to_room per hop,
+    so every room on the way still drains the flashlight and can hold an encounter."""
+    player = s.player
+    if not text.strip():
+        s.say("Travel where? (travel <room>)")
+        return
+    dest = s.graph.resolve(text)
+    if dest is None:
+        s.say("Unknown location.")
+        return
+    if dest == player.location:
+        s.say("You're already there.")
+        return
+    if dest not in player.visited_rooms and not player.map_unlocked:
+        s.say("You don't know the way there yet.")
+        return
+    path = s.graph.path(player.location, dest, dark_ok=player.flashlight_on)
+    if path is None:
+        if s.graph.path(player.location, dest) is not None:
+            s.say("The way there is too dark without your flashlight.")
         else:
-            slow("You feel a wrong step... darkness surrounds you.")
-            boss_battle(player)
+            s.say("You can't find a way there.")
+        return
+    await walk(s, path, dest)
+
+async def walk(s: Session, path: List[str], dest: str, light: bool = False) -> bool:
+    """Move along `path`, committing each hop; stops (False) when refused or hurt on the way.
+    With `light`, the flashlight goes on just to step into dark rooms (a battery goes in if it is flat)."""
+    player = s.player
+    for hop in path:
+        if light:
+            dark = s.rooms[hop]["required_light"]
+            if dark and player.flashlight_battery < planner.DRAIN and "Batteries" in player.inventory:
+                use_batteries(s)
+            if dark != player.flashlight_on:
+                toggle_flashlight(s)
+        health = player.health
+        if not await move_to_room(s, hop):
+            return False
+        s.saves.commit()
+        if player.health < health and hop != dest:
+            s.say("You stop to catch your breath.")
+            return False
+    return True
+
+async def off_loop(fn, *args):
+    """Run slow, self-contained work (route planning) on a worker thread so other sessions
+    keep playing; games stepped without an event loop (replay.run_sync) just call it."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return fn(*args)
+    return await loop.run_in_executor(None, fn, *args)
+
+async def auto_explore(s: Session):
+    """Walk the planned route (planner.py) leg by leg until it is done or something interrupts it."""
+    route = await off_loop(planner.plan, s)
+    if route is None:
+        s.say("You can't see a way to the remaining fragments with the light you have.")
+        return
+    if not route.legs:
+        s.say("Nothing left to explore.")
+        return
+    s.say(f"Route: {' -> '.join(leg.room for leg in route.legs)} "
+          f"({route.moves} moves, about {route.battery}% battery)")
+    while route and route.legs:
+        leg = route.legs[0]
+        if not await walk(s, leg.path, leg.room, light=True):
+            return
+        route = await off_loop(planner.plan, s)
 
 # -------------------- STATUS & INVENTORY --------------------
-def show_status(player: Player):
-    slow(f"Location: {player.location} | HP: {player.health}/{player.max_health}")
-    slow(f"Weapon: {player.weapon} | Flashlight: {'ON' if player.flashlight_on else 'OFF'} ({player.flashlight_battery}%)")
-    slow(f"Map fragments: {player.map_fragments_found}/{FRAGMENTS_REQUIRED}")
-    slow(f"Master Key: {'Yes' if player.has_master_key else 'No'}")
-
-def show_inventory(player: Player):
-    slow("INVENTORY:")
-    if not player.inventory:
-        slow("- Empty")
+ACTIONS = "Actions: [move] [travel <room>] [auto-explore] [inventory] [flashlight] [map] [use batteries] [quit]"
+
+def has_status_panel(s: Session) -> bool:
+    """The front end keeps status and actions on screen itself (cursesui.py)."""
+    return getattr(s.io, "status_panel", False)
+
+def show_status(s: Session):
+    player = s.player
+    s.say(f"Location: {player.location} | HP: {player.health}/{player.max_health}")
+    s.say(f"Weapon: {player.weapon} | Flashlight: {'ON' if player.flashlight_on else 'OFF'} ({player.flashlight_battery}%)")
+    s.say(f"Map fragments: {player.map_fragments_found}/{FRAGMENTS_REQUIRED}")
+    s.say(f"Master Key: {'Yes' if player.has_master_key else 'No'}")
+
+def show_inventory(s: Session):
+    s.say("INVENTORY:")
+    if not s.player.inventory:
+        s.say("- Empty")
     else:
-        for item in player.inventory:
-            slow(f"- {item}")
-    check_weapon(player)
+        for item, count in s.player.inventory.stacks():
+            s.say(f"- {item}" if count == 1 else f"- {item} x{count}")
+    check_weapon(s)
+
+def show_stats(s: Session):
+    """Hidden command: where this session's (and the process's) time went."""
+    if s.stats is None:
+        s.say("Nothing is being measured (start with --stats FILE).")
+        return
+    import instrument
+    for title, stats in (("This session", s.stats), ("All sessions", instrument.PROCESS)):
+        s.say(f"{title}:")
+        for line in stats.report():
+            s.say("  " + line)
+
+# -------------------- TIMED EVENTS --------------------
+IDLE_DRAIN_SECONDS = 30
+AMBIENT_EVERY = (45, 120)
+AMBIENT_LINES = [
+    "Somewhere above you, a door slams.",
+    "The lights flicker. For a moment you hear breathing that isn't yours.",
+    "A phone rings in an empty room, then stops.",
+    "Wet footsteps pass behind the wall.",
+    "The elevator chimes. There is no elevator on this floor.",
+]
 
-# -------------------- INTRO & MAIN LOOP --------------------
-def intro():
-    slow("You awaken in darkness. A brass plate reads 'FLOOR 13'. You must escape.")
-    press_enter()
+async def flashlight_timer(s: Session):
+    """While the player stands around with the flashlight on, it keeps draining."""
+    while True:
+        await asyncio.sleep(IDLE_DRAIN_SECONDS)
+        if s.idle and s.player and s.player.flashlight_on:
+            idle_drain(s)
+
+def idle_drain(s: Session):
+    """One idle tick of the flashlight; recorded, since replays have no clock."""
+    if s.recorder:
+        s.recorder.tick()
+    drain_flashlight(s, 1)
+    auto_save(s)
+    s.saves.commit()
+
+AMBIENT_RNG = random.Random()  # own stream: flavour text must not shift game rolls (one for all sessions)
+
+async def ambient_events(s: Session, rng: random.Random = AMBIENT_RNG):
+    while True:
+        await asyncio.sleep(rng.uniform(*AMBIENT_EVERY))
+        if s.idle:
+            s.say(rng.choice(AMBIENT_LINES))
 
-def main_loop():
-    player = auto_load()
-    if not os.path.exists(SAVE_FILE):
-        intro()
-        auto_save(player)
+# -------------------- INTRO & MAIN LOOP --------------------
+async def intro(s: Session):
+    s.say("You awaken in darkness. A brass plate reads 'FLOOR 13'. You must escape.")
+    await press_enter(s)
+
+async def play(s: Session):
+    """The game itself; returns (or raises GameOver) when the game ends."""
+    s.player = auto_load(s)
+    if s.recorder:
+        s.recorder.start(s)
+    if not s.saves.exists():
+        await intro(s)
+        auto_save(s)
     else:
-        slow(f"Resuming at {player.location}")
-        press_enter()
-
-    while player.is_alive:
-        show_status(player)
-        slow("Actions: [move] [inventory] [flashlight] [map] [use batteries] [quit]")
-        action = input("> ").strip().lower()
-        if action == "move":
-            adj = ROOMS[player.location]["adj"]
-            slow("From here you can go: " + ", ".join(adj))
-            dest = input("Where to? ").strip()
-            if dest in ROOMS:
-                move_to_room(player, dest)
-            else:
-                slow("Unknown location.")
-        elif action == "inventory":
-            show_inventory(player)
-            slow("[S]witch weapon, [D]rop weapon, [Enter] back")
-            sub = input("> ").strip().lower()
-            if sub == "s":
-                switch_weapon(player)
-            elif sub == "d":
-                drop_weapon(player)
-        elif action == "flashlight":
-            toggle_flashlight(player)
-        elif action == "map":
-            show_map(player)
-        elif action == "use batteries":
-            use_batteries(player)
-        elif action == "quit":
-            slow("Quit? [y/N]")
-            if input("> ").lower() == "y":
-                auto_save(player)
-                exit(0)
+        s.say(f"Resuming at {s.player.location}")
+        await press_enter(s)
+
+    panel = has_status_panel(s)
+    while s.player.is_alive:
+        if not panel:
+            show_status(s)
+            s.say(ACTIONS)
+        s.idle = True
+        if s.store:
+            s.store.rest(s)
+        try:
+            action = (await s.ask("> ")).strip().lower()
+        finally:
+            s.idle = False
+        await run_command(s, action)
+
+async def run_command(s: Session, action: str):
+    """One command from the main prompt. Nothing here outlives it: while the player is idle,
+    a session store may swap the Player and World for copies reloaded from disk (sessions.py)."""
+    player = s.player
+    if action == "move":
+        adj = s.rooms[player.location]["adj"]
+        s.say("From here you can go: " + ", ".join(adj))
+        dest = (await s.ask("Where to? ")).strip()
+        if dest in s.rooms:
+            await move_to_room(s, dest)
         else:
-            slow("Unknown command.")
+            s.say("Unknown location.")
+    elif action == "travel" or action.startswith("travel "):
+        await travel(s, action[len("travel"):])
+    elif action == "auto-explore":
+        await auto_explore(s)
+    elif action == "inventory":
+        show_inventory(s)
+        s.say("[S]witch weapon, [D]rop weapon, [Enter] back")
+        sub = (await s.ask("> ")).strip().lower()
+        if sub == "s":
+            await switch_weapon(s)
+        elif sub == "d":
+            await drop_weapon(s)
+    elif action == "flashlight":
+        toggle_flashlight(s)
+    elif action == "map":
+        show_map(s)
+    elif action == "use batteries":
+        use_batteries(s)
+    elif action == "stats":
+        show_stats(s)
+    elif action == "quit":
+        s.say("Quit? [y/N]")
+        if (await s.ask("> ")).lower() == "y":
+            auto_save(s)
+            s.saves.flush(wait=False)  # the atexit / session close waits for it
+            raise GameOver("quit")
+    else:
+        s.say("Unknown command.")
 
-        if player.health <= 0:
-            ending_consumed()
-        auto_save(player)
+    if player.health <= 0:
+        ending_consumed(s)
+    auto_save(s)
+    s.saves.commit()
+
+    if len(player.visited_rooms) > 30 and player.map_fragments_found < 2:
+        ending_trapped_forever(s)
+
+async def run_console_game(recorder=None, history_db: history.History = None, seed: int = None) -> Optional[str]:
+    """Local terminal game: renderer, stdin reader and timed events run next to play()."""
+    io = console.stdin_console()
+    s = Session(io, WORLD, SAVES, seed=seed, recorder=recorder, history_db=history_db)
+    tasks = [asyncio.create_task(io.render()),
+             asyncio.create_task(flashlight_timer(s)),
+             asyncio.create_task(ambient_events(s))]
+    console.start_stdin_reader(io, asyncio.get_running_loop())
+    ending = None
+    try:
+        await play(s)
+    except GameOver as over:
+        ending = over.ending
+    except EOFError:
+        s.saves.flush()
+    finally:
+        if recorder:
+            recorder.finish(s, ending)
+        await io.drain()
+        for task in tasks:
+            task.cancel()
+    return ending
 
-        if len(player.visited_rooms) > 30 and player.map_fragments_found < 2:
-            ending_trapped_forever()
+def main_loop():
+    global WORLD, SAVES
+    parser = argparse.ArgumentParser(description="Floor 13")
+    parser.add_argument("--floor-seed", type=int, help="play a generated floor (floorgen) instead of the hotel")
+    parser.add_argument("--floor-size", type=int, default=floorgen.DEFAULT_SIZE, help="rooms on the generated floor")
+    parser.add_argument("--pack", help="play another content pack (packs/*.json) instead of the hotel")
+    parser.add_argument("--record", metavar="FILE", help="record the seed and every line typed (see replay.py)")
+    parser.add_argument("--stats", metavar="FILE", default=os.environ.get("FLOOR13_STATS"),
+                        help="count and time the hot paths; totals are written here at exit (see instrument.py)")
+    parser.add_argument("--history", metavar="DB", default=os.environ.get("FLOOR13_HISTORY"),
+                        help="log every finished run to this SQLite database (see history.py)")
+    parser.add_argument("--save", metavar="FILE", help="save file (default: savegame.dat; none in batch mode)")
+    parser.add_argument("--seed", type=int, help="seed the game's rolls")
+    parser.add_argument("--curses", action="store_true", help="play full screen (see cursesui.py)")
+    parser.add_argument("--script", metavar="FILE", help="run the commands in FILE at full speed, "
+                                                         "JSON results on stdout (see batch.py)")
+    parser.add_argument("--batch", action="store_true", help="the same, reading the commands from stdin")
+    args = parser.parse_args()
+    if args.stats:
+        import instrument
+        instrument.install(args.stats)
+    content_spec = {}
+    template, codec, save_file = TEMPLATE, CODEC, None
+    if args.pack:
+        content_spec = {"pack": os.path.abspath(args.pack)}
+        template, codec = pack_template(args.pack)
+        save_file = pack_save_file(args.pack)
+    elif args.floor_seed is not None:
+        content_spec = {"floor": [args.floor_seed, args.floor_size]}
+        template, codec = floor_template(args.floor_seed, args.floor_size)
+        save_file = floor_save_file(args.floor_seed, args.floor_size)
+    history_db = history.open_history(args.history)
+    if args.script or args.batch:
+        import batch
+        lines = open(args.script, encoding="utf-8") if args.script else sys.stdin
+        summary = batch.run(lines, template, codec, args.save, args.seed, history_db,
+                            name=os.path.splitext(os.path.basename(args.script or "batch"))[0])
+        sys.exit(1 if summary["errors"] else 0)
+    if args.save or save_file:
+        WORLD = new_world(template)
+        SAVES = saves.SaveManager(args.save or save_file, codec, WORLD)
+    recorder = None
+    if args.record:
+        import replay
+        recorder = replay.Recorder(args.record, content_spec)
+    if args.curses:
+        import cursesui
+        cursesui.run(WORLD, SAVES, recorder, history_db, args.seed)
+        return
+    asyncio.run(run_console_game(recorder, history_db, args.seed))
 
 if __name__ == "__main__":
     try:
         main_loop()
     except KeyboardInterrupt:
+        SAVES.flush()
         slow("\nExiting game (auto-saved).")
-        exit(0)
\ No newline at end of file
+        exit(0)
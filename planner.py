@@ -0,0 +1,346 @@
+"""
+FLOOR 13 - Route planner
+The `auto-explore` command's route: every map fragment still lying around,
+then the Boss Antechamber, in the fewest moves and (among those) with the
+least flashlight battery:
+- targets are the rooms still holding a fragment, plus Batteries lying on
+  the ways between them (optional pickups, up to MAX_TARGETS in all)
+- each leg between two targets is walked either through lit rooms only,
+  or the shortest way with the flashlight switched on for each step into a
+  dark room and off again after it (DRAIN per dark room); distances come
+  from the template's room graph, which caches them
+- Held-Karp over (targets picked up, last target): a bitmask DP in which
+  a leg is only allowed if the battery (plus every Batteries held or
+  picked up so far) covers it; batteries are taken as used when the light
+  runs low, so none of their charge is lost to the 100% cap
+- Batteries never shorten a route, they only make one possible, so the DP
+  runs on the fragments alone first and adds the Batteries 4, 8, ... at a
+  time only while no route fits the battery
+- with NumPy the DP runs one popcount layer at a time, vectorized over the
+  masks and skipping the ones no route fits (20 targets in a few seconds
+  at worst); without it a plain version plans up to PLAIN_TARGETS
+- main.auto_explore runs plan() on a worker thread, so a slow plan on a
+  big floor never stalls the other sessions on the server's event loop
+- the route is kept on the session and reused until the player's
+  position, battery or the world's loot changes; walking its first leg
+  just moves on to the next one, as long as the battery still covers it
+- fights drain the flashlight too, but they cannot be planned for; the
+  next auto-explore simply plans again from wherever the player ended up
+
+Usage: python planner.py [--floor-size 1000] [--seeds 10] [--targets 20]   (planning benchmark)
+"""
+
+import argparse
+import random
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+END_ROOM = "Boss Antechamber"
+DRAIN = 6             # battery per move with the flashlight on (mirrors main.move_to_room)
+CHARGE = 50           # one Batteries (mirrors main.use_batteries)
+MAX_TARGETS = 20
+PLAIN_TARGETS = 10    # without NumPy
+KEY_SCALE = 1 << 24   # route key = moves * KEY_SCALE + battery: fewest moves, then least battery
+INF = 1 << 62
+
+_unavailable = False  # NumPy missing
+
+
+class Leg(NamedTuple):
+    room: str
+    path: List[str]   # rooms walked through, room included
+    lit: bool         # True: only lit rooms on the way
+    battery: int      # drained on the way (the light is on only to enter dark rooms)
+
+class Route(NamedTuple):
+    legs: List[Leg]
+    moves: int
+    battery: int
+
+
+# -------------------- TARGETS --------------------
+def fragment_rooms(world) -> List[str]:
+    """Rooms that still hold a map fragment."""
+    rooms = world.template.rooms
+    ids = getattr(rooms, "fragment_rooms", None)  # a generated floor knows them up front
+    names = [rooms.room_name(i) for i in ids] if ids is not None else \
+        [name for name in rooms if rooms[name]["is_fragment_room"]]
+    return [name for name in names if any(item.startswith("Map Fragment") for item in world.items(name))]
+
+def battery_rooms(world, graph, points: List[str], limit: int) -> List[str]:
+    """Rooms with Batteries on the ways between `points`, those on the most ways first."""
+    ways: Dict[str, int] = {}
+    for i, a in enumerate(points):
+        for b in points[i + 1:]:
+            for dark_ok in (True, False):
+                for room in graph.path(a, b, dark_ok) or ():
+                    ways[room] = ways.get(room, 0) + 1
+    found = [room for room in ways if room not in points and "Batteries" in world.items(room)]
+    found.sort(key=lambda room: (-ways[room], graph.distance(points[0], room) or 0))
+    return found[:max(0, limit)]
+
+def legs_between(rooms, graph, points: List[str]) -> List[List[List[Tuple[int, int, bool]]]]:
+    """legs[a][b]: the ways to walk from points[a] to points[b], as (moves, battery, lit)."""
+    legs = []
+    for a in points:
+        row = []
+        for b in points:
+            if a == b:
+                row.append([(0, 0, True)])  # already there
+                continue
+            options = []
+            lit = graph.distance(a, b, dark_ok=False)
+            if lit is not None:
+                options.append((lit, 0, True))
+            path = graph.path(a, b, dark_ok=True)
+            if path is not None and (lit is None or len(path) < lit):
+                dark = sum(1 for room in path if rooms[room]["required_light"])
+                options.append((len(path), DRAIN * dark, False))
+            row.append(options)
+        legs.append(row)
+    return legs
+
+
+# -------------------- DP --------------------
+def _solve_plain(legs, n: int, need: int, budget) -> Optional[Tuple[int, List[Tuple[int, int]]]]:
+    """Held-Karp with dicts. Points: 0 start, 1..n targets, n + 1 end. Returns (key, [(target, option)])."""
+    best: Dict[Tuple[int, int], Tuple[int, int, int]] = {}  # (mask, last) -> (key, previous last, option)
+    for j in range(n):
+        for o, (moves, spent, _) in enumerate(legs[0][j + 1]):
+            key = moves * KEY_SCALE + spent
+            if spent <= budget(0) and key < best.get((1 << j, j), (INF,))[0]:
+                best[1 << j, j] = (key, -1, o)
+    done = (INF, 0, 0, 0)
+    for mask in range(1, 1 << n):
+        room = budget(mask)
+        for last in range(n):
+            state = best.get((mask, last))
+            if state is None:
+                continue
+            key, spent = state[0], state[0] % KEY_SCALE
+            if mask & need == need:
+                for o, (moves, cost, _) in enumerate(legs[last + 1][n + 1]):
+                    if spent + cost <= room and key + moves * KEY_SCALE + cost < done[0]:
+                        done = (key + moves * KEY_SCALE + cost, mask, last, o)
+            for j in range(n):
+                if mask >> j & 1:
+                    continue
+                for o, (moves, cost, _) in enumerate(legs[last + 1][j + 1]):
+                    new = key + moves * KEY_SCALE + cost
+                    if spent + cost <= room and new < best.get((mask | 1 << j, j), (INF,))[0]:
+                        best[mask | 1 << j, j] = (new, last, o)
+    if need == 0:  # nothing left to pick up: straight to the end is a route too
+        done = min([done] + [(moves * KEY_SCALE + cost, 0, -1, o) for o, (moves, cost, _)
+                             in enumerate(legs[0][n + 1]) if cost <= budget(0)])
+    if done[0] >= INF:
+        return None
+    key, mask, last, o = done
+    order = [(n, o)]  # (target index, option of the leg into it); n stands for the end room
+    while last >= 0:
+        _, previous, option = best[mask, last]
+        order.append((last, option))
+        mask, last = mask & ~(1 << last), previous
+    return key, order[::-1]
+
+def _solve_numpy(np, legs, n: int, need: int, batteries: int, budget) -> Optional[Tuple[int, List[Tuple[int, int]]]]:
+    """The same DP, one popcount layer of masks at a time, vectorized over masks and last targets."""
+    size = 1 << n
+    masks = np.arange(size, dtype=np.int64)
+    count = np.zeros(size, dtype=np.int64)
+    for j in range(n):
+        count += (masks >> j) & 1
+    picked = np.zeros(size, dtype=np.int64)
+    for j in range(n):
+        if batteries >> j & 1:
+            picked += (masks >> j) & 1
+    charge = budget(0) + CHARGE * picked
+    layers = [masks[count == k] for k in range(n + 1)]
+    where = np.zeros(size, dtype=np.int64)
+    for layer in layers:
+        where[layer] = np.arange(len(layer))
+    # Leg keys and battery per option: (options, points, points), INF where there is no such way.
+    width = max((len(options) for row in legs for options in row), default=1) or 1
+    key = np.full((width, n + 2, n + 2), INF, dtype=np.int64)
+    cost = np.zeros((width, n + 2, n + 2), dtype=np.int64)
+    for a in range(n + 2):
+        for b in range(n + 2):
+            for o, (moves, spent, _) in enumerate(legs[a][b]):
+                key[o, a, b], cost[o, a, b] = moves * KEY_SCALE + spent, spent
+    parent = np.full((size, max(n, 1)), -1, dtype=np.int8)  # (previous last + 1) * width + option
+
+    dp = np.full((1, max(n, 1)), INF, dtype=np.int64)  # layer 0: only the start
+    done = (INF, 0, -1, 0)
+    for k in range(n + 1):
+        layer, spent = layers[k], dp % KEY_SCALE
+        room = charge[layer][:, None]
+        if k == 0:
+            # From the start (every path out of it begins with nothing spent).
+            for o in range(width):
+                ok = cost[o, 0, n + 1] <= room[0, 0] and key[o, 0, n + 1] < done[0] and need == 0
+                if ok:
+                    done = (int(key[o, 0, n + 1]), 0, -1, o)
+            if n == 0:
+                break
+            nxt = np.full((len(layers[1]), n), INF, dtype=np.int64)
+            for j in range(n):
+                for o in range(width):
+                    if cost[o, 0, j + 1] <= room[0, 0] and key[o, 0, j + 1] < nxt[where[1 << j], j]:
+                        nxt[where[1 << j], j] = key[o, 0, j + 1]
+                        parent[1 << j, j] = o
+            dp = nxt
+            continue
+        # Finish: every fragment picked up, then the walk to the end room.
+        full = (layer & need) == need
+        if full.any():
+            for o in range(width):
+                leg = key[o, 1:n + 1, n + 1]
+                total = np.where((spent[full] + cost[o, 1:n + 1, n + 1] <= room[full]) & (leg < INF),
+                                 dp[full] + leg, INF)
+                at = np.unravel_index(np.argmin(total), total.shape)
+                if total[at] < done[0]:
+                    done = (int(total[at]), int(layer[full][at[0]]), int(at[1]), o)
+        if k == n:
+            break
+        nxt = np.full((len(layers[k + 1]), n), INF, dtype=np.int64)
+        alive = dp.min(axis=1) < INF  # masks the battery allows at all
+        layer, dp, spent, room = layer[alive], dp[alive], spent[alive], room[alive]
+        for j in range(n):
+            free = ((layer >> j) & 1) == 0
+            if not free.any():
+                continue
+            rows, grown = dp[free], layer[free] | (1 << j)
+            best = np.full(len(rows), INF, dtype=np.int64)
+            code = np.zeros(len(rows), dtype=np.int64)
+            for o in range(width):
+                leg = key[o, 1:n + 1, j + 1]
+                total = np.where((spent[free] + cost[o, 1:n + 1, j + 1] <= room[free]) & (rows < INF), rows + leg, INF)
+                last = total.argmin(axis=1)
+                value = total[np.arange(len(rows)), last]
+                better = value < best
+                best = np.where(better, value, best)
+                code = np.where(better, (last + 1) * width + o, code)
+            nxt[where[grown], j] = best
+            parent[grown, j] = np.where(best < INF, code, -1)
+        dp = nxt
+    if done[0] >= INF:
+        return None
+    key_total, mask, last, o = done
+    order = [(n, o)]
+    while last >= 0:
+        code = int(parent[mask, last])
+        order.append((last, code % width))
+        mask, last = mask & ~(1 << last), code // width - 1
+    return key_total, order[::-1]
+
+
+# -------------------- PLANNING --------------------
+def plan_route(world, graph, start: str, battery: int, held: int, limit: int = MAX_TARGETS) -> Optional[Route]:
+    """Best route from `start` over the fragments left (and any Batteries worth it) to the END_ROOM."""
+    global _unavailable
+    try:
+        import numpy as np
+    except ImportError:
+        np, _unavailable = None, True
+        limit = min(limit, PLAIN_TARGETS)
+    fragments = [room for room in fragment_rooms(world) if room != start]
+    if len(fragments) > limit:
+        return None
+    spare = battery_rooms(world, graph, [start] + fragments + [END_ROOM], limit - len(fragments))
+    points = [start] + fragments + spare + [END_ROOM]
+    legs = legs_between(world.template.rooms, graph, points)
+    need = (1 << len(fragments)) - 1
+    # Batteries never shorten a route, they only make one possible: try without them first,
+    # then with more and more of them.
+    for extra in sorted({0, min(4, len(spare)), min(8, len(spare)), len(spare)}):
+        keep = list(range(1 + len(fragments) + extra)) + [len(points) - 1]
+        sub = [[legs[a][b] for b in keep] for a in keep]
+        n = len(keep) - 2
+        batteries = ((1 << extra) - 1) << len(fragments)
+
+        def budget(mask: int) -> int:
+            return battery + CHARGE * (held + bin(mask & batteries).count("1"))
+
+        solved = _solve_numpy(np, sub, n, need, batteries, budget) if np is not None else \
+            _solve_plain(sub, n, need, budget)
+        if solved is not None:
+            break
+    else:
+        return None
+    key, order = solved
+    route, at = [], 0
+    for target, option in order:
+        moves, spent, lit = sub[at][target + 1][option]
+        if moves:
+            room, here = points[keep[target + 1]], points[keep[at]]
+            route.append(Leg(room, graph.path(here, room, dark_ok=not lit), lit, spent))
+        at = target + 1
+    return Route(route, key // KEY_SCALE, key % KEY_SCALE)
+
+def state_key(s) -> Tuple:
+    player = s.player
+    return (player.location, player.flashlight_battery, player.inventory.count("Batteries"),
+            tuple(sorted(s.world.loot.items())))
+
+def _fits(route: Route, world, battery: int, held: int) -> bool:
+    """Whether the battery still covers every leg, counting Batteries picked up on the way."""
+    charge, spent = battery + CHARGE * held, 0
+    for leg in route.legs:
+        spent += leg.battery
+        if spent > charge:
+            return False
+        charge += CHARGE * world.items(leg.room).count("Batteries")
+    return True
+
+def plan(s) -> Optional[Route]:
+    """The session's route, reused until its state changes; once the player has walked
+    the first leg, the rest of it is kept as long as the battery still covers it."""
+    player, key = s.player, state_key(s)
+    if s.route is not None:
+        known, route = s.route
+        if known == key:
+            return route
+        if route and route.legs and player.location == route.legs[0].room:
+            done, rest = route.legs[0], route.legs[1:]
+            route = Route(rest, route.moves - len(done.path), route.battery - done.battery)
+            if _fits(route, s.world, player.flashlight_battery, player.inventory.count("Batteries")):
+                s.route = (key, route)
+                return route
+    s.route = (key, plan_route(s.world, s.graph, player.location, player.flashlight_battery,
+                               player.inventory.count("Batteries")))
+    return s.route[1]
+
+
+# -------------------- BENCHMARK --------------------
+def cli():
+    import main
+
+    parser = argparse.ArgumentParser(description="Plan auto-explore routes and time the DP")
+    parser.add_argument("--floor-size", type=int, default=1000)
+    parser.add_argument("--seeds", type=int, default=10)
+    parser.add_argument("--targets", type=int, default=MAX_TARGETS, help="most targets per plan")
+    args = parser.parse_args()
+
+    world = main.new_world()
+    started = time.perf_counter()
+    route = plan_route(world, world.template.graph, "Lobby", 100, 0)
+    print(f"hotel: {route.moves} moves, {route.battery} battery, "
+          f"{len(route.legs)} legs in {(time.perf_counter() - started) * 1e3:.1f} ms")
+    print("  " + " -> ".join(leg.room + ("" if leg.lit else " (light)") for leg in route.legs))
+
+    rng = random.Random(13)
+    for seed in range(args.seeds):
+        template, _ = main.floor_template(seed, args.floor_size)
+        world = main.new_world(template)
+        battery = rng.choice((20, 60, 100))
+        started = time.perf_counter()
+        route = plan_route(world, template.graph, "Lobby", battery, 0, args.targets)
+        elapsed = time.perf_counter() - started
+        if route is None:
+            print(f"floor {seed}: no route with {battery}% battery ({elapsed:.2f}s)")
+        else:
+            picked = sum(1 for leg in route.legs if leg.room != END_ROOM) - main.FRAGMENTS_REQUIRED
+            print(f"floor {seed}: {route.moves} moves, {route.battery} battery from {battery}%, "
+                  f"{picked} Batteries picked up, {elapsed:.2f}s")
+
+if __name__ == "__main__":
+    cli()
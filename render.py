@@ -0,0 +1,112 @@
+"""
+FLOOR 13 - Typewriter renderer
+Replaces the per-character print/flush/sleep loop of slow():
+- text is written in frame-sized chunks (FPS writes per second) at a target
+  characters-per-second rate, so a line costs a handful of writes and
+  wakeups instead of one of each per character
+- on a terminal, any keypress while text is rendering skips to the end of it
+  (the key is swallowed)
+- when stdout is not a TTY (pipes, files, bots) text is written instantly
+- a global speed multiplier: set_speed(2.0) doubles the rate, set_speed(0)
+  makes everything instant; FLOOR13_SPEED sets the default
+"""
+
+import os
+import select
+import sys
+import time
+
+try:
+    import termios
+    import tty
+except ImportError:  # Windows: no keypress skipping, plain sleeps
+    termios = None
+
+DEFAULT_DELAY = 0.01  # seconds per character, the original slow() pace
+FPS = 30
+
+_speed = float(os.environ.get("FLOOR13_SPEED", "1") or 1)
+
+
+def set_speed(multiplier: float):
+    """Global text speed: 1.0 is the original pace, 0 renders instantly."""
+    global _speed
+    _speed = max(0.0, float(multiplier))
+
+def get_speed() -> float:
+    return _speed
+
+
+class Typewriter:
+    def __init__(self, stream=None, fps: int = FPS):
+        self._stream = stream
+        self.fps = fps
+
+    @property
+    def stream(self):
+        return self._stream or sys.stdout
+
+    def instant(self) -> bool:
+        if _speed <= 0:
+            return True
+        try:
+            return not self.stream.isatty()
+        except (AttributeError, ValueError):
+            return True
+
+    def write(self, text: str, delay: float = DEFAULT_DELAY):
+        """Render one line of text (a newline is added, like print)."""
+        stream = self.stream
+        if delay <= 0 or self.instant() or not text:
+            stream.write(text + "\n")
+            stream.flush()
+            return
+        cps = _speed / delay
+        chunk = max(1, round(cps / self.fps))
+        frame = chunk / cps
+        with _KeySkip() as skip:
+            for start in range(0, len(text), chunk):
+                stream.write(text[start:start + chunk])
+                stream.flush()
+                if skip.wait(frame):
+                    stream.write(text[start + chunk:])
+                    break
+        stream.write("\n")
+        stream.flush()
+
+
+class _KeySkip:
+    """Puts the terminal in cbreak mode so a single keypress can be noticed mid-line."""
+
+    def __enter__(self):
+        self.fd = None
+        self.saved = None
+        if termios is not None:
+            try:
+                fd = sys.stdin.fileno()
+                if os.isatty(fd):
+                    self.saved = termios.tcgetattr(fd)
+                    tty.setcbreak(fd)
+                    self.fd = fd
+            except (OSError, ValueError, termios.error):
+                self.fd = None
+        return self
+
+    def wait(self, seconds: float) -> bool:
+        """Sleep up to `seconds`; True if a key was pressed (and swallowed)."""
+        if self.fd is None:
+            time.sleep(seconds)
+            return False
+        ready, _, _ = select.select([self.fd], [], [], seconds)
+        if ready:
+            os.read(self.fd, 1024)
+            return True
+        return False
+
+    def __exit__(self, *exc):
+        if self.saved is not None:
+            termios.tcsetattr(self.fd, termios.TCSADRAIN, self.saved)
+        return False
+
+
+RENDERER = Typewriter()
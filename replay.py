@@ -0,0 +1,333 @@
+"""
+FLOOR 13 - Session recorder and replay
+Any session can log its RNG seed and every line the player typed
+(main.py --record FILE, server.py --record-dir DIR):
+- all game rolls come from Session.rng, so the seed, the input lines and
+  the idle flashlight ticks (the only clock-driven change to the game
+  state) are enough to play the session again exactly
+- a resumed game also logs the saved state it started from
+- the log ends with the ending and a digest of the final player and world
+  state, which a replay has to reproduce
+- replay() plays a log headless: no renderer or typewriter delays, no
+  saves, and no event loop (the game never waits for anything but its
+  input, which is all there, so its coroutine is stepped directly)
+- a corpus of logs replays across a process pool as a regression check
+  (every digest mismatch is reported) and as a benchmark
+
+Log format (UTF-8 text, one entry per line):
+  F13R1 {"seed", "rng": rolls.KIND (null/absent: random.Random), "content", "crc", "saved", "start": state or null}
+  >a line the player typed
+  ~ (idle flashlight tick)
+  ^ (reloaded from disk by the session store: the rolls go on from main.reload_rolls())
+  = {"ending", "digest", "lines"}
+
+Usage: python replay.py LOG|DIR ... [--workers N] [--repeat N]   (check + benchmark)
+       python replay.py LOG --show   (print what the player saw)
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import main
+import rolls
+import saves
+
+MAGIC = "F13R1 "
+SUFFIX = ".f13r"
+TICK = None  # idle tick in a recording's event list; every other event is a typed line
+RELOAD = object()  # the session store reloaded the session here (sessions.py)
+
+
+class ReplayError(ValueError):
+    pass
+
+
+def state_digest(player, world) -> str:
+    """Short hash of everything a save would hold (order-independent where order is incidental)."""
+    state = saves.capture(player, world)
+    state["visited_rooms"] = sorted(state["visited_rooms"])
+    state["inventory"] = sorted(state["inventory"])
+    return hashlib.blake2b(json.dumps(state, sort_keys=True).encode(), digest_size=8).hexdigest()
+
+
+# -------------------- RECORDING --------------------
+class Recorder:
+    """One session's log, kept in memory and written out by finish()."""
+
+    def __init__(self, path: str, content: Dict = None):
+        self.path = path
+        self.content = content or {}
+        self.header: Optional[Dict] = None
+        self.entries: List[str] = []
+        self.lines = 0
+
+    def start(self, s):
+        """Called by play() once the save (if any) is loaded, before the first roll."""
+        saved = s.saves.exists()
+        self.header = {"seed": s.seed, "rng": rolls.KIND if isinstance(s.rng, rolls.Rolls) else None,
+                       "content": self.content, "crc": s.saves.codec.content_crc,
+                       "saved": saved, "start": saves.capture(s.player, s.world) if saved else None}
+
+    def line(self, text: str):
+        self.entries.append(">" + text)
+        self.lines += 1
+
+    def tick(self):
+        self.entries.append("~")
+
+    def reload(self):
+        self.entries.append("^")
+
+    def finish(self, s, ending: Optional[str]):
+        if self.header is None:
+            return  # disconnected before the game started
+        final = {"ending": ending, "digest": state_digest(s.player, s.world), "lines": self.lines}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(MAGIC + json.dumps(self.header, separators=(",", ":")) + "\n")
+            if self.entries:
+                f.write("\n".join(self.entries) + "\n")
+            f.write("= " + json.dumps(final, separators=(",", ":")) + "\n")
+
+
+class Recording(NamedTuple):
+    header: Dict
+    events: List[Optional[str]]
+    final: Optional[Dict]
+
+def read_log(path: str) -> Recording:
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.read().split("\n")
+    if not lines[0].startswith(MAGIC):
+        raise ReplayError(f"{path}: not a session log")
+    header = json.loads(lines[0][len(MAGIC):])
+    events: List[Optional[str]] = []
+    final = None
+    for line in lines[1:]:
+        if line.startswith(">"):
+            events.append(line[1:])
+        elif line == "~":
+            events.append(TICK)
+        elif line == "^":
+            events.append(RELOAD)
+        elif line.startswith("= "):
+            final = json.loads(line[2:])
+    return Recording(header, events, final)
+
+
+# -------------------- HEADLESS PLAYBACK --------------------
+class ScriptIO:
+    """Console stand-in: input comes from the recording, output is dropped (or kept)."""
+
+    def __init__(self, events: List[Optional[str]], keep_output: bool = False):
+        self.events = events
+        self.pos = 0
+        self.on_tick = None
+        self.on_reload = None
+        self.out: Optional[List[str]] = [] if keep_output else None
+
+    def say(self, text: str, delay: float = 0.0):
+        if self.out is not None:
+            self.out.append(text + "\n")
+
+    def prompt(self, text: str):
+        if self.out is not None:
+            self.out.append(text)
+
+    async def ask(self, prompt: str = "") -> str:
+        if prompt:
+            self.prompt(prompt)
+        events = self.events
+        while self.pos < len(events) and (events[self.pos] is TICK or events[self.pos] is RELOAD):
+            self.pos += 1
+            if events[self.pos - 1] is RELOAD:
+                self.on_reload()
+            else:
+                self.on_tick()  # the ticks that fired while the player sat at this prompt
+        if self.pos >= len(events):
+            raise EOFError
+        line = events[self.pos]
+        self.pos += 1
+        if self.out is not None:
+            self.out.append(line + "\n")
+        return line
+
+
+class ReplaySaves:
+    """SaveManager stand-in: starts from the recorded state and writes nothing."""
+
+    def __init__(self, world, header: Dict):
+        self.world = world
+        self.saved = header["saved"]
+        self.start = header["start"]
+
+    def exists(self) -> bool:
+        return self.saved
+
+    def load(self, player) -> bool:
+        if self.start is None:
+            return False
+        saves.apply_record({"full": self.start}, player, self.world)
+        return True
+
+    def mark(self, player):
+        pass
+
+    def commit(self):
+        pass
+
+    def compact(self):
+        pass
+
+    def flush(self, wait: bool = True):
+        pass
+
+    def delete(self):
+        pass
+
+
+_templates: Dict[str, Tuple[object, int]] = {}
+
+def template_for(header: Dict):
+    """The world template a log was recorded on (built once per process)."""
+    key = json.dumps(header["content"], sort_keys=True)
+    if key not in _templates:
+        content = header["content"]
+        if "pack" in content:
+            _templates[key] = main.pack_template(content["pack"])
+        elif "floor" in content:
+            _templates[key] = main.floor_template(*content["floor"])
+        else:
+            _templates[key] = (main.TEMPLATE, main.CODEC)
+    template, codec = _templates[key]
+    if codec.content_crc != header["crc"]:
+        raise ReplayError("the log was recorded with different rooms/items/weapons")
+    return template
+
+def run_sync(coro):
+    """Run a coroutine that never has to wait, without an event loop."""
+    try:
+        coro.send(None)
+    except StopIteration as done:
+        return done.value
+    coro.close()
+    raise ReplayError("the replayed game waited for something other than its input")
+
+def replay(recording: Recording, keep_output: bool = False) -> Tuple[Optional[str], str, ScriptIO]:
+    """Play a recording back; returns (ending, final state digest, the ScriptIO)."""
+    world = main.new_world(template_for(recording.header))
+    io = ScriptIO(recording.events, keep_output)
+    header = recording.header
+    s = main.Session(io, world, ReplaySaves(world, header), seed=header["seed"],
+                     rng=rolls.for_log(header["seed"], header.get("rng")))
+    io.on_tick = lambda: main.idle_drain(s)
+    io.on_reload = lambda: main.reload_rolls(s)
+    ending = None
+    try:
+        run_sync(main.play(s))
+    except main.GameOver as over:
+        ending = over.ending
+    except EOFError:
+        pass
+    return ending, state_digest(s.player, world), io
+
+def check(recording: Recording) -> Optional[str]:
+    """None if the replay ends like the recorded session did, else what differs."""
+    ending, digest, _ = replay(recording)
+    final = recording.final
+    if final is None:
+        return "log has no final state (session still running or log cut off)"
+    if ending != final["ending"] or digest != final["digest"]:
+        return f"ending {ending!r} state {digest}, recorded {final['ending']!r} state {final['digest']}"
+    return None
+
+
+# -------------------- CORPUS (PROCESS POOL) --------------------
+def find_logs(paths: Iterable[str]) -> List[str]:
+    logs = []
+    for path in paths:
+        if os.path.isdir(path):
+            logs += sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(SUFFIX))
+        else:
+            logs.append(path)
+    return logs
+
+def replay_chunk(args) -> Dict:
+    paths, repeat = args
+    result = {"replays": 0, "lines": 0, "mismatches": []}
+    recordings = []
+    for path in paths:
+        try:
+            recordings.append((path, read_log(path)))
+        except (OSError, ValueError) as e:
+            result["mismatches"].append((path, str(e)))
+    for _ in range(repeat):
+        for path, recording in recordings:
+            try:
+                problem = check(recording)
+            except ReplayError as e:
+                problem = str(e)
+            if problem and len(result["mismatches"]) < 100:
+                result["mismatches"].append((path, problem))
+            result["replays"] += 1
+            result["lines"] += len(recording.events)
+    if repeat > 1:
+        del result["mismatches"][len(recordings):]  # the same logs fail the same way every round
+    return result
+
+def replay_many(paths: List[str], workers: int = None, repeat: int = 1) -> Dict:
+    workers = workers or os.cpu_count() or 1
+    chunks = max(1, min(len(paths), workers * 4))
+    jobs = [(paths[i::chunks], repeat) for i in range(chunks)]
+    total = {"replays": 0, "lines": 0, "mismatches": []}
+    if workers == 1 or len(jobs) == 1:
+        results = map(replay_chunk, jobs)
+    else:
+        pool = multiprocessing.Pool(workers)
+        results = pool.imap_unordered(replay_chunk, jobs)
+    for result in results:
+        total["replays"] += result["replays"]
+        total["lines"] += result["lines"]
+        total["mismatches"] += result["mismatches"]
+    if workers > 1 and len(jobs) > 1:
+        pool.close()
+        pool.join()
+    return total
+
+def cli():
+    parser = argparse.ArgumentParser(description="Floor 13 session replay")
+    parser.add_argument("logs", nargs="+", help="session logs, or directories of them")
+    parser.add_argument("--workers", "-j", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=1, help="replay the corpus N times (benchmark)")
+    parser.add_argument("--show", action="store_true", help="print the replayed transcript of each log")
+    args = parser.parse_args()
+    paths = find_logs(args.logs)
+    if not paths:
+        parser.error("no session logs found")
+    if args.show:
+        for path in paths:
+            recording = read_log(path)
+            ending, digest, io = replay(recording, keep_output=True)
+            sys.stdout.write("".join(io.out))
+            print(f"\n[{path}: seed {recording.header['seed']}, ending {ending}, state {digest}]")
+        return
+    started = time.perf_counter()
+    total = replay_many(paths, args.workers, args.repeat)
+    elapsed = time.perf_counter() - started
+    for path, problem in total["mismatches"]:
+        print(f"MISMATCH {path}: {problem}")
+    print(f"{total['replays']} replays of {len(paths)} logs in {elapsed:.2f}s -> "
+          f"{total['replays'] / elapsed:.0f} replays/s, {total['lines'] / elapsed:.0f} input lines/s")
+    print(f"{len(total['mismatches'])} mismatches")
+    sys.exit(1 if total["mismatches"] else 0)
+
+if __name__ == "__main__":
+    cli()
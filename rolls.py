@@ -0,0 +1,193 @@
+"""
+FLOOR 13 - Rolls
+The dice every session (and simulation) rolls with:
+- Rolls(seed) owns one Mersenne Twister seeded like random.Random(seed) and
+  pre-draws its uniforms in blocks; random() is a C-level step through the
+  current block, refilled once per block. A session's block is BLOCK (small:
+  sessions are many and mostly idle, see sessions.py); simulation streams
+  use BULK_BLOCK. The block size never changes which numbers come out
+- with NumPy the blocks come from a RandomState handed the same MT state,
+  which yields exactly the doubles random.Random would (so a seed rolls the
+  same game with or without NumPy); without it they come from a list
+  comprehension over random.Random.random
+- randint() / choice() are a multiply and an index on one uniform, instead
+  of random.Random's rejection sampling on getrandbits
+- weighted picks (enemy type, loot drop) go through AliasTable (Vose's alias
+  method): one uniform, one index, one compare, whatever the weights; an
+  AliasTable is also a plain sequence of its items, so random.Random.choice()
+  on it still rolls what it always did
+- stream(key) gives an independent generator per key (simulation chunks),
+  with BULK_BLOCK blocks
+
+Rolls are not random.Random's rolls: session logs say which generator they
+were recorded with (replay.py), and older logs replay on random.Random.
+
+Usage: python rolls.py [--rolls 1000000] [--runs 20000]   (micro + simulation benchmark vs `random`)
+"""
+
+import argparse
+import itertools
+import random
+import time
+from collections import abc
+from typing import Iterator, List, Optional, Sequence
+
+BLOCK = 128  # uniforms drawn at a time per session (~4 KB of floats)
+BULK_BLOCK = 4096  # ... per simulation stream
+KIND = "rolls1"  # what session logs record as their generator
+
+_unavailable = False  # NumPy missing
+
+
+class AliasTable(abc.Sequence):
+    """A weighted distribution over `items`, drawn in O(1) (Vose's alias method)."""
+    __slots__ = ("items", "weights", "n", "prob", "alias")
+
+    def __init__(self, items: Sequence, weights: Sequence[float] = None):
+        self.items = list(items)
+        n = self.n = len(self.items)
+        if not n:
+            raise ValueError("AliasTable needs at least one item")
+        self.weights = list(weights) if weights is not None else [1.0] * n
+        total = float(sum(self.weights))
+        scaled = [w * n / total for w in self.weights]
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+
+    def draw(self, u: float):
+        """The item for one uniform in [0, 1)."""
+        x = u * self.n
+        i = int(x)
+        return self.items[i] if x - i < self.prob[i] else self.items[self.alias[i]]
+
+    def __getitem__(self, i):
+        return self.items[i]
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __iter__(self) -> Iterator:
+        return iter(self.items)
+
+
+class Rolls:
+    """A seeded generator serving pre-drawn uniforms; random.Random's API where the game uses it."""
+    __slots__ = ("seed", "random", "_source")
+
+    def __init__(self, seed=None, block: int = BLOCK):
+        self.seed = seed
+        self._source = random.Random(seed)
+        self.random = itertools.chain.from_iterable(self._blocks(self._source, block)).__next__
+
+    @staticmethod
+    def _blocks(source: random.Random, block: int) -> Iterator[List[float]]:
+        # not a method of self: the generator would close a reference cycle that only the GC breaks
+        global _unavailable
+        try:
+            import numpy as np
+        except ImportError:
+            np, _unavailable = None, True
+        if np is None:
+            draw = source.random
+            while True:
+                yield [draw() for _ in range(block)]
+        state = source.getstate()[1]
+        mt = np.random.RandomState()
+        mt.set_state(("MT19937", np.array(state[:-1], dtype=np.uint32), state[-1]))
+        del state  # 625 ints; the generator frame would keep them for the session's lifetime
+        while True:
+            yield mt.random_sample(block).tolist()
+
+    def randint(self, a: int, b: int) -> int:
+        return a + int(self.random() * (b - a + 1))
+
+    def choice(self, seq):
+        if type(seq) is AliasTable:  # AliasTable.draw, inlined
+            x = self.random() * seq.n
+            i = int(x)
+            return seq.items[i] if x - i < seq.prob[i] else seq.items[seq.alias[i]]
+        return seq[int(self.random() * len(seq))]
+
+    def uniform(self, a: float, b: float) -> float:
+        return a + (b - a) * self.random()
+
+    def stream(self, key, block: int = BULK_BLOCK) -> "Rolls":
+        """An independent generator for `key` (string seeds are hashed by random.Random)."""
+        return Rolls(f"{self.seed}/{key}", block)
+
+
+def for_log(seed, kind: Optional[str]):
+    """The generator a session log was recorded with."""
+    return Rolls(seed) if kind == KIND else random.Random(seed)
+
+
+# -------------------- BENCHMARK --------------------
+def _time(fn, n: int) -> float:
+    started = time.perf_counter()
+    fn(n)
+    return (time.perf_counter() - started) / n * 1e9
+
+def micro(n: int) -> List[tuple]:
+    import combat
+    loot = combat.LOOT
+    weighted = AliasTable(["Health Pack", "Batteries", "Knife"], [5, 3, 1])
+    rows = []
+    for name, rng in (("random module", random), ("random.Random", random.Random(13)), ("Rolls", Rolls(13))):
+        r, ri, ch = rng.random, rng.randint, rng.choice
+
+        def uniforms(n):
+            for _ in range(n):
+                r()
+
+        def ints(n):
+            for _ in range(n):
+                ri(5, 14)
+
+        def loots(n):
+            for _ in range(n):
+                ch(loot)
+
+        def picks(n):
+            if isinstance(rng, Rolls):
+                for _ in range(n):
+                    ch(weighted)
+            else:
+                items, weights = weighted.items, weighted.weights
+                for _ in range(n):
+                    rng.choices(items, weights)
+        rows.append((name, _time(uniforms, n), _time(ints, n), _time(loots, n), _time(picks, n)))
+    return rows
+
+def cli():
+    parser = argparse.ArgumentParser(description="Floor 13 rolls benchmark")
+    parser.add_argument("--rolls", type=int, default=1_000_000, help="rolls per micro benchmark")
+    parser.add_argument("--runs", type=int, default=20_000, help="simulated runs per generator")
+    args = parser.parse_args()
+    print(f"ns per roll ({args.rolls} rolls{', NumPy blocks' if not _numpy_missing() else ''}):")
+    print(f"{'':<16}{'random()':>10}{'randint':>10}{'loot':>10}{'weighted':>10}")
+    for name, *times in micro(args.rolls):
+        print(f"{name:<16}" + "".join(f"{t:>10.1f}" for t in times))
+    import simulate
+    print(f"\nsimulation hot loop ({args.runs} scripted runs, one process):")
+    for name, rng in (("random module", random), ("random.Random", random.Random(13)), ("Rolls", Rolls(13))):
+        started = time.perf_counter()
+        stats = simulate.new_stats()
+        for _ in range(args.runs):
+            simulate.play_run(rng, "scripted", simulate.MAX_TURNS, stats)
+        elapsed = time.perf_counter() - started
+        print(f"{name:<16}{args.runs / elapsed:>10.0f} runs/s   win {stats['endings'][simulate.WIN] / args.runs:.2%}")
+
+def _numpy_missing() -> bool:
+    Rolls(0).random()  # the first block decides
+    return _unavailable
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,168 @@
+"""
+FLOOR 13 - Room graph index
+Built once from ROOMS at startup and shared by every session:
+- room IDs and an adjacency array (taken as-is from a compiled content
+  pack, which precomputes both)
+- shortest paths as next-hop / distance / previous-room rows, twice:
+  through any room, and avoiding rooms with required_light (for a player
+  without a lit flashlight); a source room's rows are filled by one BFS the
+  first time a path from it is asked for, then kept, so startup is
+  O(rooms) and a small map soon holds the full all-pairs tables; paths are
+  read back from the source's row, O(path length)
+- a spanning tree from the first room for drawing the map (on first use)
+- render() draws the rooms a player has seen (or all of them once the map
+  is repaired) as an indented tree
+"""
+
+from array import array
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+UNREACHABLE = -1
+
+
+class RoomGraph:
+    def __init__(self, rooms: Dict):
+        if hasattr(rooms, "adjacency"):
+            # A compiled content pack (content.PackRooms): IDs, adjacency and light are precomputed.
+            self.names = rooms.names
+            self._id = rooms.room_id
+            self._resolve = rooms.resolve
+            self.adj = rooms.adjacency
+            self.dark = rooms.dark
+            self._ids: Dict[str, int] = {}  # filled as rooms are looked up
+        else:
+            self.names: List[str] = list(rooms)
+            ids = {name: i for i, name in enumerate(self.names)}
+            by_lower = {name.lower(): name for name in self.names}
+            self._id = ids.get
+            self._ids = ids
+            self._resolve = by_lower.get
+            self.adj = tuple(tuple(ids[n] for n in rooms[name]["adj"]) for name in self.names)
+            self.dark = bytes(bool(rooms[name]["required_light"]) for name in self.names)
+        self.size = len(self.names)
+        # dark_ok -> {src: (next hop, distance, previous room) arrays}
+        self._rows: Dict[bool, Dict[int, Tuple[array, array, array]]] = {True: {}, False: {}}
+        self._children: Optional[List[List[int]]] = None
+
+    def ids(self, name: str) -> int:
+        i = self._ids.get(name)
+        if i is None:
+            i = self._id(name)
+            if i is None:
+                raise KeyError(name)
+            self._ids[name] = i
+        return i
+
+    def _row(self, src: int, dark_ok: bool) -> Tuple[array, array, array]:
+        rows = self._rows[dark_ok]
+        row = rows.get(src)
+        if row is None:
+            row = rows[src] = self._bfs(src, dark_ok)
+        return row
+
+    def _bfs(self, src: int, dark_ok: bool) -> Tuple[array, array, array]:
+        """First hop, distance and previous room on a shortest path from `src` to every room."""
+        size, adj, dark = self.size, self.adj, self.dark
+        hop = array("i", [UNREACHABLE]) * size
+        dist = array("i", [UNREACHABLE]) * size
+        prev = array("i", [UNREACHABLE]) * size
+        hop[src], dist[src] = src, 0
+        queue = deque([src])
+        while queue:
+            room = queue.popleft()
+            for nxt in adj[room]:
+                if dist[nxt] != UNREACHABLE or (dark[nxt] and not dark_ok):
+                    continue
+                dist[nxt] = dist[room] + 1
+                hop[nxt] = nxt if room == src else hop[room]
+                prev[nxt] = room
+                queue.append(nxt)
+        return hop, dist, prev
+
+    @property
+    def children(self) -> List[List[int]]:
+        if self._children is None:
+            self._children = self._spanning_tree(0) if self.size else []
+        return self._children
+
+    def _spanning_tree(self, root: int) -> List[List[int]]:
+        children: List[List[int]] = [[] for _ in range(self.size)]
+        seen = {root}
+        queue = deque([root])
+        while queue:
+            room = queue.popleft()
+            for nxt in self.adj[room]:
+                if nxt not in seen:
+                    seen.add(nxt)
+                    children[room].append(nxt)
+                    queue.append(nxt)
+        return children
+
+    # -------------------- LOOKUPS --------------------
+    def resolve(self, text: str) -> Optional[str]:
+        """Room name for what the player typed (case-insensitive), or None."""
+        return self._resolve(text.strip().lower())
+
+    def distance(self, src: str, dst: str, dark_ok: bool = True) -> Optional[int]:
+        try:  # fast path: both rooms seen before and the source row already built
+            d = self._rows[dark_ok][self._ids[src]][1][self._ids[dst]]
+        except KeyError:
+            d = self._row(self.ids(src), dark_ok)[1][self.ids(dst)]
+        return None if d == UNREACHABLE else d
+
+    def next_step(self, src: str, dst: str, dark_ok: bool = True) -> Optional[str]:
+        """First room on a shortest path (None if unreachable or already there)."""
+        if src == dst:
+            return None
+        try:
+            hop = self._rows[dark_ok][self._ids[src]][0][self._ids[dst]]
+        except KeyError:
+            hop = self._row(self.ids(src), dark_ok)[0][self.ids(dst)]
+        return None if hop == UNREACHABLE else self.names[hop]
+
+    def path(self, src: str, dst: str, dark_ok: bool = True) -> Optional[List[str]]:
+        """Rooms to walk through from `src` to `dst` (src excluded), or None if unreachable."""
+        start, room = self.ids(src), self.ids(dst)
+        _, dist, prev = self._row(start, dark_ok)
+        if dist[room] == UNREACHABLE:
+            return None
+        rooms = []
+        while room != start:
+            rooms.append(self.names[room])
+            room = prev[room]
+        rooms.reverse()
+        return rooms
+
+    # -------------------- MAP --------------------
+    def render(self, visited: Iterable[str], location: str, reveal_all: bool = False) -> List[str]:
+        """Tree map of the rooms seen so far: unexplored exits show as '?', rooms
+        that need light are marked, and the current room is flagged."""
+        seen = {i for i in map(self._id, visited) if i is not None}
+        here = self._id(location)
+        lines: List[str] = []
+
+        def label(room: int) -> str:
+            if room not in seen and not reveal_all:
+                return "?"
+            tags = ["dark"] if self.dark[room] else []
+            if room not in seen:
+                tags.append("unexplored")
+            text = self.names[room] + (f" ({', '.join(tags)})" if tags else "")
+            if room == here:
+                text += "  <- you are here"
+            return text
+
+        def walk(room: int, prefix: str, last: bool, top: bool):
+            lines.append(label(room) if top else f"{prefix}{'└── ' if last else '├── '}{label(room)}")
+            if room not in seen and not reveal_all:
+                return
+            kids = children[room]
+            inner = "" if top else prefix + ("    " if last else "│   ")
+            for i, kid in enumerate(kids):
+                walk(kid, inner, i == len(kids) - 1, False)
+
+        children = self.children
+        if self.size:
+            walk(0, "", True, True)
+        return lines
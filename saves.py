@@ -0,0 +1,521 @@
+"""
+FLOOR 13 - Save manager
+Coalesces auto-saves and writes them off the game thread:
+- mark(player) only sets a dirty flag, so it can be called after every event
+- commit() runs once per turn and appends a small delta record (changed
+  fields, items added/removed, rooms visited, room loot taken, weapon
+  durability) to an append-only journal next to the save file
+- every COMPACT_EVERY records, and on flush() at exit, the full world state
+  is written as a binary snapshot (temp file + fsync + os.replace) and the
+  journal is truncated
+- load() decodes the snapshot straight into the Player and the World overlay
+  and replays the journal tail, stopping at the first torn or corrupt
+  record, so a crash loses at most the last turn
+- if a snapshot cannot be encoded (content that changed under an old
+  save), the journal is restarted from one full JSON record instead and a
+  warning is printed, so it still stays bounded
+- flush() / delete() / atexit make sure nothing is lost on quit, endings
+  and KeyboardInterrupt
+- one writer thread is shared by every SaveManager, so a server with many
+  sessions (one SaveManager each) still has a single background thread
+
+Snapshot format (little endian, version 3):
+  header   magic "F13W", version u8, reserved u8, content crc32 u32, journal seq u32
+  player   max_health i16, health i16, battery i16, weapon u16, location u32,
+           fragments u8, flags u8 (flashlight_on, map_unlocked, has_master_key, is_alive)
+  visited  u32 count + u32 room ids
+  items    u32 count + u16 item ids for the inventory
+  loot     u32 count + (u32 room id, u32 count, u16 item ids) for each room whose
+           loot differs from the template; other rooms are untouched
+  weapons  i16 durability per weapon
+Only rooms the player has seen or changed are stored, so a save on a
+generated floor of 100k rooms stays a few hundred bytes. Versions 1 (a
+visited bitmap and an item list for every room) and 2 (u8 item counts)
+are still read.
+Room, item and weapon IDs are positions in the content tables; the content
+crc32 guards against decoding a save written for different content.
+Legacy JSON saves (Player.to_dict()) are migrated on load.
+"""
+
+import atexit
+import json
+import os
+import struct
+import sys
+import threading
+import weakref
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+COMPACT_EVERY = 64
+LIST_FIELDS = ("inventory", "visited_rooms")
+WORLD_FIELDS = ("rooms", "durability")
+
+MAGIC = b"F13W"
+VERSION = 3
+VERSIONS = (1, 2, 3)
+COUNT = struct.Struct("<I")
+NO_WEAPON = 0xFFFF
+HEADER = struct.Struct("<4sBBII")
+PLAYER = struct.Struct("<hhhHIBB")
+FLAGS = ("flashlight_on", "map_unlocked", "has_master_key", "is_alive")
+
+
+class SaveFormatError(ValueError):
+    pass
+
+
+# -------------------- BINARY SNAPSHOT --------------------
+class WorldCodec:
+    """Integer IDs for rooms, items and weapons, and the binary snapshot encoder/decoder.
+    Built once from the content templates and shared by every session."""
+
+    def __init__(self, rooms: Dict, weapons: Dict, extra_items: Iterable[str] = ()):
+        self.weapon_names = list(weapons)
+        items = set(weapons) | set(extra_items)
+        if hasattr(rooms, "room_id"):
+            # A lazy room table (floorgen.Floor, content.PackRooms): names, IDs and the crc of
+            # the room names come with it, so nothing here grows with the number of rooms.
+            self.room_names = rooms.names
+            self.room_index = rooms.room_id
+            items.update(rooms.item_names)
+            room_crc = rooms.names_crc
+        else:
+            self.room_names = list(rooms)
+            self.room_index = {name: i for i, name in enumerate(self.room_names)}.get
+            for room in rooms.values():
+                items.update(room["items"])
+            room_crc = zlib.crc32("\0".join(self.room_names).encode())
+        self.item_names = sorted(items)
+        self.item_id = {name: i for i, name in enumerate(self.item_names)}
+        self.weapon_id = {name: i for i, name in enumerate(self.weapon_names)}
+        tables = "\1" + "\0".join(self.item_names) + "\1" + "\0".join(self.weapon_names)
+        self.content_crc = zlib.crc32(tables.encode(), room_crc)
+        self._bitmap_len = (len(self.room_names) + 7) // 8
+        self._durability = struct.Struct(f"<{len(self.weapon_names)}h")
+
+    def room_id(self, name: str) -> int:
+        i = self.room_index(name)
+        if i is None:
+            raise SaveFormatError(f"unknown room {name!r}")
+        return i
+
+    def encode(self, state: Dict, seq: int) -> bytes:
+        out = bytearray(HEADER.pack(MAGIC, VERSION, 0, self.content_crc, seq))
+        flags = 0
+        for bit, name in enumerate(FLAGS):
+            if state[name]:
+                flags |= 1 << bit
+        weapon = self.weapon_id[state["weapon"]] if state["weapon"] else NO_WEAPON
+        out += PLAYER.pack(state["max_health"], state["health"], state["flashlight_battery"], weapon,
+                           self.room_id(state["location"]), state["map_fragments_found"], flags)
+        visited = sorted(self.room_id(room) for room in state["visited_rooms"])
+        out += COUNT.pack(len(visited)) + struct.pack(f"<{len(visited)}I", *visited)
+        self._pack_items(out, state["inventory"])
+        loot = sorted((self.room_id(name), items) for name, items in state["rooms"].items() if items is not None)
+        out += COUNT.pack(len(loot))
+        for room, items in loot:
+            out += COUNT.pack(room)
+            self._pack_items(out, items)
+        durability = state["durability"]
+        out += self._durability.pack(*(durability[name] for name in self.weapon_names))
+        return bytes(out)
+
+    def _pack_items(self, out: bytearray, items: List[str]):
+        out += COUNT.pack(len(items))
+        out += struct.pack(f"<{len(items)}H", *(self.item_id[item] for item in items))
+
+    def decode_into(self, buf: bytes, player, world) -> int:
+        """Write a snapshot straight into `player` and `world`; returns the journal seq."""
+        magic, version, _, crc, seq = HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or version not in VERSIONS:
+            raise SaveFormatError(f"unsupported save format {magic!r} v{version}")
+        if crc != self.content_crc:
+            raise SaveFormatError("save was written for different rooms/items/weapons")
+        off = HEADER.size
+        (player.max_health, player.health, player.flashlight_battery, weapon, location,
+         player.map_fragments_found, flags) = PLAYER.unpack_from(buf, off)
+        off += PLAYER.size
+        player.weapon = None if weapon == NO_WEAPON else self.weapon_names[weapon]
+        names = self.room_names
+        player.location = names[location]
+        for bit, name in enumerate(FLAGS):
+            setattr(player, name, bool(flags >> bit & 1))
+        items = self.item_names
+        if version == 1:
+            bitmap = buf[off:off + self._bitmap_len]
+            player.visited_rooms = {names[i] for i in range(len(names)) if bitmap[i >> 3] >> (i & 7) & 1}
+            off += self._bitmap_len
+        else:
+            (count,) = COUNT.unpack_from(buf, off)
+            player.visited_rooms = {names[i] for i in struct.unpack_from(f"<{count}I", buf, off + 4)}
+            off += 4 + 4 * count
+        count_size = 1 if version < 3 else COUNT.size  # item counts were a u8 before version 3
+        count = buf[off] if version < 3 else COUNT.unpack_from(buf, off)[0]
+        player.inventory = [items[i] for i in struct.unpack_from(f"<{count}H", buf, off + count_size)]
+        off += count_size + 2 * count
+        world.loot.clear()
+        if version == 1:
+            for name in names:
+                count = buf[off]
+                world.set_items(name, [items[i] for i in struct.unpack_from(f"<{count}H", buf, off + 1)])
+                off += 1 + 2 * count
+        else:
+            (rooms,) = COUNT.unpack_from(buf, off)
+            off += 4
+            entry = struct.Struct("<IB" if version == 2 else "<II")
+            for _ in range(rooms):
+                room, count = entry.unpack_from(buf, off)
+                world.set_items(names[room], [items[i] for i in struct.unpack_from(f"<{count}H", buf, off + entry.size)])
+                off += entry.size + 2 * count
+        for name, durability in zip(self.weapon_names, self._durability.unpack_from(buf, off)):
+            world.set_durability(name, durability)
+        return seq
+
+    def migrate_json(self, data: Dict, player, world) -> int:
+        """Load a legacy JSON save. Loot and durability were never saved, so rebuild what we can:
+        every room the player entered was emptied on entry; weapons keep full durability."""
+        player.from_dict(data)
+        rooms = world.template.rooms
+        fragment_rooms = [name for name, room in rooms.items() if room["is_fragment_room"]]
+        entered = [name for name in fragment_rooms if name in player.visited_rooms and name != "Lobby"]
+        for name in player.visited_rooms:
+            if name in rooms and name != "Lobby":
+                world.set_items(name, ())
+        # The Lobby is "visited" from the start; its fragment only counts if it was picked up.
+        if "Lobby" in rooms and player.map_fragments_found > len(entered):
+            world.set_items("Lobby", ())
+        return data.get("journal_seq", 0)
+
+
+# -------------------- DELTAS --------------------
+def capture(player, world) -> Dict:
+    """Plain-data copy of everything a save needs. Only rooms whose loot differs from
+    the template are listed (as shared tuples), so this is O(rooms changed)."""
+    state = player.to_dict()
+    state["inventory"] = list(state["inventory"])
+    state["visited_rooms"] = list(state["visited_rooms"])
+    state["rooms"] = dict(world.loot)
+    state["durability"] = {name: world.durability_of(name) for name in world.template.weapons}
+    return state
+
+def _replay_inventory(inventory: List[str], removed: List[str], added: List[str]) -> List[str]:
+    inventory = list(inventory)
+    for item in removed:
+        if item in inventory:
+            inventory.remove(item)
+    return inventory + added
+
+def diff(old: Dict, new: Dict) -> Dict:
+    """Delta record turning `old` into `new` (empty dict if nothing changed)."""
+    record = {}
+    changed = {k: v for k, v in new.items()
+               if k not in LIST_FIELDS and k not in WORLD_FIELDS and old.get(k) != v}
+    if changed:
+        record["set"] = changed
+    old_inv, new_inv = old["inventory"], new["inventory"]
+    removed = list((Counter(old_inv) - Counter(new_inv)).elements())
+    added = new_inv[len(new_inv) - sum((Counter(new_inv) - Counter(old_inv)).values()):]
+    if removed or added:
+        if _replay_inventory(old_inv, removed, added) == new_inv:
+            if removed:
+                record["remove"] = removed
+            if added:
+                record["add"] = added
+        else:
+            # Reordered inventory (e.g. a pickup and a heal in the same turn): store it whole.
+            record.setdefault("set", {})["inventory"] = new_inv
+    visited = sorted(set(new["visited_rooms"]) - set(old["visited_rooms"]))
+    if visited:
+        record["visit"] = visited
+    rooms = {name: items for name, items in new["rooms"].items() if old["rooms"].get(name) != items}
+    rooms.update((name, None) for name in old["rooms"] if name not in new["rooms"])  # back to the template
+    if rooms:
+        record["rooms"] = rooms
+    durability = {name: d for name, d in new["durability"].items() if old["durability"].get(name) != d}
+    if durability:
+        record["dur"] = durability
+    return record
+
+def apply_record(record: Dict, player, world):
+    if "full" in record:
+        full = record["full"]
+        player.from_dict(full)
+        record = {"rooms": full.get("rooms", {}), "dur": full.get("durability", {})}
+        world.loot.clear()
+    for key, value in record.get("set", {}).items():
+        setattr(player, key, value)
+    if "remove" in record or "add" in record:
+        player.inventory = _replay_inventory(player.inventory, record.get("remove", []), record.get("add", []))
+    player.visited_rooms.update(record.get("visit", ()))
+    for name, items in record.get("rooms", {}).items():
+        if name not in world.template.rooms:
+            continue
+        if items is None:
+            world.loot.pop(name, None)
+        else:
+            world.set_items(name, items)
+    for name, durability in record.get("dur", {}).items():
+        if name in world.template.weapons:
+            world.set_durability(name, durability)
+
+def encode_record(record: Dict) -> bytes:
+    body = json.dumps(record, separators=(",", ":")).encode()
+    return b"%08x %s\n" % (zlib.crc32(body), body)
+
+def decode_records(raw: bytes) -> List[Dict]:
+    """Complete, checksummed records in order; stops at the first bad line."""
+    records = []
+    for line in raw.split(b"\n"):
+        if len(line) < 10 or line[8:9] != b" ":
+            break
+        body = line[9:]
+        try:
+            if int(line[:8], 16) != zlib.crc32(body):
+                break
+            records.append(json.loads(body))
+        except ValueError:
+            break
+    return records
+
+
+# -------------------- SHARED WRITER THREAD --------------------
+class _Writer:
+    """One background thread serves every SaveManager in the process."""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.ready: List["SaveManager"] = []
+        self.thread: Optional[threading.Thread] = None
+
+    def submit(self, manager: "SaveManager"):
+        # caller holds self.cond
+        if manager not in self.ready:
+            self.ready.append(manager)
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="autosave", daemon=True)
+            self.thread.start()
+        self.cond.notify_all()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.ready:
+                    self.cond.wait()
+                manager = self.ready.pop(0)
+                ops, manager._ops = manager._ops, []
+                manager._writing = True
+            try:
+                manager._write(ops)
+            finally:
+                with self.cond:
+                    manager._writing = False
+                    self.cond.notify_all()
+
+_WRITER = _Writer()
+_MANAGERS: "weakref.WeakSet[SaveManager]" = weakref.WeakSet()
+
+@atexit.register
+def flush_all():
+    for manager in list(_MANAGERS):
+        manager.flush()
+
+
+class SaveManager:
+    def __init__(self, path: str, codec: WorldCodec, world, legacy_path: str = None,
+                 compact_every: int = COMPACT_EVERY):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.legacy_path = legacy_path
+        self.codec = codec
+        self.world = world
+        self.compact_every = compact_every
+        self._player = None
+        self._dirty = False
+        self._base: Optional[Dict] = None
+        self._seq = 0
+        self._since_compact = 0
+        self._ops: List[Tuple[str, bytes]] = []
+        self._writing = False
+        self.bytes_queued = 0  # everything handed to the writer thread so far
+        self._warned = set()  # kinds of failure already reported on stderr
+        self._cond = _WRITER.cond
+        _MANAGERS.add(self)
+
+    # -------------------- GAME THREAD --------------------
+    def exists(self) -> bool:
+        paths = (self.path, self.journal_path, self.legacy_path)
+        return any(path and os.path.exists(path) for path in paths)
+
+    def load(self, player) -> bool:
+        """Restore `player` and the world from snapshot + journal tail. False if there is no save."""
+        codec = self.codec
+        loaded, seq = False, 0
+        try:
+            with open(self.path, "rb") as f:
+                seq = codec.decode_into(f.read(), player, self.world)
+            loaded = True
+        except (OSError, ValueError, struct.error, IndexError):
+            if self.legacy_path:
+                try:
+                    with open(self.legacy_path, "r") as f:
+                        seq = codec.migrate_json(json.load(f), player, self.world)
+                    loaded = True
+                except (OSError, ValueError):
+                    pass
+        migrated = loaded and not os.path.exists(self.path)
+        journal = self.legacy_path + ".journal" if migrated else self.journal_path
+        try:
+            with open(journal, "rb") as f:
+                records = decode_records(f.read())
+        except OSError:
+            records = []
+        for record in records:
+            if record.get("seq", -1) < seq:
+                continue  # already folded into the snapshot
+            if "full" in record:
+                seq = record["seq"]  # a journal restarted after the snapshot: it replaces everything
+            elif record["seq"] != seq or not loaded:
+                break
+            apply_record(record, player, self.world)
+            loaded = True
+            seq += 1
+        if loaded:
+            self._player = player
+            self._base, self._seq = capture(player, self.world), seq
+            self._since_compact = len(records)
+            if migrated:
+                # Write the binary snapshot right away; it replaces the legacy files.
+                self._since_compact = max(1, self._since_compact)
+                self.compact()
+        return loaded
+
+    def mark(self, player):
+        """Remember that `player` changed; nothing is serialized yet."""
+        self._player = player
+        self._dirty = True
+
+    def commit(self):
+        """End of turn: journal one delta for everything that changed this turn."""
+        if not self._dirty:
+            return
+        self._dirty = False
+        state = capture(self._player, self.world)
+        if self._base is None:
+            record = {"full": state}
+        else:
+            record = diff(self._base, state)
+            if not record:
+                return
+        record["seq"] = self._seq
+        self._seq += 1
+        self._since_compact += 1
+        self._base = state
+        ops = [("append", encode_record(record))]
+        if self._since_compact >= self.compact_every:
+            ops.append(self._snapshot_op())
+        self._queue(ops)
+
+    def compact(self):
+        """Queue a full snapshot that replaces the journal."""
+        if self._base is not None and self._since_compact:
+            self._queue([self._snapshot_op()])
+
+    def flush(self, wait: bool = True):
+        """Commit, compact and (unless wait=False) block until everything queued is on disk."""
+        self.commit()
+        self.compact()
+        if not wait:
+            return
+        with self._cond:
+            while self._ops or self._writing:
+                self._cond.wait()
+
+    def busy(self) -> bool:
+        """Writes queued or in progress on the writer thread."""
+        with self._cond:
+            return bool(self._ops) or self._writing
+
+    def delete(self):
+        """Drop unsaved changes and remove the save and its journal (used by the endings)."""
+        self._dirty = False
+        self._base, self._seq, self._since_compact = None, 0, 0
+        with self._cond:
+            self._ops = []
+            while self._writing:
+                self._cond.wait()
+            legacy_journal = self.legacy_path and self.legacy_path + ".journal"
+            for path in (self.path, self.journal_path, self.legacy_path, legacy_journal):
+                if path:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+    def _snapshot_op(self) -> Tuple[str, bytes]:
+        try:
+            data = self.codec.encode(self._base, self._seq)
+        except (KeyError, SaveFormatError, struct.error) as e:
+            # Names the codec does not know (stale save): restart the journal from one full
+            # record instead, so it stays bounded; the next snapshot that encodes replaces it.
+            self._warn("snapshot", f"cannot write a snapshot ({e!r}); saving as JSON instead")
+            self._since_compact = 0
+            # Numbered after everything the old snapshot holds, so load() prefers it while both exist.
+            record = encode_record({"full": self._base, "seq": self._seq})
+            self._seq += 1
+            return ("restart", record)
+        self._since_compact = 0
+        return ("snapshot", data)
+
+    def _queue(self, ops: List[Tuple[str, bytes]]):
+        self.bytes_queued += sum(len(data) for _, data in ops)
+        with self._cond:
+            self._ops.extend(ops)
+            _WRITER.submit(self)
+
+    # -------------------- WRITER THREAD --------------------
+    def _write(self, ops: List[Tuple[str, bytes]]):
+        snapshots = [i for i, (kind, _) in enumerate(ops) if kind != "append"]
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if snapshots:
+                # Records queued before the newest snapshot are already folded into it.
+                last = snapshots[-1]
+                kind, data = ops[last]
+                if kind == "snapshot":
+                    self._replace(self.path, data)
+                    self._replace(self.journal_path, b"")
+                else:
+                    # The journal restarts from a full record; the old snapshot is stale.
+                    self._replace(self.journal_path, data)
+                    if os.path.exists(self.path):
+                        os.remove(self.path)
+                for legacy in (self.legacy_path, self.legacy_path and self.legacy_path + ".journal"):
+                    if legacy and os.path.exists(legacy):
+                        os.remove(legacy)
+                ops = ops[last + 1:]
+            tail = b"".join(data for kind, data in ops if kind == "append")
+            if tail:
+                with open(self.journal_path, "ab") as f:
+                    f.write(tail)
+                    f.flush()
+                    os.fsync(f.fileno())
+        except OSError as e:
+            self._warn("write", f"save failed ({e})")
+
+    def _warn(self, kind: str, message: str):
+        """Report a failure on stderr, once per kind and save."""
+        if kind not in self._warned:
+            self._warned.add(kind)
+            print(f"{self.path}: {message}", file=sys.stderr)
+
+    def _replace(self, path: str, data: bytes):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
@@ -0,0 +1,215 @@
+"""
+FLOOR 13 - Multi-session server
+A stdlib asyncio line-protocol server: every TCP connection is its own
+Session with its own World overlay and save (SAVE_DIR/<player>/world.dat).
+Endings and quit close only that connection.
+
+Sessions live in a session store (sessions.py): past --max-sessions (or
+--max-memory MB) hot sessions, the least recently active idle players are
+spilled to their save and reloaded on their next command.
+
+With --record-dir every session is also logged for replay.py
+(DIR/<player>-<ms>.f13r, written when the connection ends).
+With --history DB every finished run goes into one run-history database
+(history.py), shared by all sessions.
+
+Usage: python server.py [--host 127.0.0.1] [--port 1313] [--save-dir saves] [--pack FILE | --floor-seed N]
+                        [--record-dir DIR] [--stats FILE] [--history DB] [--max-sessions N] [--max-memory MB]
+Play:  nc localhost 1313   (or telnet localhost 1313)
+Load:  python loadgen.py --idle 1000 --active 100
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import sys
+import time
+from typing import Dict, Optional
+
+import console
+import floorgen
+import history
+import main
+import sessions
+
+SAVE_DIR = "saves"
+MAX_SESSIONS = 5000  # hot sessions before idle players are spilled to disk
+PORT = 1313
+PLAYER_ID = re.compile(r"^[A-Za-z0-9_-]{1,32}$")
+MAX_BUFFERED = 1 << 20  # drop clients that stop reading
+TELNET_IAC = re.compile(rb"\xff[\xfb-\xfe].|\xff[\xf0-\xfa]", re.S)
+
+
+def raise_fd_limit():
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft < hard:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+class Server:
+    def __init__(self, save_dir: str = SAVE_DIR, typewriter: bool = False, timed_events: bool = True,
+                 template=None, codec=None, record_dir: str = None, content: Dict = None, history_db=None,
+                 max_sessions: Optional[int] = MAX_SESSIONS, max_memory: int = None):
+        self.save_dir = save_dir
+        self.record_dir = record_dir
+        self.content = content or {}  # which template, for replay logs
+        self.history = history_db  # history.History, or None
+        self.template = template or main.TEMPLATE  # every session shares one template and codec
+        self.codec = codec or main.CODEC
+        self.typewriter = typewriter
+        self.timed_events = timed_events
+        self.sessions: Dict[str, main.Session] = {}
+        self.store = sessions.SessionStore(save_dir, self.template, self.codec, max_sessions, max_memory)
+        self.connections = 0
+        self.games_finished = 0
+
+    # -------------------- CONNECTION --------------------
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        transport = writer.transport
+
+        def write(text: str):
+            if transport.is_closing():
+                return
+            if transport.get_write_buffer_size() > MAX_BUFFERED:
+                transport.abort()
+                return
+            transport.write(text.replace("\n", "\r\n").encode())
+
+        io = console.Console(write, interactive=self.typewriter)
+        tasks = [asyncio.create_task(io.render()), asyncio.create_task(self._read(reader, io))]
+        s: Optional[main.Session] = None
+        recorder = None
+        ending = None
+        try:
+            player_id = await self._login(io)
+            if self.record_dir:
+                import replay
+                log = os.path.join(self.record_dir, f"{player_id}-{int(time.time() * 1000)}{replay.SUFFIX}")
+                recorder = replay.Recorder(log, self.content)
+            s = self.store.open(io, player_id, recorder=recorder, history_db=self.history)
+            self.sessions[player_id] = s
+            if self.timed_events:
+                tasks += [asyncio.create_task(main.flashlight_timer(s)), asyncio.create_task(main.ambient_events(s))]
+            try:
+                await main.play(s)
+            except main.GameOver as over:
+                ending = over.ending
+                self.games_finished += 1
+        except EOFError:
+            pass
+        finally:
+            if s is not None:
+                self.store.close(s)
+                self.sessions.pop(s.player_id, None)
+                if recorder:
+                    recorder.finish(s, ending)
+            try:
+                await asyncio.wait_for(io.drain(), 5)
+            except asyncio.TimeoutError:
+                pass
+            for task in tasks:
+                task.cancel()
+            self.connections -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def _login(self, io: console.Console) -> str:
+        io.say("FLOOR 13 — the doors open. Who are you? (letters, digits, - or _)")
+        while True:
+            name = (await io.ask("Name: ")).strip()
+            if not PLAYER_ID.match(name):
+                io.say("Names are 1-32 letters, digits, - or _.")
+            elif name in self.sessions:
+                io.say("Someone with that name is already on the floor.")
+            else:
+                return name
+
+    async def _read(self, reader: asyncio.StreamReader, io: console.Console):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                io.feed(TELNET_IAC.sub(b"", line).decode("utf-8", "ignore").rstrip("\r\n"))
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            io.close_input()
+
+    # -------------------- STATUS --------------------
+    async def report(self, every: float):
+        while True:
+            await asyncio.sleep(every)
+            idle = sum(1 for s in self.sessions.values() if s.idle)
+            print(f"[{time.strftime('%H:%M:%S')}] connections {self.connections} | sessions {len(self.sessions)} "
+                  f"(idle {idle}) | finished games {self.games_finished} | {self.store.report()}", file=sys.stderr)
+
+
+async def serve(host: str, port: int, server: Server, report_every: float = 0):
+    listener = await asyncio.start_server(server.handle, host, port, backlog=1024)
+    addresses = ", ".join(str(sock.getsockname()) for sock in listener.sockets)
+    print(f"Floor 13 server listening on {addresses}", file=sys.stderr)
+    if report_every:
+        asyncio.create_task(server.report(report_every))
+    async with listener:
+        await listener.serve_forever()
+
+def cli():
+    parser = argparse.ArgumentParser(description="Floor 13 multi-session server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--save-dir", default=SAVE_DIR)
+    parser.add_argument("--typewriter", action="store_true", help="type text out slowly like the local game")
+    parser.add_argument("--no-timed-events", action="store_true", help="no idle flashlight drain / ambient text")
+    parser.add_argument("--report", type=float, default=30, help="status line every N seconds (0 = off)")
+    parser.add_argument("--floor-seed", type=int, help="serve a generated floor instead of the hotel")
+    parser.add_argument("--floor-size", type=int, default=floorgen.DEFAULT_SIZE)
+    parser.add_argument("--pack", help="serve another content pack (packs/*.json) instead of the hotel")
+    parser.add_argument("--record-dir", help="log every session here for replay.py")
+    parser.add_argument("--stats", metavar="FILE", default=os.environ.get("FLOOR13_STATS"),
+                        help="count and time the hot paths over all sessions; written here at exit")
+    parser.add_argument("--history", metavar="DB", default=os.environ.get("FLOOR13_HISTORY"),
+                        help="log every finished run to this SQLite database (see history.py)")
+    parser.add_argument("--max-sessions", type=int, default=MAX_SESSIONS,
+                        help="sessions kept in memory; idle players past it are spilled to disk (0: no cap)")
+    parser.add_argument("--max-memory", type=float, metavar="MB",
+                        help="also cap the hot sessions' memory (per-session size measured at startup)")
+    args = parser.parse_args()
+    if args.stats:
+        import instrument
+        instrument.install(args.stats)
+    raise_fd_limit()
+    template = codec = None
+    content = {}
+    if args.pack:
+        content = {"pack": os.path.abspath(args.pack)}
+        template, codec = main.pack_template(args.pack)
+        args.save_dir = os.path.join(args.save_dir, "pack-" + os.path.splitext(os.path.basename(args.pack))[0])
+    elif args.floor_seed is not None:
+        content = {"floor": [args.floor_seed, args.floor_size]}
+        template, codec = main.floor_template(args.floor_seed, args.floor_size)
+        args.save_dir = os.path.join(args.save_dir, f"floor-{args.floor_seed}-{args.floor_size}")
+    import fightstats
+    import solver
+    used = template or main.TEMPLATE
+    fightstats.table_for(used)  # build/load the threat table now, not inside the first fight
+    solver.load_table(solver.fight_stats(used.enemies, used.weapons, used.boss))  # same, for `hint`
+    server = Server(args.save_dir, args.typewriter, not args.no_timed_events, template, codec,
+                    args.record_dir, content, history.open_history(args.history), args.max_sessions or None,
+                    int(args.max_memory * 2 ** 20) if args.max_memory else None)
+    try:
+        asyncio.run(serve(args.host, args.port, server, args.report))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,361 @@
+"""
+FLOOR 13 - Session store
+Keeps the server's sessions in memory up to a cap and spills idle ones to disk:
+- a hot session holds its Player, World overlay, SaveManager and rolls
+  (about 8 KB on the hotel); a cold one keeps only the connection, its
+  console and the run tally
+- sessions are kept in LRU order of their last input line; the cap
+  (server.py --max-sessions N, or --max-memory MB over a per-session size
+  measured at startup) is enforced before a session is admitted (login or
+  reload) and whenever one comes back to the command prompt, by evicting the
+  least recently active sessions that sit idle there: their save is compacted
+  into the snapshot in the player's directory (SAVE_DIR/<player>/world.dat,
+  written by the save thread) and the rest is dropped
+- the next line from a cold player reloads it before the game sees the line:
+  one snapshot decode into a fresh World overlay. Idle flashlight ticks
+  missed while cold are applied then, and the rolls go on from a fresh
+  stream (main.reload_rolls, logged so replays follow)
+- players in a fight, a menu or the intro are never evicted (their game is
+  mid-coroutine), so the cap bounds the sessions at rest, not these: while
+  more players than the cap are busy at once, all of them stay hot
+- metrics: hot and busy sessions, peak hot, hit rate (lines that found their
+  session hot), evictions and reload latency (p50 / p99 / max), on the
+  server's status line
+- older servers' saves (SAVE_DIR/<player>.dat) move into the player's
+  directory on login
+
+Usage: python server.py --max-sessions 5000 [--max-memory MB] ...
+       python sessions.py --stress 50000 [--max-sessions 2000] [--commands 20000]
+           (50k idle players over in-memory connections to one Server, then a mix of
+           returning and active players; reports memory, hit rate, evictions, reload latency)
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import main
+import rolls
+import saves
+
+SNAPSHOT = "world.dat"  # a player's save, inside their directory
+RELOAD_SAMPLES = 10_000  # reload latencies kept for the percentiles
+
+
+class Metrics:
+    __slots__ = ("hits", "misses", "evictions", "peak", "reload_times")
+
+    def __init__(self):
+        self.hits = 0  # input lines whose session was in memory
+        self.misses = 0  # ... and lines that had to reload it first
+        self.evictions = 0
+        self.peak = 0  # most sessions hot at once
+        self.reload_times: Deque[float] = deque(maxlen=RELOAD_SAMPLES)
+
+    def hit_rate(self) -> float:
+        lines = self.hits + self.misses
+        return self.hits / lines if lines else 1.0
+
+    def reload_ms(self, p: float) -> float:
+        if not self.reload_times:
+            return 0.0
+        ordered = sorted(self.reload_times)
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+
+    def report(self) -> str:
+        return (f"hit rate {self.hit_rate():.1%} ({self.misses} reloads) | evictions {self.evictions} | "
+                f"reload p50 {self.reload_ms(0.5):.2f} ms p99 {self.reload_ms(0.99):.2f} ms "
+                f"max {self.reload_ms(1.0):.2f} ms | peak hot {self.peak}")
+
+
+class SessionStore:
+    """The sessions of one server, hot (LRU) or spilled to their players' directories."""
+
+    def __init__(self, save_dir: str, template=None, codec=None, capacity: int = None, memory: int = None):
+        self.save_dir = save_dir
+        self.template = template or main.TEMPLATE
+        self.codec = codec or main.CODEC
+        if memory:
+            fits = max(1, memory // session_bytes(self.template, self.codec))
+            capacity = min(capacity, fits) if capacity else fits
+        self.capacity = capacity  # None: never evict
+        self.hot: "OrderedDict[str, main.Session]" = OrderedDict()  # least recently active first
+        self.cold: Dict[str, float] = {}  # player -> time.monotonic() of the eviction
+        self.writing: "OrderedDict[str, saves.SaveManager]" = OrderedDict()  # evicted, snapshot not on disk yet
+        self.metrics = Metrics()
+
+    def path(self, player_id: str) -> str:
+        return os.path.join(self.save_dir, player_id, SNAPSHOT)
+
+    # -------------------- LIFETIME --------------------
+    def open(self, io, player_id: str, **session_args) -> main.Session:
+        """A new hot session for a player who just logged in (their save, if any, is loaded by main.play)."""
+        self._migrate(player_id)
+        world = main.new_world(self.template)
+        manager = saves.SaveManager(self.path(player_id), self.codec, world)
+        s = main.Session(io, world, manager, player_id=player_id, **session_args)
+        s.store = self
+        self._admit(s)
+        return s
+
+    def close(self, s: main.Session):
+        """The player left: queue their last save and forget the session (it stays usable, e.g. for a replay log)."""
+        if s.player_id in self.cold and s.recorder:
+            self._load(s, catch_up=False)  # the log ends with a digest of the final state
+        if self.hot.pop(s.player_id, None) is not None:
+            s.saves.flush(wait=False)
+        self.cold.pop(s.player_id, None)
+        s.store = None
+
+    def _migrate(self, player_id: str):
+        old = os.path.join(self.save_dir, player_id + ".dat")
+        new = self.path(player_id)
+        if os.path.exists(new) or not os.path.exists(old):
+            return
+        os.makedirs(os.path.dirname(new), exist_ok=True)
+        os.replace(old, new)
+        if os.path.exists(old + ".journal"):
+            os.replace(old + ".journal", new + ".journal")
+
+    # -------------------- LRU --------------------
+    def touch(self, s: main.Session):
+        """A line arrived for `s` (main.Session.ask): mark it most recent, reloading it if it was evicted."""
+        player_id = s.player_id
+        if player_id in self.hot:
+            self.metrics.hits += 1
+            self.hot.move_to_end(player_id)
+        else:
+            self.metrics.misses += 1
+            self._load(s, catch_up=True)
+
+    def rest(self, s: main.Session):
+        """`s` is back at the command prompt (main.play): it and the others at rest may be evicted now."""
+        self.trim()
+
+    def _admit(self, s: main.Session):
+        """Make room first, then add `s` as the most recent hot session."""
+        self.trim(room=1)
+        self.hot[s.player_id] = s
+        self.metrics.peak = max(self.metrics.peak, len(self.hot))
+
+    def trim(self, room: int = 0):
+        """Evict the least recently active idle sessions until the cap holds with `room` to spare
+        (or only busy ones are left)."""
+        if self.capacity is None or len(self.hot) + room <= self.capacity:
+            return
+        over = len(self.hot) + room - self.capacity
+        victims = []
+        for s in self.hot.values():
+            if s.idle:
+                victims.append(s)
+                if len(victims) == over:
+                    break
+        for s in victims:
+            self.evict(s)
+        self._settle()
+
+    def evict(self, s: main.Session):
+        manager = s.saves
+        manager.flush(wait=False)  # commit + compact: the snapshot replaces the journal
+        del self.hot[s.player_id]
+        self.cold[s.player_id] = time.monotonic()
+        if manager.busy():
+            self.writing[s.player_id] = manager
+        s.player = s.world = s.saves = s.rng = s.route = None
+        self.metrics.evictions += 1
+
+    def _settle(self):
+        """Let go of evicted save managers whose snapshot has been written."""
+        writing = self.writing
+        while writing:
+            player_id, manager = next(iter(writing.items()))
+            if manager.busy():
+                break
+            del writing[player_id]
+
+    def _load(self, s: main.Session, catch_up: bool):
+        started = time.perf_counter()
+        player_id = s.player_id
+        manager = self.writing.pop(player_id, None)
+        if manager is not None:
+            manager.flush()  # its snapshot is still on the way to disk
+        evicted = self.cold.pop(player_id)
+        world = main.new_world(self.template)
+        s.world, s.saves = world, saves.SaveManager(self.path(player_id), self.codec, world)
+        player = main.Player()
+        s.saves.load(player)
+        s.player = player
+        main.reload_rolls(s)
+        self._admit(s)
+        self.metrics.reload_times.append(time.perf_counter() - started)
+        if catch_up:
+            missed = int((time.monotonic() - evicted) // main.IDLE_DRAIN_SECONDS)
+            while missed and player.flashlight_on:
+                main.idle_drain(s)
+                missed -= 1
+
+    def report(self) -> str:
+        busy = sum(1 for s in self.hot.values() if not s.idle)
+        return (f"hot {len(self.hot)} (busy {busy}) / cap {self.capacity or '-'} | spilled {len(self.cold)} | "
+                f"{self.metrics.report()}")
+
+
+def session_bytes(template, codec) -> int:
+    """What one hot session holds beyond a cold one, measured on a scratch session."""
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    with tempfile.TemporaryDirectory() as tmp:
+        for _ in range(2):  # the first round pays for imports and caches
+            before = tracemalloc.get_traced_memory()[0]
+            world = main.new_world(template)
+            manager = saves.SaveManager(os.path.join(tmp, SNAPSHOT), codec, world)
+            player = main.Player()
+            manager.mark(player)
+            manager.flush()
+            rng = rolls.Rolls(0)
+            rng.random()  # the first block
+            size = tracemalloc.get_traced_memory()[0] - before
+            del world, manager, player, rng
+    if not tracing:
+        tracemalloc.stop()
+    return size
+
+
+# -------------------- STRESS TEST --------------------
+class _Transport:
+    """One direction of an in-memory connection: writes land in the other side's StreamReader."""
+
+    def __init__(self, peer: asyncio.StreamReader):
+        self.peer = peer
+        self.closed = False
+
+    def write(self, data: bytes):
+        self.peer.feed_data(data)
+
+    def is_closing(self) -> bool:
+        return self.closed
+
+    def get_write_buffer_size(self) -> int:
+        return 0
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.peer.feed_eof()
+
+    abort = close
+
+
+class _Writer:
+    """The StreamWriter surface Server.handle and loadgen's clients use."""
+
+    def __init__(self, peer: asyncio.StreamReader):
+        self.transport = _Transport(peer)
+
+    def write(self, data: bytes):
+        self.transport.write(data)
+
+    def close(self):
+        self.transport.close()
+
+    async def wait_closed(self):
+        pass
+
+
+def connect(server) -> Tuple[asyncio.StreamReader, _Writer]:
+    """A client connection to `server` without sockets; the server side runs as a task."""
+    to_server, to_client = asyncio.StreamReader(), asyncio.StreamReader()
+    asyncio.get_running_loop().create_task(server.handle(to_server, _Writer(to_client)))
+    return to_client, _Writer(to_server)
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # peak, in KB on Linux
+
+async def stress(players: int, capacity: Optional[int], commands: int, active: int, hot_share: float,
+                 save_dir: str, seed: int = 13):
+    import loadgen
+    import server as server_module
+    server = server_module.Server(save_dir, max_sessions=capacity)
+    store = server.store
+    base = rss_mb()
+    print(f"{players} players, cap {capacity or 'none'}, save dir {save_dir}   (RSS {base:.0f} MB at start)")
+
+    async def arrive(n: int) -> List:
+        reader, writer = connect(server)
+        screen = await loadgen.login(reader, writer, f"p{n}")
+        if screen.endswith("continue...)"):
+            writer.write(b"\r\n")
+            screen = await loadgen.read_prompt(reader)
+        return [reader, writer, screen]
+
+    started = time.perf_counter()
+    clients: List[List] = []
+    for first in range(0, players, 1000):
+        clients += await asyncio.gather(*(arrive(n) for n in range(first, min(players, first + 1000))))
+        if first % 10_000 == 0 or first + 1000 >= players:
+            print(f"  {len(clients):>6} idle  {time.perf_counter() - started:6.1f}s  RSS {rss_mb():7.0f} MB  "
+                  f"{store.report()}")
+    store.trim()
+    for manager in list(store.writing.values()):
+        manager.flush()
+    store._settle()
+    idle_rss = rss_mb()
+    print(f"logged in: {players} players in {time.perf_counter() - started:.1f}s, "
+          f"{(idle_rss - base) * 1024 / players:.1f} KB per player; "
+          f"all hot would add ~{players * session_bytes(store.template, store.codec) / 2 ** 20:.0f} MB more")
+
+    rng = random.Random(seed)
+    latencies = []
+    games = 0
+    started = time.perf_counter()
+    for _ in range(commands):
+        n = rng.randrange(min(active, players)) if rng.random() < hot_share else rng.randrange(players)
+        reader, writer, screen = clients[n]
+        writer.write(loadgen.choose_command(screen, rng).encode() + b"\r\n")
+        sent = time.perf_counter()
+        try:
+            clients[n][2] = await loadgen.read_prompt(reader)
+        except EOFError:
+            games += 1  # an ending closed the connection: the player comes back for a new game
+            clients[n] = await arrive(n)
+            continue
+        latencies.append(time.perf_counter() - sent)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(f"activity: {commands} commands in {elapsed:.1f}s ({commands / elapsed:.0f}/s, {games} games ended), "
+          f"p50 {latencies[len(latencies) // 2] * 1000:.2f} ms p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms")
+    print(f"store: {store.report()}")
+    print(f"RSS {rss_mb():.0f} MB")
+    for reader, writer, _ in clients:
+        writer.close()
+    await asyncio.sleep(0)
+
+def cli():
+    parser = argparse.ArgumentParser(description="Floor 13 session store stress test")
+    parser.add_argument("--stress", type=int, default=50_000, metavar="PLAYERS", help="idle players to log in")
+    parser.add_argument("--max-sessions", type=int, default=2000, help="hot sessions (0: no cap)")
+    parser.add_argument("--commands", type=int, default=20_000, help="commands after everyone is in")
+    parser.add_argument("--active", type=int, default=500, help="players who keep playing")
+    parser.add_argument("--hot-share", type=float, default=0.8,
+                        help="share of commands from active players; the rest come from random idle ones")
+    parser.add_argument("--save-dir", help="default: a temporary directory")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(stress(args.stress, args.max_sessions or None, args.commands, args.active, args.hot_share,
+                           args.save_dir or tmp))
+        saves.flush_all()
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,289 @@
+"""
+FLOOR 13 - Monte Carlo balance runner
+Plays complete headless runs from the Lobby to an ending and aggregates:
+- win / death / stuck rates; "stuck" is not one of the game's endings: the
+  run ran out of light (dark room ahead, no battery or Batteries left) or
+  of turns (--max-turns). The game's Trapped Forever ending (more than 30
+  distinct rooms visited with fewer than 2 fragments) cannot happen on the
+  13-room hotel these runs play
+- turn counts (mean and percentiles)
+- damage taken, visits and deaths per room
+
+Runs are split into chunks and spread over a process pool. Every chunk gets
+its own rolls.Rolls stream keyed by (seed, chunk index), so results depend only
+on --seed and --runs, never on the number of workers or scheduling order.
+
+With --history DB every run is also written to the run-history database
+(history.py): each chunk's runs go in as one bulk insert from the parent.
+
+Usage: python simulate.py --runs 1000000 --policy scripted --seed 13 [--history runs.db]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+import combat
+import history
+import rolls
+from main import BOSS, FRAGMENTS_REQUIRED, GRAPH, ROOMS, TEMPLATE, WEAPONS, Player
+
+ENEMY_TABLE = TEMPLATE.enemy_table
+CHUNK_SIZE = 5000
+MAX_TURNS = 400
+POLICIES = ("scripted", "random")
+
+WIN = "win"
+DEATH = "death"
+STUCK = "stuck"  # out of light or turns; not a game ending
+ENDINGS = {WIN: "escape", DEATH: "consumed", STUCK: STUCK}  # as the game (and history.py) names them
+
+# -------------------- POLICIES --------------------
+def _best_weapon(player: Player, weapons: Dict) -> Optional[str]:
+    held = player.inventory.weapons()
+    return max(held, key=lambda w: weapons[w]["damage"]) if held else None
+
+def scripted_fighter(weapons: Dict) -> Callable:
+    def policy(turn: combat.Turn):
+        p = turn.player
+        low = 45 if turn.boss else 30
+        if p.health < low and "Health Pack" in p.inventory:
+            return combat.HEAL
+        best = _best_weapon(p, weapons)
+        if best and best != p.weapon and (p.weapon is None or weapons[best]["damage"] > weapons[p.weapon]["damage"]):
+            return (combat.SWITCH, best)
+        return combat.ATTACK
+    return policy
+
+def random_fighter(rng: random.Random) -> Callable:
+    def policy(turn: combat.Turn):
+        if turn.boss:
+            return rng.choice((combat.ATTACK, combat.ATTACK, combat.HEAL, combat.FLASHLIGHT))
+        return rng.choice((combat.ATTACK, combat.ATTACK, combat.HEAL, combat.RUN))
+    return policy
+
+def scripted_explorer(player: Player, items: Dict[str, List[str]], rng: random.Random) -> Optional[str]:
+    """Head for the nearest room that still has items, then for the Boss Chamber."""
+    here = player.location
+    targets = [room for room, left in items.items() if left and room != here]
+    if not targets or player.map_fragments_found >= FRAGMENTS_REQUIRED:
+        targets = ["Boss Chamber"]
+    target = min(targets, key=lambda room: GRAPH.distance(here, room))
+    return GRAPH.next_step(here, target)
+
+def random_explorer(player: Player, items: Dict[str, List[str]], rng: random.Random) -> Optional[str]:
+    return rng.choice(ROOMS[player.location]["adj"])
+
+# -------------------- ONE RUN --------------------
+def play_run(rng: random.Random, policy: str = "scripted", max_turns: int = MAX_TURNS, stats: Dict = None,
+             log: List = None, seed: int = None) -> str:
+    """Play one run from the Lobby; returns WIN, DEATH or STUCK and adds to `stats` if given
+    (and its history.Run to `log`). Moving, pickups and the flashlight mirror main.py's
+    move_to_room / use_batteries without a Session or any text; fights are combat.py's own."""
+    player = Player()
+    items = {name: list(room["items"]) for name, room in ROOMS.items()}
+    weapons = {name: dict(w) for name, w in WEAPONS.items()}
+    if policy == "scripted":
+        explore, fighter = scripted_explorer, scripted_fighter(weapons)
+    else:
+        explore, fighter = random_explorer, random_fighter(rng)
+    emit = _ignore
+    hits = None
+    if log is not None:
+        hits = Counter()
+
+        def emit(event):
+            if event[0] == "hit" or event[0] == "boss_hit":
+                hits[event[2]] += 1
+
+    ending = STUCK
+    turns = 0
+    damage = 0
+    while turns < max_turns:
+        turns += 1
+        dest = explore(player, items, rng)
+        if ROOMS[dest]["required_light"] and not player.flashlight_on:
+            if player.flashlight_battery <= 0 and "Batteries" in player.inventory:
+                player.inventory.remove("Batteries")
+                player.flashlight_battery = min(100, player.flashlight_battery + 50)
+            elif player.flashlight_battery > 0:
+                player.flashlight_on = True
+            else:
+                break
+            continue
+
+        # move_to_room
+        health_before = player.health
+        player.location = dest
+        player.visited_rooms.add(dest)
+        combat.drain(player, 6, emit)
+        left = items[dest]
+        while left:
+            item = left.pop(0)
+            if item.startswith("Map Fragment"):
+                player.map_fragments_found += 1
+                if player.map_fragments_found >= FRAGMENTS_REQUIRED:
+                    player.map_unlocked = True
+            else:
+                player.inventory.append(item)
+                if item in weapons and not player.weapon:
+                    player.weapon = item
+        chance = ROOMS[dest]["chance_enemy"]
+        if chance > 0 and rng.random() < chance:
+            enemy = rng.choice(ENEMY_TABLE)
+            outcome = combat.drive(combat.encounter(player, enemy, weapons, emit, rng), fighter)
+            if outcome == combat.DIED:
+                ending = DEATH
+        if ending != DEATH and dest == "Boss Chamber":
+            rng.random()  # has_master_key / wrong-step roll; both branches fight
+            outcome = combat.drive(combat.boss_encounter(player, BOSS, ENEMY_TABLE, weapons, emit, rng), fighter)
+            ending = WIN if outcome == combat.WON else DEATH
+        taken = max(0, health_before - player.health)
+        damage += taken
+        if stats is not None:
+            stats["damage_by_room"][dest] += taken
+            stats["visits_by_room"][dest] += 1
+            if ending == DEATH:
+                stats["deaths_by_room"][dest] += 1
+        if ending != STUCK:
+            break
+        if player.health <= 0:
+            ending = DEATH
+            break
+        if player.flashlight_battery <= 50 and "Batteries" in player.inventory:
+            turns += 1
+            player.inventory.remove("Batteries")
+            player.flashlight_battery = min(100, player.flashlight_battery + 50)
+
+    if stats is not None:
+        stats["runs"] += 1
+        stats["endings"][ending] += 1
+        stats["turns"][turns] += 1
+    if log is not None:
+        log.append(history.Run("sim", None, seed, ENDINGS[ending], turns, len(player.visited_rooms),
+                               player.map_fragments_found, damage, player.location if ending == DEATH else None,
+                               tuple(hits.items())))
+    return ending
+
+def _ignore(event):
+    pass
+
+# -------------------- AGGREGATION --------------------
+def new_stats() -> Dict:
+    return {"runs": 0, "endings": Counter(), "turns": Counter(),
+            "damage_by_room": Counter(), "visits_by_room": Counter(), "deaths_by_room": Counter()}
+
+def merge_stats(into: Dict, other: Dict) -> Dict:
+    into["runs"] += other["runs"]
+    for key in ("endings", "turns", "damage_by_room", "visits_by_room", "deaths_by_room"):
+        into[key].update(other[key])
+    return into
+
+def _percentile(hist: Counter, q: float) -> int:
+    total = sum(hist.values())
+    seen = 0
+    for value in sorted(hist):
+        seen += hist[value]
+        if seen >= q * total:
+            return value
+    return 0
+
+def summarize(stats: Dict) -> Dict:
+    runs = stats["runs"] or 1
+    turns = stats["turns"]
+    rooms = {}
+    for room in ROOMS:
+        visits = stats["visits_by_room"][room]
+        rooms[room] = {"visits": visits,
+                       "damage_per_visit": round(stats["damage_by_room"][room] / visits, 3) if visits else 0.0,
+                       "deaths": stats["deaths_by_room"][room]}
+    return {
+        "runs": stats["runs"],
+        "win_rate": stats["endings"][WIN] / runs,
+        "death_rate": stats["endings"][DEATH] / runs,
+        "stuck_rate": stats["endings"][STUCK] / runs,
+        "turns_mean": sum(t * n for t, n in turns.items()) / runs,
+        "turns_p50": _percentile(turns, 0.5),
+        "turns_p90": _percentile(turns, 0.9),
+        "rooms": rooms,
+    }
+
+# -------------------- PROCESS POOL --------------------
+def chunk_rng(seed: int, chunk: int) -> rolls.Rolls:
+    return rolls.Rolls(f"floor13/{seed}").stream(chunk)
+
+def run_chunk(args) -> Dict:
+    seed, chunk, count, policy, max_turns, keep_runs = args
+    rng = chunk_rng(seed, chunk)
+    stats = new_stats()
+    log = [] if keep_runs else None
+    for _ in range(count):
+        play_run(rng, policy, max_turns, stats, log, seed)
+    if keep_runs:
+        stats["log"] = log
+    return stats
+
+def room_totals(stats: Dict) -> Dict[str, tuple]:
+    """A chunk's per-room (visits, deaths, damage), for history.History.add_many()."""
+    return {room: (visits, stats["deaths_by_room"][room], stats["damage_by_room"][room])
+            for room, visits in stats["visits_by_room"].items()}
+
+def simulate(runs: int, policy: str = "scripted", seed: int = 0, workers: int = None,
+             max_turns: int = MAX_TURNS, chunk_size: int = CHUNK_SIZE,
+             history_db: history.History = None) -> Dict:
+    """Play `runs` complete games and return the merged raw stats (writing every run to `history_db`)."""
+    jobs = []
+    for chunk, start in enumerate(range(0, runs, chunk_size)):
+        jobs.append((seed, chunk, min(chunk_size, runs - start), policy, max_turns, history_db is not None))
+    total = new_stats()
+
+    def collect(stats: Dict):
+        if history_db is not None:
+            history_db.add_many(stats.pop("log"), room_totals(stats))
+        merge_stats(total, stats)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) == 1:
+        for job in jobs:
+            collect(run_chunk(job))
+        return total
+    with multiprocessing.Pool(workers) as pool:
+        for stats in pool.imap_unordered(run_chunk, jobs):
+            collect(stats)
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description="Floor 13 Monte Carlo balance runner")
+    parser.add_argument("--runs", "-n", type=int, default=100000)
+    parser.add_argument("--policy", choices=POLICIES, default="scripted")
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--workers", "-j", type=int, default=None)
+    parser.add_argument("--max-turns", type=int, default=MAX_TURNS)
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    parser.add_argument("--history", metavar="DB", help="also write every run to this SQLite database (history.py)")
+    args = parser.parse_args()
+
+    history_db = history.open_history(args.history)
+    started = time.perf_counter()
+    summary = summarize(simulate(args.runs, args.policy, args.seed, args.workers, args.max_turns,
+                                 history_db=history_db))
+    elapsed = time.perf_counter() - started
+    summary["seconds"] = round(elapsed, 3)
+    summary["runs_per_second"] = round(args.runs / elapsed) if elapsed else None
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f"{summary['runs']} runs ({args.policy}) in {elapsed:.2f}s -> {summary['runs_per_second']} runs/s")
+    print(f"win {summary['win_rate']:.2%} | death {summary['death_rate']:.2%} | stuck {summary['stuck_rate']:.2%}")
+    print(f"turns: mean {summary['turns_mean']:.1f}, p50 {summary['turns_p50']}, p90 {summary['turns_p90']}")
+    print(f"{'room':<18}{'visits':>10}{'dmg/visit':>12}{'deaths':>10}")
+    for room, row in summary["rooms"].items():
+        print(f"{room:<18}{row['visits']:>10}{row['damage_per_visit']:>12}{row['deaths']:>10}")
+
+if __name__ == "__main__":
+    main()
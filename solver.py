@@ -0,0 +1,456 @@
+"""
+FLOOR 13 - Combat solver
+Optimal play for both fight menus, solved once per set of fight stats:
+- minion fights: state (player HP, enemy HP, weapon durability, health
+  packs), actions attack / heal / run; the value is the chance to come out
+  alive (by winning or escaping)
+- the Matriarch: state (player HP, boss HP, weapon durability, health
+  packs), actions attack / heal; the value is the chance to win. Every
+  round ends with her hit and the 30% summon, and the summoned minion is
+  either fought to the death (it costs durability and may drop a pack) or
+  run from, whichever is better with the HP her hit left; the table keeps
+  that choice too, and advise() follows it on the minion's turns
+- damage ranges are the real ones: WEAPONS, ENEMY_TYPES and BOSS from the
+  template, plus the combat rules (weapon bonus, fists, heal amounts)
+- in minion fights durability only counts up to the hits the fight can
+  take (against a 40 HP minion a pipe with 20 uses left is the same as one
+  with 5), packs beyond PACK_CAP count as PACK_CAP, and the flashlight
+  battery is not part of the state: it has no effect on any combat outcome
+- every action lowers the enemy's HP, the packs or the player's HP, so one
+  backward pass in that order solves all states (expectimax), vectorized
+  over player HP with NumPy; only a pack dropped by a summoned minion goes
+  the other way, and BOSS_PASSES passes settle that
+- the table (best action + value, 2 bytes per state) is cached on disk in
+  main.CACHE_DIR, keyed by a hash of the stats and of combat.py's rules,
+  and read through mmap: advise() is O(1) and never needs NumPy
+
+Usage: python solver.py [--rebuild] [--check 20000]   (solve, then play it against the scripted fighter)
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import random
+import struct
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import combat
+import main
+import world
+from combat import BOSS_FIST_DMG, BOSS_HEAL_HP, BOSS_WEAPON_BONUS, ESCAPE, FIST_DMG, HEAL_HP, SUMMON, WEAPON_BONUS
+
+SOLVER_FILE = "solver-{key}.bin"
+MAGIC = b"F13S"
+VERSION = 1
+HEADER = struct.Struct("<4sB3xI")
+
+PACK_CAP = 3
+MAX_HEALTH = main.Player().max_health
+FISTS = "Fists"
+LOOT_PACK = combat.LOOT_DROP * combat.LOOT_TABLE.count("Health Pack") / len(combat.LOOT_TABLE)
+BOSS_PASSES = 3  # loot from summons feeds packs back in; a few passes settle it
+
+ACTIONS = (combat.ATTACK, combat.HEAL, combat.RUN)  # stored as the low 2 bits of a state
+VALUE_SCALE = (1 << 14) - 1
+TIE = 1e-9  # attack wins ties, then heal
+
+_tables: Dict[str, "SolverTable"] = {}
+_unavailable = False
+_building = threading.Lock()  # sessions asking for their first hint at once share one solve
+
+
+class Advice(NamedTuple):
+    action: object  # combat.ATTACK / HEAL / RUN, or (combat.SWITCH, weapon)
+    chance: float   # of surviving the minion / beating the Matriarch, playing on like this
+
+
+# -------------------- CACHE KEY --------------------
+def fight_stats(enemies=None, weapons=None, boss=None) -> Dict:
+    """Plain copies of what the solution depends on (the main template by default)."""
+    return {"enemies": world.thaw(main.ENEMY_TYPES if enemies is None else enemies),
+            "weapons": {name: {"damage": w["damage"], "durability": w["durability"]}
+                        for name, w in (main.WEAPONS if weapons is None else weapons).items()},
+            "boss": world.thaw(main.BOSS if boss is None else boss)}
+
+def stats_key(stats: Dict) -> str:
+    rules = [WEAPON_BONUS, FIST_DMG, BOSS_WEAPON_BONUS, BOSS_FIST_DMG, HEAL_HP, BOSS_HEAL_HP, ESCAPE, SUMMON,
+             PACK_CAP, MAX_HEALTH, VERSION]
+    return hashlib.sha256(json.dumps([stats, rules], sort_keys=True).encode()).hexdigest()[:16]
+
+def _levels(hp: int, damage: int) -> int:
+    """Durability that can matter: the most hits a fight against `hp` can take with `damage` per hit."""
+    return -(-hp // damage)
+
+
+# -------------------- SOLVING (NUMPY) --------------------
+def _expect_hit(np, rows, lo: int, hi: int):
+    """E[rows[..., hp - d]] for d uniform in lo..hi, where HP <= 0 is worth 0 (rows[..., 0] == 0)."""
+    size = rows.shape[-1]
+    sums = np.concatenate((np.zeros(rows.shape[:-1] + (1,)), rows.cumsum(axis=-1)), axis=-1)
+    hp = np.arange(size)
+    top = np.clip(hp - lo + 1, 0, size)
+    bottom = np.clip(hp - hi, 0, size)
+    return (sums[..., top] - sums[..., bottom]) / (hi - lo + 1)
+
+def _uniform(np, lo: int, hi: int, size: int):
+    dist = np.zeros(size)
+    dist[lo:hi + 1] = 1.0 / (hi - lo + 1)
+    return dist[:size]
+
+def solve_minion(np, enemy: Dict, damage: Optional[int], durability: int):
+    """Values and actions, shape (levels + 1, packs, enemy HP, player HP); level 0 is fists."""
+    emax, lo, hi = enemy["max_hp"], enemy["min_dmg"], enemy["max_dmg"]
+    levels = min(durability, _levels(emax, damage + WEAPON_BONUS[0])) if damage else 0
+    shape = (levels + 1, PACK_CAP + 1, emax + 1, MAX_HEALTH + 1)
+    values, actions = np.zeros(shape), np.zeros(shape, dtype=np.uint8)
+    hit = np.zeros(shape)  # values after the enemy's answer: E over its damage
+    healed = np.minimum(np.arange(MAX_HEALTH + 1) + HEAL_HP, MAX_HEALTH)
+    for p in range(PACK_CAP + 1):
+        for e in range(1, emax + 1):
+            attack = np.zeros((levels + 1, MAX_HEALTH + 1))
+            fists = range(FIST_DMG[0], FIST_DMG[1] + 1)
+            for d in fists:
+                attack[0] += 1.0 if d >= e else hit[0, p, e - d]
+            attack[0] /= len(fists)
+            if levels:
+                bonus = range(WEAPON_BONUS[0], WEAPON_BONUS[1] + 1)
+                for extra in bonus:
+                    d = damage + extra
+                    attack[1:] += 1.0 if d >= e else hit[:levels, p, e - d]
+                attack[1:] /= len(bonus)
+            heal = hit[:, p - 1, e][:, healed] if p else np.full_like(attack, -1.0)
+            value = np.maximum(attack, heal)
+            action = np.where(heal > attack + TIE, 1, 0).astype(np.uint8)
+            value[:, 0] = 0.0
+            # A failed escape lands in this same state with less HP (at least `lo` less),
+            # so running is settled in blocks of `lo` HP from the bottom up.
+            for start in range(1, MAX_HEALTH + 1, lo):
+                block = slice(start, start + lo)
+                run = ESCAPE + (1 - ESCAPE) * _expect_hit(np, value, lo, hi)[:, block]
+                better = run > value[:, block] + TIE
+                value[:, block] = np.where(better, run, value[:, block])
+                action[:, block] = np.where(better, 2, action[:, block])
+            values[:, p, e], actions[:, p, e] = value, action
+            hit[:, p, e] = _expect_hit(np, value, lo, hi)
+    return values, actions
+
+def minion_damage(np, minions: List[Dict], damage: Optional[int], uses: int = 0):
+    """What a summoned minion costs, attacked until it dies or run from until the escape works:
+    per choice, ([(durability used, damage distribution)], chance of a dropped health pack).
+    The weapon (`damage`) is good for `uses` more attacks, then it is fists."""
+    size = MAX_HEALTH + 1
+    weapon = range(damage + WEAPON_BONUS[0], damage + WEAPON_BONUS[1] + 1) if damage else None
+    fists = range(FIST_DMG[0], FIST_DMG[1] + 1)
+    killed: Dict[int, object] = {}
+    fled = np.zeros(size)
+    for enemy in minions:
+        per_hit = _uniform(np, enemy["min_dmg"], enemy["max_dmg"], size)
+        taken = _uniform(np, 0, 0, size)
+        for k in range(size):  # k failed escapes, then one that works
+            fled += ESCAPE * (1 - ESCAPE) ** k * taken / len(minions)
+            taken = np.convolve(taken, per_hit)[:size]
+            if not taken.any():
+                break
+        turns: Dict[Tuple[int, int], object] = {}
+
+        def more(e: int, i: int):
+            """P(an enemy with e HP left takes t more attacks), after i attacks."""
+            key = (e, min(i, uses))
+            if e <= 0:
+                return np.array([1.0])
+            if key not in turns:
+                hits = weapon if weapon and i < uses else fists
+                dist = np.zeros(e + 1)
+                for d in hits:
+                    rest = more(e - d, i + 1)
+                    dist[1:len(rest) + 1] += rest
+                turns[key] = dist / len(hits)
+            return turns[key]
+
+        hps = range(enemy["min_hp"], enemy["max_hp"] + 1)
+        weight = 1.0 / (len(hps) * len(minions))
+        for e in hps:
+            dist = more(e, 0)
+            taken = _uniform(np, 0, 0, size)  # it strikes back after every attack but the last
+            for t in range(1, len(dist)):
+                if t > 1:
+                    taken = np.convolve(taken, per_hit)[:size]
+                if dist[t]:
+                    used = min(t, uses) if weapon else 0
+                    killed[used] = killed.get(used, 0.0) + dist[t] * weight * taken
+    return (sorted(killed.items()), LOOT_PACK), ([(0, fled)], 0.0)
+
+def _toeplitz(np, kernel):
+    """M such that row @ M == np.convolve(row, kernel)[:len(row)]."""
+    size = len(kernel)
+    shift = np.arange(size)[None, :] - np.arange(size)[:, None]
+    return np.where(shift >= 0, kernel[shift.clip(0)], 0.0)
+
+def solve_boss(np, boss: Dict, minions: List[Dict], damage: Optional[int], durability: int):
+    """Values and actions, shape (levels + 1, packs, boss HP, player HP); level 0 is fists."""
+    bmax, size = boss["hp"], MAX_HEALTH + 1
+    levels = durability if damage else 0  # minions use it up too, so no cap here
+    shape = (levels + 1, PACK_CAP + 1, bmax + 1, size)
+    values, actions = np.zeros(shape), np.zeros(shape, dtype=np.uint8)
+    after = np.zeros(shape)  # values after her hit and a possible summon: E over what they cost
+    fled = np.zeros(shape, dtype=np.uint8)  # run from a summoned minion (by the HP left after her hit)
+    her_hit = _toeplitz(np, _uniform(np, boss["min_dmg"], boss["max_dmg"], size))
+    # Levels that fight a minion the same way share a group: fists (0), a weapon that could
+    # break on it (1 .. most-1), and one that cannot (most and up). Per group: the kill terms
+    # (levels left, packs kept, packs + 1) and the flee kernel, as matrices over player HP.
+    most = max(_levels(e["max_hp"], damage + WEAPON_BONUS[0]) for e in minions) if damage else 0
+    groups = []
+    for uses in range(min(levels, most) + 1):
+        rows = np.arange(uses, levels + 1) if uses == most else np.array([uses])
+        (killed, loot), ([(_, escaped)], _) = minion_damage(np, minions, damage if uses else None, uses)
+        kill = [(rows - used, _toeplitz(np, taken * (1 - loot)), _toeplitz(np, taken * loot))
+                for used, taken in killed]
+        groups.append((rows, kill, _toeplitz(np, escaped)))
+
+    def summon(value, richer, fled_to=None):
+        """value (levels + 1, HP) -> value once she may have summoned; fight or flee, whichever is better."""
+        out = np.empty_like(value)
+        for rows, kill, escaped in groups:
+            fight = sum(value[left] @ kept + richer[left] @ looted for left, kept, looted in kill)
+            flee = value[rows] @ escaped
+            out[rows] = (1 - SUMMON) * value[rows] + SUMMON * np.maximum(fight, flee)
+            if fled_to is not None:
+                fled_to[rows] = flee > fight + TIE
+        return out
+
+    alive = np.tile((np.arange(size) > 0).astype(float), (levels + 1, 1))
+    survive = summon(alive, alive) @ her_hit  # her hit and the summon after the killing blow
+    healed = np.minimum(np.arange(size) + BOSS_HEAL_HP, MAX_HEALTH)
+    fists = range(BOSS_FIST_DMG[0], BOSS_FIST_DMG[1] + 1)
+    bonus = range(BOSS_WEAPON_BONUS[0], BOSS_WEAPON_BONUS[1] + 1)
+
+    previous = None
+    for _ in range(BOSS_PASSES):
+        for p in range(PACK_CAP + 1):
+            for b in range(1, bmax + 1):
+                attack = np.zeros((levels + 1, size))
+                for d in fists:
+                    attack[0] += survive[0] if d >= b else after[0, p, b - d]
+                attack[0] /= len(fists)
+                if levels:
+                    for extra in bonus:
+                        d = damage + extra
+                        attack[1:] += survive[:levels] if d >= b else after[:levels, p, b - d]
+                    attack[1:] /= len(bonus)
+                heal = after[:, p - 1, b][:, healed] if p else np.full_like(attack, -1.0)
+                value = np.maximum(attack, heal)
+                value[:, 0] = 0.0
+                values[:, p, b] = value
+                actions[:, p, b] = np.where(heal > attack + TIE, 1, 0)
+                # One more pack is worth at least as much as this state; the last pass knows how much.
+                richer = value if previous is None else np.maximum(previous[:, min(p + 1, PACK_CAP), b], value)
+                after[:, p, b] = summon(value, richer, fled[:, p, b]) @ her_hit
+        previous = values.copy()
+    return values, actions | (fled << 1)
+
+def build_table(stats: Dict, path: str):
+    """Solve every fight for `stats` and write the table to `path` (needs NumPy)."""
+    import numpy as np
+
+    index = {"key": stats_key(stats), "health": MAX_HEALTH, "packs": PACK_CAP, "minions": {}, "boss": {}}
+    chunks, offset = [], 0
+
+    def add(values, actions) -> List[int]:
+        nonlocal offset
+        cells = (np.rint(values.clip(0, 1) * VALUE_SCALE).astype(np.uint16) << 2) | actions
+        chunks.append(cells.astype("<u2").tobytes())
+        entry = [offset, values.shape[0] - 1, values.shape[2] - 1]
+        offset += cells.size
+        return entry
+
+    arms = [(FISTS, None, 0)] + [(name, w["damage"], w["durability"]) for name, w in stats["weapons"].items()]
+    for enemy in stats["enemies"]:
+        index["minions"][enemy["name"]] = {name: add(*solve_minion(np, enemy, dmg, dur)) for name, dmg, dur in arms}
+    index["boss"] = {name: add(*solve_boss(np, stats["boss"], stats["enemies"], dmg, dur)) for name, dmg, dur in arms}
+
+    head = json.dumps(index, separators=(",", ":")).encode()
+    head += b" " * (-(HEADER.size + len(head)) % 2)
+    tmp = f"{path}.{os.getpid()}.tmp"  # concurrent runs each write their own, then replace
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(head)))
+        f.write(head)
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp, path)
+
+
+# -------------------- LOOKUPS (NO NUMPY) --------------------
+class SolverTable:
+    """The solved table for one set of stats, memory-mapped."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, head = HEADER.unpack_from(self.buf)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: not a solver table")
+        self.index = json.loads(self.buf[HEADER.size:HEADER.size + head])
+        self.data = HEADER.size + head
+        self.key = self.index["key"]
+        self.health, self.packs = self.index["health"], self.index["packs"]
+
+    def lookup(self, entry: List[int], level: int, packs: int, enemy_hp: int, health: int) -> Tuple[int, float]:
+        """(action code, value) for one state; out-of-range values are clamped to the table."""
+        offset, levels, emax = entry
+        if health <= 0:
+            return 0, 0.0
+        cell = ((min(max(level, 0), levels) * (self.packs + 1) + min(packs, self.packs)) * (emax + 1)
+                + min(max(enemy_hp, 1), emax)) * (self.health + 1) + min(health, self.health)
+        (bits,) = struct.unpack_from("<H", self.buf, self.data + 2 * (offset + cell))
+        return bits & 3, (bits >> 2) / VALUE_SCALE
+
+def has_table(stats: Dict = None) -> bool:
+    """Whether load_table() can skip the solve."""
+    key = stats_key(stats or fight_stats())
+    return key in _tables or os.path.exists(main.cache_path(SOLVER_FILE.format(key=key)))
+
+def load_table(stats: Dict = None, rebuild: bool = False) -> Optional[SolverTable]:
+    """Memory cache -> disk cache -> solve (needs NumPy). None if nothing is available."""
+    stats = stats or fight_stats()
+    key = stats_key(stats)
+    if not rebuild and key in _tables:
+        return _tables[key]
+    with _building:
+        if not rebuild and key in _tables:
+            return _tables[key]
+        return _load(stats, key, rebuild)
+
+def _load(stats: Dict, key: str, rebuild: bool) -> Optional[SolverTable]:
+    global _unavailable
+    path = main.cache_path(SOLVER_FILE.format(key=key))
+    if rebuild or not os.path.exists(path):
+        if _unavailable:
+            return None
+        try:
+            build_table(stats, path)
+        except ImportError:
+            _unavailable = True
+            return None
+        except OSError:
+            return None  # cache directory not writable
+    try:
+        table = SolverTable(path)
+    except (OSError, ValueError, struct.error):
+        return None
+    _tables[key] = table
+    return table
+
+def _level(weapon: Optional[str], weapons, levels: int) -> int:
+    return min(weapons[weapon]["durability"], levels) if weapon else 0
+
+def advise(turn: combat.Turn, weapons, table: SolverTable) -> Optional[Advice]:
+    """The best action for the fight state in `turn` (weapons: the session's, for durability)."""
+    p = turn.player
+    packs = p.inventory.count("Health Pack")
+    bosses = table.index["boss"]
+    if turn.boss_hp > 0 and (p.weapon or FISTS) in bosses:
+        # A summoned minion: fight it or run, as the Matriarch's table says, and keep the packs.
+        entry = bosses[p.weapon or FISTS]
+        code, chance = table.lookup(entry, _level(p.weapon, weapons, entry[1]), packs, turn.boss_hp, p.health)
+        return Advice(combat.RUN if code >> 1 else combat.ATTACK, chance)
+    group = bosses if turn.boss else table.index["minions"].get(turn.enemy["name"])
+    if group is None:
+        return None
+
+    def value(weapon: Optional[str], health: int) -> Tuple[object, float]:
+        entry = group[weapon or FISTS]
+        code, chance = table.lookup(entry, _level(weapon, weapons, entry[1]), packs, turn.enemy_hp, health)
+        return ACTIONS[code & 1 if turn.boss else code], chance
+
+    action, chance = value(p.weapon, p.health)
+    best = Advice(action, chance)
+    for other in p.inventory.weapons():
+        if other == p.weapon or other not in group:
+            continue
+        if turn.boss:
+            # Switching costs a round: average over her hits (the summon is left out here).
+            lo, hi = turn.enemy["min_dmg"], turn.enemy["max_dmg"]
+            switched = sum(value(other, p.health - d)[1] for d in range(lo, hi + 1)) / (hi - lo + 1)
+        else:
+            switched = value(other, p.health)[1]  # free in a minion fight
+        if switched > best.chance + 0.005:
+            best = Advice((combat.SWITCH, other), switched)
+    return best
+
+def solver_fighter(weapons, table: SolverTable):
+    """combat policy that always takes the advised action."""
+    def policy(turn: combat.Turn):
+        advice = advise(turn, weapons, table)
+        return advice.action if advice else combat.ATTACK
+    return policy
+
+
+# -------------------- CHECK --------------------
+# (fight, player HP, weapon, health packs): states where the choice of action matters
+CHECK_STARTS = [("Shadow Minion", 20, "Rusty Pipe", 0), ("Crawling Demon", 25, "Rusty Pipe", 1),
+                ("Twisted Bellhop", 15, None, 1), ("boss", 120, "Kitchen Knife", 3), ("boss", 80, "Revolver", 2)]
+
+def _start(health: int, weapon: Optional[str], packs: int) -> main.Player:
+    player = main.Player()
+    player.health, player.weapon = health, weapon
+    player.inventory = ([weapon] if weapon else []) + ["Health Pack"] * packs
+    return player
+
+def check(table: SolverTable, fights: int = 20000, seed: int = 13) -> List[Tuple[str, float, float, float]]:
+    """Play fights from CHECK_STARTS with the solver and with simulate's scripted fighter.
+    Rows: (start, predicted, solver rate, scripted rate); the rate is survival for minions, wins for the boss."""
+    import simulate
+
+    enemies = {e["name"]: e for e in main.ENEMY_TYPES}
+    rows = []
+    for name, health, weapon, packs in CHECK_STARTS:
+        rates = []
+        for use_solver in (True, False):
+            rng = random.Random(seed)
+            good = 0
+            for _ in range(fights):
+                player = _start(health, weapon, packs)
+                weapons = {w: dict(stats) for w, stats in main.WEAPONS.items()}
+                policy = solver_fighter(weapons, table) if use_solver else simulate.scripted_fighter(weapons)
+                if name == "boss":
+                    outcome, _ = combat.boss_fight(player, main.BOSS, main.ENEMY_TYPES, policy, weapons, rng)
+                    good += outcome == combat.WON
+                else:
+                    outcome, _ = combat.fight(player, enemies[name], policy, weapons, rng)
+                    good += outcome != combat.DIED
+            rates.append(good / fights)
+        player = _start(health, weapon, packs)
+        if name == "boss":
+            predicted = advise(combat.Turn(player, main.BOSS, main.BOSS["hp"], True), main.WEAPONS, table).chance
+        else:  # averaged over the minion's starting HP
+            enemy = enemies[name]
+            hps = range(enemy["min_hp"], enemy["max_hp"] + 1)
+            predicted = sum(advise(combat.Turn(player, enemy, hp, False), main.WEAPONS, table).chance
+                            for hp in hps) / len(hps)
+        start = f"{name}: {health} HP, {weapon or FISTS}, {packs} pack(s)"
+        rows.append((start, predicted, rates[0], rates[1]))
+    return rows
+
+def cli():
+    parser = argparse.ArgumentParser(description="Solve Floor 13's fights")
+    parser.add_argument("--rebuild", action="store_true")
+    parser.add_argument("--check", type=int, default=0, metavar="FIGHTS",
+                        help="play FIGHTS fights per start state with the solver and the scripted fighter")
+    args = parser.parse_args()
+    started = time.perf_counter()
+    table = load_table(rebuild=args.rebuild)
+    if table is None:
+        raise SystemExit("NumPy is needed to solve the table once")
+    size = os.path.getsize(main.cache_path(SOLVER_FILE.format(key=table.key)))
+    print(f"Table {table.key}: {size / 1e6:.1f} MB, ready in {time.perf_counter() - started:.2f}s")
+    if args.check:
+        print(f"{'start':<50}{'predicted':>10}{'solver':>9}{'scripted':>10}")
+        for start, predicted, solved, scripted in check(table, args.check):
+            print(f"{start:<50}{predicted:>10.1%}{solved:>9.1%}{scripted:>10.1%}")
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,259 @@
+"""
+FLOOR 13 - Shared world
+Copy-on-write world state, so many sessions can share one process cheaply:
+- WorldTemplate freezes the room, weapon and enemy definitions once
+  (read-only mappings, tuples instead of lists); every session shares it
+- World is one session's view of the template plus a sparse overlay that
+  holds only what that session changed: loot taken from rooms and weapon
+  durability spent. A fresh session costs a small object and two empty dicts
+- world.rooms / world.weapons read like the old dicts (rooms[name]["desc"],
+  weapons[name]["durability"] -= 1), so combat and the UI code are unchanged
+
+Usage: python world.py [--sessions 10000]   (memory per session benchmark)
+"""
+
+import argparse
+import copy
+import gc
+import tracemalloc
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import rolls
+import roomgraph
+
+
+def freeze(value):
+    """Read-only deep copy: dicts become mapping proxies, lists become tuples.
+    Other mappings (already frozen, or lazy like floorgen.Floor) are kept as they are."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(v) for key, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+def thaw(value):
+    """Plain dicts and lists again (for JSON, hashing or a mutable copy)."""
+    if isinstance(value, Mapping):
+        return {key: thaw(v) for key, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(v) for v in value]
+    return value
+
+
+class WorldTemplate:
+    """The immutable, shared part of the world, with its room graph index."""
+    __slots__ = ("rooms", "weapons", "enemies", "boss", "graph", "enemy_table")
+
+    def __init__(self, rooms: Dict, weapons: Dict, enemies: Iterable[Dict] = (), boss: Dict = None):
+        self.rooms = freeze(rooms)
+        self.weapons = freeze(weapons)
+        self.enemies = freeze(list(enemies))
+        self.boss = freeze(boss) if boss is not None else None
+        self.enemy_table = rolls.AliasTable(self.enemies) if self.enemies else None  # encounter picks
+        # Generated floors bring their own index; fixed room dicts get the all-pairs one.
+        self.graph = getattr(rooms, "graph", None) or roomgraph.RoomGraph(self.rooms)
+
+
+class World:
+    """One session's world: the shared template plus what this session changed."""
+    __slots__ = ("template", "loot", "durability")
+
+    def __init__(self, template: WorldTemplate):
+        self.template = template
+        self.loot: Dict[str, Tuple[str, ...]] = {}  # room -> items left, only for changed rooms
+        self.durability: Dict[str, int] = {}        # weapon -> durability, only for used weapons
+
+    @property
+    def rooms(self) -> "_Rooms":
+        return _Rooms(self)
+
+    @property
+    def weapons(self) -> "_Weapons":
+        return _Weapons(self)
+
+    # -------------------- ROOM LOOT --------------------
+    def items(self, room: str) -> Tuple[str, ...]:
+        items = self.loot.get(room)
+        return self.template.rooms[room]["items"] if items is None else items
+
+    def set_items(self, room: str, items: Iterable[str]):
+        items = tuple(items)
+        if items == self.template.rooms[room]["items"]:
+            self.loot.pop(room, None)
+        else:
+            self.loot[room] = items
+
+    def take_items(self, room: str) -> Tuple[str, ...]:
+        """Everything still lying in `room`; the room is empty afterwards."""
+        items = self.items(room)
+        if items:
+            self.loot[room] = ()
+        return items
+
+    # -------------------- WEAPON DURABILITY --------------------
+    def durability_of(self, weapon: str) -> int:
+        value = self.durability.get(weapon)
+        return self.template.weapons[weapon]["durability"] if value is None else value
+
+    def set_durability(self, weapon: str, value: int):
+        if value == self.template.weapons[weapon]["durability"]:
+            self.durability.pop(weapon, None)
+        else:
+            self.durability[weapon] = value
+
+    def reset(self):
+        """Back to the untouched template (a new game)."""
+        self.loot.clear()
+        self.durability.clear()
+
+
+# -------------------- DICT-STYLE VIEWS --------------------
+class _Rooms(Mapping):
+    __slots__ = ("_world",)
+
+    def __init__(self, world: World):
+        self._world = world
+
+    def __getitem__(self, name: str) -> "_Room":
+        self._world.template.rooms[name]  # KeyError for unknown rooms
+        return _Room(self._world, name)
+
+    def __contains__(self, name) -> bool:
+        return name in self._world.template.rooms
+
+    def __iter__(self):
+        return iter(self._world.template.rooms)
+
+    def __len__(self) -> int:
+        return len(self._world.template.rooms)
+
+
+class _Room(Mapping):
+    """A room definition with this session's loot in "items"."""
+    __slots__ = ("_world", "_name")
+
+    def __init__(self, world: World, name: str):
+        self._world = world
+        self._name = name
+
+    def __getitem__(self, key: str):
+        if key == "items":
+            return self._world.items(self._name)
+        return self._world.template.rooms[self._name][key]
+
+    def __iter__(self):
+        return iter(self._world.template.rooms[self._name])
+
+    def __len__(self) -> int:
+        return len(self._world.template.rooms[self._name])
+
+
+class _Weapons(Mapping):
+    __slots__ = ("_world",)
+
+    def __init__(self, world: World):
+        self._world = world
+
+    def __getitem__(self, name: str) -> "_Weapon":
+        self._world.template.weapons[name]
+        return _Weapon(self._world, name)
+
+    def __contains__(self, name) -> bool:
+        return name in self._world.template.weapons
+
+    def __iter__(self):
+        return iter(self._world.template.weapons)
+
+    def __len__(self) -> int:
+        return len(self._world.template.weapons)
+
+
+class _Weapon(Mapping):
+    """Weapon stats; "durability" is per session and the only writable key."""
+    __slots__ = ("_world", "_name")
+
+    def __init__(self, world: World, name: str):
+        self._world = world
+        self._name = name
+
+    def __getitem__(self, key: str):
+        if key == "durability":
+            return self._world.durability_of(self._name)
+        return self._world.template.weapons[self._name][key]
+
+    def __setitem__(self, key: str, value):
+        if key != "durability":
+            raise TypeError(f"weapon {key!r} is shared by every session and read-only")
+        self._world.set_durability(self._name, value)
+
+    def __iter__(self):
+        return iter(self._world.template.weapons[self._name])
+
+    def __len__(self) -> int:
+        return len(self._world.template.weapons[self._name])
+
+
+# -------------------- MEMORY BENCHMARK --------------------
+def _play_a_little(rooms, weapons, take: List[str], weapon: Optional[str]):
+    """Typical early-game changes: a few rooms looted, one weapon used."""
+    for name in take:
+        if isinstance(rooms, World):
+            rooms.take_items(name)
+        else:
+            rooms[name]["items"].clear()
+    if weapon:
+        weapons[weapon]["durability"] -= 3
+
+def _measure(make, sessions: int) -> int:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [make() for _ in range(sessions)]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return used
+
+def benchmark(sessions: int = 10000) -> Dict[str, Dict[str, float]]:
+    import main
+    rooms, weapons = thaw(main.ROOMS), thaw(main.WEAPONS)
+    take = ["Lobby", "Left Hall", "Room 102"]
+
+    def deep_copy(touched: bool):
+        def make():
+            r, w = copy.deepcopy(rooms), copy.deepcopy(weapons)
+            if touched:
+                _play_a_little(r, w, take, "Rusty Pipe")
+            return r, w
+        return make
+
+    def overlay(touched: bool):
+        def make():
+            world = World(main.TEMPLATE)
+            if touched:
+                _play_a_little(world, world.weapons, take, "Rusty Pipe")
+            return world
+        return make
+
+    results = {}
+    for label, factory in (("deepcopy", deep_copy), ("overlay", overlay)):
+        results[label] = {state: _measure(factory(state == "played"), sessions) / sessions
+                          for state in ("fresh", "played")}
+    return results
+
+def cli():
+    parser = argparse.ArgumentParser(description="Floor 13 world memory per session")
+    parser.add_argument("--sessions", "-n", type=int, default=10000)
+    args = parser.parse_args()
+    results = benchmark(args.sessions)
+    print(f"World state per session at {args.sessions} sessions (tracemalloc):")
+    print(f"{'':<12}{'fresh':>10}{'played':>10}")
+    for label, row in results.items():
+        print(f"{label:<12}{row['fresh']:>9.0f}B{row['played']:>9.0f}B")
+    ratio = results["deepcopy"]["played"] / max(1.0, results["overlay"]["played"])
+    print(f"Overlay is {ratio:.0f}x smaller once played.")
+
+if __name__ == "__main__":
+    cli()